@@ -14,7 +14,7 @@ requires = [
     'pyramid_retry',
     'pyramid_tm',
     'pyramid_zodbconn',
-    'pyramid_session_redis',
+    'pyramid_session_redis==1.5.3',
     'transaction',
     'ZODB3',
     'arche',
@@ -57,6 +57,7 @@ setup(
     zip_safe=False,
     extras_require={
         'testing': tests_require,
+        'speedups': ['orjson'],
     },
     install_requires=requires,
     entry_points={
@@ -25,12 +25,8 @@ def main(global_config, **settings):
     return config.make_wsgi_app()
 
 
-def includeme(config):
-    """ Include all locals except views. Useful for integration/functional tests too. """
-    # Some sensible defaults
-    settings = config.registry.settings
-    settings['tm.manager_hook'] = 'pyramid_tm.explicit_manager'
-
+def set_session_defaults(settings):
+    """ Settings for pyramid_session_redis, see setup.py for the supported version. """
     if 'redis.sessions.secret' not in settings:
         logger.info('Using random secret for sessions, '
                        'set "redis.sessions.secret" in your settings for persistance.')
@@ -46,6 +42,18 @@ def includeme(config):
 
     kedja_redis = settings['kedja.redis_url']
     settings.setdefault('redis.sessions.url', kedja_redis)
+    # Use the same connection pool as everything else.
+    # Note: pyramid_session_redis 1.6 and later renamed this to redis_client_callable, and url to redis_url
+    settings.setdefault('redis.sessions.client_callable', 'kedja.utils.session_redis_client')
+
+
+def includeme(config):
+    """ Include all locals except views. Useful for integration/functional tests too. """
+    # Some sensible defaults
+    settings = config.registry.settings
+    settings['tm.manager_hook'] = 'pyramid_tm.explicit_manager'
+
+    set_session_defaults(settings)
 
     # Pyramid/Pylons
     config.include('pyramid_tm')
@@ -65,6 +73,7 @@ def includeme(config):
     config.include('arche.schemas')
     # Internal
     config.include('.config')
+    config.include('.renderers')
     config.include('.models')
     config.include('.resources')
     config.include('.security.default_acl')
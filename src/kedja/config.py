@@ -4,7 +4,8 @@ from kedja.interfaces import INamedACL
 def add_acl(config, acl:INamedACL):
     assert INamedACL.providedBy(acl)
     assert acl.name
-    config.registry.registerUtility(acl, name=acl.name)
+    acl.compile()
+    config.registry.registerUtility(acl, INamedACL, name=acl.name)
 
 
 def includeme(config):
@@ -63,6 +63,44 @@ class IOneTimeAuthToken(Interface):
         """
 
 
+class IWallSnapshots(Interface):
+    """ Keeps rendered wall content as byte blobs in redis.
+        There's one key per wall and name. The revision is stored with the payload, so any change within the wall
+        will cause a new snapshot to be rendered on the next read, replacing the old one.
+    """
+
+    def get(wall, name:str):
+        """ Return the stored snapshot for this revision of the wall or None. """
+
+    def set(wall, name:str, payload:bytes):
+        """ Store a snapshot for the current revision of the wall. """
+
+    def get_or_create(wall, name:str, factory):
+        """ Return the stored snapshot, or call factory to render and store it. """
+
+
+class IJSONEncoder(Interface):
+    """ Encodes values as JSON bytes. Used by the json renderers and for everything rendered as bytes,
+        like wall content snapshots. See kedja.renderers
+    """
+    name = Attribute("Name of the encoder, like 'orjson' or 'json'")
+
+    def __call__(value, default=None):
+        """ Return value encoded as JSON bytes. default is called with anything the encoder doesn't know,
+            and should return something that can be encoded instead.
+        """
+
+
+class IWallChanged(Interface):
+    """ Event fired for each change within a wall, after the change has been added to the walls changelog. """
+    wall = Attribute("The wall")
+    revision = Attribute("The revision this change caused")
+    action = Attribute("'added', 'updated' or 'removed'")
+    kind = Attribute("'resource' or 'relation'")
+    id = Attribute("rid or relation id, or None if many were changed at once")
+    count = Attribute("How many were changed")
+
+
 class ISecurityAware(Interface):
     """ A resource that will work with Pyramids ACL system and produce an ACL. It may also have roles assigned. """
 
@@ -78,13 +116,14 @@ class ISecurityAware(Interface):
     def remove_user_roles(userid:str, *roles):
         """ Remove roles, should be instances of kedja.models.acl.Role or Pyramids security Authenticated/Everyone."""
 
-    def get_computed_acl(userids=[], request=None):
+    def get_computed_acl(userids=None, request=None):
         """ Figure out permissions for userids based on the roles and named acl lists on each resource.
             Permissions will be fetched by walking towards the root.
 
             Any roles will be translated to userids.
 
-            Will return a generator with tuples with action, userid or system role, and then permissions.
+            Will return a tuple with tuples with action, userid or system role, and then permissions.
+            The result is cached during the request, and invalidated if any roles are changed.
 
             It will traverse backwards from self to the root and then insert pyramid.security.DENY_ALL.
 
@@ -99,6 +138,15 @@ class ISecurityAware(Interface):
     def get_acl(registry=None):
         """ Get the current contexts ACL, if any. """
 
+    def roles_changed(userid:int):
+        """ Called after roles for userid were added or removed. """
+
+    def set_acl_name(acl_name:str):
+        """ Change acl_name. Cached permissions are invalidated and acl_changed is called. """
+
+    def acl_changed():
+        """ Called after acl_name was changed with set_acl_name. """
+
 
 
 
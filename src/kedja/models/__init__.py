@@ -3,6 +3,11 @@
 def includeme(config):
     config.include('.auth')
     config.include('.authomatic')
+    config.include('.conflicts')
     config.include('.credentials')
+    config.include('.pubsub')
     config.include('.relations')
+    config.include('.resource_cache')
+    config.include('.snapshots')
+    config.include('.wall_index')
 #    config.include('.cors')
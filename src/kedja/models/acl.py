@@ -28,6 +28,7 @@ class NamedACL(UserList):
     name = ""
     title = ""
     description = ""
+    _index = None
 
     def __init__(self, name:str = "", title:str = "", description:str = ""):
         self.name = name
@@ -62,3 +63,50 @@ class NamedACL(UserList):
                     assert isinstance(userid, str), "userid must be a string"
                     if ace_role in roles_iter:
                         yield (ace_action, userid, ace_permissions)
+
+    def compile(self):
+        """ Build an index of role -> allowed and denied permissions, so checking a permission is a few set lookups.
+            This is done when the ACL is registered with config.add_acl, so don't change it after that.
+        """
+        index = {}
+        for ace_action in (Allow, Deny):
+            index[ace_action] = ({}, set())
+        for (ace_action, ace_role, ace_permissions) in self:
+            (permissions, all_permissions) = index[ace_action]
+            if ace_permissions is ALL_PERMISSIONS:
+                all_permissions.add(ace_role)
+            else:
+                permissions.setdefault(ace_role, set()).update(ace_permissions)
+        self._index = {}
+        for (ace_action, (permissions, all_permissions)) in index.items():
+            self._index[ace_action] = (
+                {k: frozenset(v) for (k, v) in permissions.items()},
+                frozenset(all_permissions),
+            )
+
+    def _matches(self, ace_action, roles, permission):
+        (permissions, all_permissions) = self._index[ace_action]
+        for role in roles:
+            if role in all_permissions or permission in permissions.get(role, ()):
+                return True
+        return False
+
+    def permits(self, roles, permission):
+        """ Return Allow or Deny from the first ACE matching any of the roles, or None if nothing matches.
+            roles may contain Pyramids Everyone and Authenticated too.
+
+            The result is the same as scanning get_translated_acl, but the ACL only needs to be scanned
+            in case both an allow and a deny matches.
+        """
+        if self._index is None:
+            self.compile()
+        allowed = self._matches(Allow, roles, permission)
+        denied = self._matches(Deny, roles, permission)
+        if allowed and denied:
+            for (ace_action, ace_role, ace_permissions) in self:
+                if ace_role in roles and (ace_permissions is ALL_PERMISSIONS or permission in ace_permissions):
+                    return ace_action
+        if allowed:
+            return Allow
+        if denied:
+            return Deny
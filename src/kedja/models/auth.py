@@ -7,7 +7,17 @@ from pyramid.authentication import CallbackAuthenticationPolicy
 from pyramid.authentication import extract_http_basic_credentials
 from pyramid.authorization import ACLAuthorizationPolicy
 from pyramid.interfaces import IAuthenticationPolicy
+from pyramid.interfaces import IAuthorizationPolicy
 from pyramid.interfaces import IDebugLogger
+from pyramid.location import lineage
+from pyramid.security import ACLAllowed
+from pyramid.security import ACLDenied
+from pyramid.security import Allow
+from pyramid.security import Authenticated
+from pyramid.security import DENY_ALL
+from pyramid.security import Everyone
+from pyramid.threadlocal import get_current_registry
+from pyramid.threadlocal import get_current_request
 from zope.component import adapter
 from zope.interface import implementer
 
@@ -16,7 +26,9 @@ from kedja.models.credentials import remove_credentials
 from kedja.models.credentials import Credentials
 from kedja.interfaces import IOneTimeAuthToken
 from kedja.interfaces import IOneTimeRegistrationToken
+from kedja.interfaces import ISecurityAware
 from kedja.utils import get_redis_conn
+from kedja.utils import getdel
 
 
 @implementer(IAuthenticationPolicy)
@@ -76,6 +88,68 @@ class HTTPHeaderAuthenticationPolicy(CallbackAuthenticationPolicy):
             logger.debug(methodname + ': ' + msg)
 
 
+@implementer(IAuthorizationPolicy)
+class NamedACLAuthorizationPolicy(ACLAuthorizationPolicy):
+    """ Works like Pyramids ACLAuthorizationPolicy, but when the lineage reaches an ISecurityAware resource,
+        the compiled index of each named ACL is used instead of scanning a computed ACL.
+        See kedja.models.acl.NamedACL.permits
+
+        The results are the same as checking the ACL from ISecurityAware.get_computed_acl
+
+        The named ACL and the roles of each location are kept in the requests computed_acl_cache,
+        so checking many cards in one wall only looks up the roles within the wall once.
+    """
+
+    def permits(self, context, principals, permission):
+        for location in lineage(context):
+            if ISecurityAware.providedBy(location):
+                return self.security_aware_permits(location, principals, permission)
+            if getattr(location, '__acl__', None) is not None:
+                # Some other kind of ACL - let Pyramid deal with it
+                break
+        return super().permits(context, principals, permission)
+
+    def security_aware_permits(self, context, principals, permission, registry=None, request=None):
+        if registry is None:
+            registry = get_current_registry()
+        if request is None:
+            request = get_current_request()
+        cache = getattr(request, 'computed_acl_cache', None)
+        userids = tuple(x for x in principals if isinstance(x, str) and x.isdigit())
+        system_roles = frozenset(x for x in principals if x in (Everyone, Authenticated))
+        for location in lineage(context):
+            if not ISecurityAware.providedBy(location):
+                continue
+            named_acl, roles = self.get_acl_and_roles(location, userids, system_roles, registry, cache)
+            if named_acl is None:
+                continue
+            ace_action = named_acl.permits(roles, permission)
+            if ace_action is not None:
+                ace = (ace_action, named_acl.name, permission)
+                if ace_action == Allow:
+                    return ACLAllowed(ace, named_acl, permission, principals, location)
+                return ACLDenied(ace, named_acl, permission, principals, location)
+        return ACLDenied(DENY_ALL, (DENY_ALL,), permission, principals, context)
+
+    def get_acl_and_roles(self, location, userids:tuple, system_roles:frozenset, registry, cache=None):
+        """ Return the named ACL of location and the roles the principals have there.
+            If cache is a dict, the result is stored there. It's cleared whenever roles or ACLs change.
+        """
+        key = ('roles', id(location), userids, system_roles)
+        if cache is not None and key in cache:
+            return cache[key][1:]
+        named_acl = location.get_acl(registry)
+        roles = None
+        if named_acl is not None:
+            roles = set(system_roles)
+            for userid in userids:
+                roles.update(location.get_roles(userid))
+        if cache is not None:
+            # Keep a reference to location, so the id can't be reused during this request
+            cache[key] = (location, named_acl, roles)
+        return named_acl, roles
+
+
 @implementer(IOneTimeRegistrationToken)
 @adapter(IRoot)
 class OneTimeRegistrationToken(object):
@@ -88,17 +162,19 @@ class OneTimeRegistrationToken(object):
     def get_key(self, token:str):
         return "{}.{}".format(self.prefix, token)
 
-    def create(self, payload:dict, expires:int=1200, registry=None):
-        token = _generate_token(length=70)
+    def create(self, payload:dict, expires:int=1200, registry=None, token:str=None):
+        if token is None:
+            token = _generate_token(length=70)
         conn = get_redis_conn(registry)
         key_name = self.get_key(token)
         conn.setex(key_name, expires, json.dumps(payload))
         return token
 
     def consume(self, token:str, registry=None):
+        """ Return the payload and remove the token. A token can only be consumed once. """
         key_name = self.get_key(token)
         conn = get_redis_conn(registry)
-        payload = conn.get(key_name)
+        payload = getdel(conn, key_name)
         if payload:
             payload = payload.decode()
             return json.loads(payload)
@@ -130,9 +206,10 @@ class OneTimeAuthToken(object):
         return one_time_token
 
     def consume(self, userid:str, token:str, registry=None):
+        """ Return the credentials and remove the token. A token can only be consumed once. """
         key_name = self.get_key(userid, token)
         conn = get_redis_conn(registry)
-        cred_token = conn.get(key_name)
+        cred_token = getdel(conn, key_name)
         if cred_token:
             cred_token = cred_token.decode()
             return Credentials.load(userid, cred_token, registry)
@@ -152,7 +229,7 @@ def _generate_token(length=30):
 
 def includeme(config):
     debug_authn = config.registry.settings.get('pyramid.debug_authorization', False)
-    config.set_authorization_policy(ACLAuthorizationPolicy())
+    config.set_authorization_policy(NamedACLAuthorizationPolicy())
     config.set_authentication_policy(HTTPHeaderAuthenticationPolicy(debug=debug_authn))
     config.registry.registerAdapter(OneTimeRegistrationToken)
     config.registry.registerAdapter(OneTimeAuthToken)
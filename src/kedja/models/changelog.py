@@ -0,0 +1,86 @@
+from BTrees import family64
+from persistent import Persistent
+
+from kedja.models.conflicts import ChangeLogBTree
+
+
+ADDED = 'added'
+UPDATED = 'updated'
+REMOVED = 'removed'
+
+RESOURCE = 'resource'
+RELATION = 'relation'
+
+
+class ChangeLog(Persistent):
+    """ A bounded log of changes within a wall. Each entry is stored under the wall revision it caused,
+        so clients that know a revision can ask for everything that happened after it.
+
+        Entries older than 'limit' revisions are removed. Asking for changes since a revision that is
+        no longer covered by the log returns None, and the client will have to fetch everything again.
+
+        Two transactions changing the same wall at the same time will both log under the revisions after
+        the one they started from. They don't conflict, the entries of the transaction that commits last
+        are moved to the revisions after the other ones, see kedja.models.conflicts.ChangeLogBTree
+        The revision of the wall adds up the same way, so it always matches the last entry.
+        If a bucket is split or compacted at the same time, there's still a conflict and one of them is retried.
+    """
+    family = family64
+    limit = 1000
+
+    def __init__(self, revision:int=0):
+        self.entries = ChangeLogBTree()
+        # Everything that happened after this revision is known
+        self.oldest = revision
+
+    def append(self, revision:int, action:str, kind:str, id):
+        """ id is a rid or relation id, or a tuple of them for changes that were logged at once. """
+        assert action in (ADDED, UPDATED, REMOVED)
+        assert kind in (RESOURCE, RELATION)
+        if not isinstance(self.entries, ChangeLogBTree):
+            # Created before concurrent entries could be merged
+            self.entries = ChangeLogBTree(self.entries)
+        self.entries[revision] = (action, kind, id)
+        self.compact(revision)
+
+    def compact(self, revision:int):
+        """ Remove entries older than limit. Done in batches of a tenth of the limit to keep bucket writes down. """
+        cutoff = revision - self.limit
+        if cutoff - self.oldest < self.limit // 10:
+            return
+        for k in list(self.entries.keys(max=cutoff)):
+            del self.entries[k]
+        self.oldest = cutoff
+
+    def covers(self, revision:int):
+        return revision >= self.oldest
+
+    def since(self, revision:int):
+        """ Return a dict with the changes after revision, grouped by kind and then action.
+            Something added and then removed won't be included at all, and something removed and then added again
+            counts as updated.
+        """
+        if not self.covers(revision):
+            return
+        first = {}
+        last = {}
+        for (action, kind, ids) in self.entries.values(min=revision, excludemin=True):
+            if not isinstance(ids, tuple):
+                ids = (ids,)
+            for id in ids:
+                key = (kind, id)
+                first.setdefault(key, action)
+                last[key] = action
+        results = {}
+        for kind in (RESOURCE, RELATION):
+            results[kind] = {ADDED: [], UPDATED: [], REMOVED: []}
+        for (key, action) in last.items():
+            kind, id = key
+            if action == REMOVED:
+                if first[key] != ADDED:
+                    results[kind][REMOVED].append(id)
+            elif first[key] == ADDED:
+                results[kind][ADDED].append(id)
+            else:
+                results[kind][UPDATED].append(id)
+        return results
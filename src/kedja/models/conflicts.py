@@ -0,0 +1,245 @@
+""" Conflict resolution for things that are changed a lot within the same wall.
+
+When two transactions change the same persistent object, ZODB raises a ConflictError and
+pyramid_retry runs the whole request again. Most concurrent edits on a wall don't really collide though:
+one user adds a card while another renames a collection, or two users link different cards to the same one.
+The classes here let ZODB merge those cases instead. Anything that can't be merged safely still raises
+ConflictError, and the request will be retried as before.
+
+Every change within a wall is logged in its changelog, so that has to merge too, see ChangeLogBTree.
+
+Counters for resolved and unresolved conflicts and retries are kept per process, see get_conflict_metrics.
+"""
+from collections import Counter
+from threading import Lock
+
+from BTrees import family64
+from ZODB.POSException import ConflictError
+from pyramid_retry import IBeforeRetry
+
+
+_metrics = Counter()
+_metrics_lock = Lock()
+
+
+def count(name:str, value:int=1):
+    with _metrics_lock:
+        _metrics[name] += value
+
+
+def get_conflict_metrics():
+    """ Return a dict with counters for this process. """
+    with _metrics_lock:
+        return dict(_metrics)
+
+
+def _same(a, b):
+    # Comparing persistent references to different objects during conflict resolution raises ValueError
+    try:
+        return a == b
+    except ValueError:
+        return False
+
+
+def _is_reordered(old:tuple, new:tuple):
+    """ Did new change the order of the items it kept from old? """
+    kept = set(new)
+    existed = set(old)
+    return [x for x in old if x in kept] != [x for x in new if x in existed]
+
+
+def merge_tuples(old:tuple, committed:tuple, new:tuple):
+    """ Apply the items new added or removed compared to old on top of committed.
+        Raises ConflictError if new reordered items, unless committed didn't change anything.
+    """
+    if _is_reordered(old, new):
+        if tuple(committed) != tuple(old):
+            raise ConflictError("Items were reordered in both transactions")
+        return tuple(new)
+    removed = set(old) - set(new)
+    results = [x for x in committed if x not in removed]
+    existing = set(results)
+    for x in new:
+        if x not in existing and x not in old:
+            results.append(x)
+            existing.add(x)
+    return tuple(results)
+
+
+class ResolveAttributeConflictsMixin(object):
+    """ Changes to different attributes are merged. The contained items and their order are kept in BTrees
+        that handle their own conflicts, see kedja.resources.ordering.PositionOrderedMixin
+    """
+
+    def _p_resolveConflict(self, old, committed, new):
+        if not all(isinstance(x, dict) for x in (old, committed, new)):
+            count('unresolved.%s' % self.__class__.__name__)
+            raise ConflictError("Can't resolve state of %s" % self.__class__.__name__)
+        results = dict(committed)
+        for name in set(old) | set(committed) | set(new):
+            marker = object()
+            old_value = old.get(name, marker)
+            new_value = new.get(name, marker)
+            if _same(old_value, new_value):
+                continue
+            committed_value = committed.get(name, marker)
+            if _same(old_value, committed_value) or _same(committed_value, new_value):
+                if new_value is marker:
+                    results.pop(name, None)
+                else:
+                    results[name] = new_value
+                continue
+            count('unresolved.%s' % self.__class__.__name__)
+            raise ConflictError("Attribute %r of %s was changed in both transactions" % (name, self.__class__.__name__))
+        count('resolved.%s' % self.__class__.__name__)
+        return results
+
+
+def _merge_bucket_items(old:tuple, committed:tuple, new:tuple):
+    """ Merge the flat (key, value, key, value...) sequences from bucket states.
+        Values are expected to be tuples of ids, when the same key was changed on both sides they're combined.
+    """
+    old = dict(zip(old[::2], old[1::2]))
+    committed = dict(zip(committed[::2], committed[1::2]))
+    new = dict(zip(new[::2], new[1::2]))
+    results = dict(committed)
+    for key in set(old) | set(new):
+        old_value = old.get(key, ())
+        new_value = new.get(key, ())
+        if _same(old_value, new_value):
+            continue
+        committed_value = committed.get(key, ())
+        if _same(old_value, committed_value) or _same(committed_value, new_value):
+            merged = new_value
+        elif all(isinstance(x, tuple) for x in (old_value, committed_value, new_value)):
+            merged = merge_tuples(old_value, committed_value, new_value)
+        else:
+            raise ConflictError("Both transactions changed the set for %s" % key)
+        if merged:
+            results[key] = merged
+        else:
+            results.pop(key, None)
+    items = []
+    for key in sorted(results):
+        items.extend((key, results[key]))
+    return tuple(items)
+
+
+class RelationsBucket(family64.IO.Bucket):
+    """ Bucket that merges tuples of relation ids stored under the same rid, see RelationsBTree. """
+
+    def _p_resolveConflict(self, old, committed, new):
+        # State is ((key, value, ...), next_bucket) or without next_bucket for the last one
+        if len(old) != len(committed) or len(old) != len(new) or not _same(old[1:], committed[1:]) \
+                or not _same(old[1:], new[1:]):
+            count('unresolved.RelationsBucket')
+            raise ConflictError("Bucket was split or joined")
+        try:
+            items = _merge_bucket_items(old[0], committed[0], new[0])
+        except ConflictError:
+            count('unresolved.RelationsBucket')
+            raise
+        if not items:
+            # An empty bucket must be removed from the BTree, which can't be done here
+            count('unresolved.RelationsBucket')
+            raise ConflictError("Bucket would be empty")
+        count('resolved.RelationsBucket')
+        return (items,) + tuple(old[1:])
+
+
+class RelationsBTree(family64.IO.BTree):
+    """ Maps rids to tuples of relation ids. Two transactions linking or unlinking
+        relations to the same rid will be merged rather than causing a conflict.
+    """
+    _bucket_type = RelationsBucket
+
+    def _p_resolveConflict(self, old, committed, new):
+        # Small trees keep their only bucket within their own state: (((key, value, ...),),)
+        if all(_is_inline_state(x) for x in (old, committed, new)):
+            try:
+                items = _merge_bucket_items(old[0][0][0], committed[0][0][0], new[0][0][0])
+            except ConflictError:
+                count('unresolved.RelationsBTree')
+                raise
+            count('resolved.RelationsBTree')
+            if not items:
+                return None
+            return (((items,),),)
+        return super()._p_resolveConflict(old, committed, new)
+
+
+def _merge_log_items(old:tuple, committed:tuple, new:tuple):
+    """ Merge the flat (revision, entry, ...) sequences from changelog bucket states.
+        Both transactions appended entries after the same revision. The ones from new are placed after
+        the committed ones, which is also what the revision counter of the wall adds up to.
+    """
+    old = dict(zip(old[::2], old[1::2]))
+    committed = dict(zip(committed[::2], committed[1::2]))
+    new = dict(zip(new[::2], new[1::2]))
+    for (key, value) in old.items():
+        if key not in committed or key not in new:
+            raise ConflictError("Changelog was compacted")
+        if not _same(value, committed[key]) or not _same(value, new[key]):
+            raise ConflictError("Changelog entry %s was changed" % key)
+    results = dict(committed)
+    last = max(results) if results else 0
+    for (i, key) in enumerate(sorted(x for x in new if x not in old), start=1):
+        results[last + i] = new[key]
+    items = []
+    for key in sorted(results):
+        items.extend((key, results[key]))
+    return tuple(items)
+
+
+class ChangeLogBucket(family64.IO.Bucket):
+    """ Bucket that merges changelog entries appended by concurrent transactions, see ChangeLogBTree. """
+
+    def _p_resolveConflict(self, old, committed, new):
+        if len(old) != len(committed) or len(old) != len(new) or not _same(old[1:], committed[1:]) \
+                or not _same(old[1:], new[1:]):
+            count('unresolved.ChangeLogBucket')
+            raise ConflictError("Bucket was split or joined")
+        try:
+            items = _merge_log_items(old[0], committed[0], new[0])
+        except ConflictError:
+            count('unresolved.ChangeLogBucket')
+            raise
+        count('resolved.ChangeLogBucket')
+        return (items,) + tuple(old[1:])
+
+
+class ChangeLogBTree(family64.IO.BTree):
+    """ Maps revisions to changelog entries. When two transactions change the same wall at the same time,
+        both log under the revisions that follow the one they started from. Those entries are merged,
+        and the entries from the transaction committing last get the revisions after the other ones.
+        See kedja.models.changelog.ChangeLog
+    """
+    _bucket_type = ChangeLogBucket
+
+    def _p_resolveConflict(self, old, committed, new):
+        # A new tree without entries has no state
+        states = [((((),),),) if x is None else x for x in (old, committed, new)]
+        if all(_is_inline_state(x) for x in states):
+            try:
+                items = _merge_log_items(*(x[0][0][0] for x in states))
+            except ConflictError:
+                count('unresolved.ChangeLogBTree')
+                raise
+            count('resolved.ChangeLogBTree')
+            return (((items,),),)
+        return super()._p_resolveConflict(old, committed, new)
+
+
+def _is_inline_state(state):
+    return isinstance(state, tuple) and len(state) == 1 and len(state[0]) == 1 \
+        and isinstance(state[0][0], tuple) and len(state[0][0]) == 1
+
+
+def count_retry(event):
+    """ Subscriber for pyramid_retry.IBeforeRetry """
+    count('retries')
+    count('retries.%s' % event.exception.__class__.__name__)
+
+
+def includeme(config):
+    config.add_subscriber(count_retry, IBeforeRetry)
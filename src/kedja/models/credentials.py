@@ -1,13 +1,17 @@
 import base64
 import json
+from collections import OrderedDict
 from collections import UserDict
 from datetime import timedelta
 from logging import getLogger
 from random import choice
 from string import ascii_letters, digits
+from threading import Lock
+from time import monotonic
 
 from arche.content import ContentType
 from pyramid.decorator import reify
+from pyramid.exceptions import ConfigurationError
 from pyramid.threadlocal import get_current_registry
 from zope.interface import implementer
 
@@ -59,25 +63,36 @@ class Credentials(UserDict):
     def reset_expire(self):
         expires = self.get('expires', None)
         if expires:
-            self._conn.expire(self.get_key(), expires)
-            return expires
+            if self._conn.expire(self.get_key(), expires):
+                return expires
+            # The key is gone
+            return 0
+        self._conn.persist(self.get_key())
 
     @classmethod
     def load(cls, userid, token, registry=None):
+        """ Fetch credentials and reset their expiry within the same round trip.
+            The expiry is reset to the default, so credentials saved with anything else need another call.
+        """
         if registry is None:
             registry = get_current_registry()
         key =  "{}.{}.{}".format(cls.prefix, userid, token)
         conn = get_redis_conn(registry)
-        payload = conn.get(key)
+        pipe = conn.pipeline(transaction=True)
+        pipe.get(key)
+        pipe.expire(key, _DEFAULT)
+        payload = pipe.execute()[0]
         if payload:
             payload = payload.decode()
             data = json.loads(payload)
             inst = cls(registry=registry, **data)
-            inst.reset_expire()
+            if inst.get('expires', None) != _DEFAULT:
+                inst.reset_expire()
             return inst
 
     def clear(self):
         self._conn.delete(self.get_key())
+        get_credentials_cache(self.registry).invalidate(self.userid, self.token)
 
     def header(self):
         merged = "%s:%s" % (self.userid, self.token)
@@ -103,9 +118,112 @@ class Credentials(UserDict):
         return self['token']
 
 
+class CredentialsCache(object):
+    """ An in-process LRU cache of valid credentials, so a client making lots of requests
+        won't cause a redis lookup for each one of them.
+
+        Entries are kept for ttl seconds.
+
+        The sliding expiry in redis is only reset when refresh_interval seconds have passed since
+        it was reset the last time, i.e. when the remaining TTL in redis has dropped by that much.
+        That's also when credentials removed by another process are noticed, so keep it short.
+        It must be shorter than ttl, otherwise entries are evicted before that happens.
+    """
+
+    def __init__(self, ttl:float=60, size:int=1000, refresh_interval:float=10):
+        if ttl > 0 and refresh_interval >= ttl:
+            raise ConfigurationError("kedja.credentials_refresh_interval must be shorter than kedja.credentials_cache_ttl")
+        self.ttl = ttl
+        self.size = size
+        self.refresh_interval = refresh_interval
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.size > 0
+
+    def get(self, userid:str, token:str, now:float=None):
+        """ Return a tuple with the cached data and if the expiry in redis should be reset, or None.
+            Only one caller will be told to reset the expiry.
+        """
+        if not self.enabled:
+            return
+        if now is None:
+            now = monotonic()
+        key = (userid, token)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or now - entry[1] >= self.ttl:
+                self._data.pop(key, None)
+                self.misses += 1
+                return
+            self._data.move_to_end(key)
+            self.hits += 1
+            refresh = now - entry[2] >= self.refresh_interval
+            if refresh:
+                entry[2] = now
+            return entry[0], refresh
+
+    def set(self, userid:str, token:str, data:dict, now:float=None):
+        """ Store valid credentials. They're expected to have had their expiry reset just now. """
+        if not self.enabled:
+            return
+        if now is None:
+            now = monotonic()
+        key = (userid, token)
+        with self._lock:
+            # Data, when it was cached, when the expiry was reset
+            self._data[key] = [dict(data), now, now]
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, userid:str, token:str):
+        with self._lock:
+            self._data.pop((userid, token), None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def get_credentials_cache(registry=None):
+    if registry is None:
+        registry = get_current_registry()
+    try:
+        return registry.credentials_cache
+    except AttributeError:
+        settings = registry.settings or {}
+        registry.credentials_cache = cache = CredentialsCache(
+            ttl=float(settings.get('kedja.credentials_cache_ttl', 60)),
+            size=int(settings.get('kedja.credentials_cache_size', 1000)),
+            refresh_interval=float(settings.get('kedja.credentials_refresh_interval', 10)),
+        )
+        return cache
+
+
 def get_valid_credentials(userid:str, token:str, registry=None):
+    if registry is None:
+        registry = get_current_registry()
+    cache = get_credentials_cache(registry)
+    cached = cache.get(userid, token)
+    if cached is not None:
+        data, refresh = cached
+        cred = Credentials(registry=registry, **data)
+        if refresh and cred.reset_expire() == 0:
+            # Removed by some other process
+            cache.invalidate(userid, token)
+            return
+        return cred
     cred = Credentials.load(userid, token, registry)
     if isinstance(cred, Credentials):
+        cache.set(userid, token, cred)
         return cred
 
 
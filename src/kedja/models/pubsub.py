@@ -0,0 +1,248 @@
+""" Publish wall changes through redis pub/sub so each worker can push them to connected clients.
+
+Changes are collected during the transaction and published once it's committed,
+so aborted or retried requests never reach any client.
+
+Each process has one subscription for all walls, held by the EventHub. It passes the messages on
+to the event streams of connected clients.
+"""
+import json
+from logging import getLogger
+from queue import Empty
+from queue import Full
+from queue import Queue
+from threading import Lock
+from threading import Thread
+from time import sleep
+from time import time
+from weakref import WeakKeyDictionary
+
+import transaction
+from pyramid.threadlocal import get_current_registry
+from pyramid.threadlocal import get_current_request
+from redis import RedisError
+from zope.interface import implementer
+
+from kedja.interfaces import IWallChanged
+from kedja.utils import get_redis_conn
+from kedja.utils import get_redis_pubsub_conn
+
+
+logger = getLogger(__name__)
+_pending = WeakKeyDictionary()
+_hub_lock = Lock()
+
+
+@implementer(IWallChanged)
+class WallChanged(object):
+    __doc__ = IWallChanged.__doc__
+
+    def __init__(self, wall, revision:int, action:str, kind:str, id:int, count:int=1):
+        self.wall = wall
+        self.revision = revision
+        self.action = action
+        self.kind = kind
+        self.id = id
+        self.count = count
+
+    def asdict(self):
+        if self.id is None:
+            # Many changes at once, clients fetch them from the changes endpoint instead
+            return {'revision': self.revision, 'action': self.action, 'kind': self.kind, 'count': self.count}
+        return {'revision': self.revision, 'action': self.action, 'kind': self.kind, 'id': self.id}
+
+
+def get_channel(rid:int):
+    return "kedja.wall.{}".format(rid)
+
+
+def _get_transaction():
+    request = get_current_request()
+    tm = getattr(request, 'tm', None)
+    if tm is None:
+        return transaction.get()
+    return tm.get()
+
+
+def queue_wall_change(event):
+    """ Add the change to the messages that will be published when the current transaction commits. """
+    txn = _get_transaction()
+    messages = _pending.get(txn)
+    if messages is None:
+        _pending[txn] = messages = {}
+        txn.addAfterCommitHook(publish_changes, args=(get_current_registry(), messages))
+    messages.setdefault(event.wall.rid, []).append(event.asdict())
+
+
+def publish_changes(status, registry, messages):
+    """ After commit hook. Publishes one message per wall with all changes from the transaction. """
+    if not status:
+        return
+    conn = get_redis_conn(registry)
+    pipe = conn.pipeline(transaction=False)
+    for (rid, changes) in messages.items():
+        payload = {'revision': changes[-1]['revision'], 'changes': changes}
+        pipe.publish(get_channel(rid), json.dumps(payload))
+    try:
+        pipe.execute()
+    except RedisError:
+        # The transaction is already committed, clients will catch up via the changes endpoint
+        logger.exception("Publishing changes for walls %s failed", ", ".join(str(x) for x in messages))
+
+
+class EventStream(object):
+    """ Messages for one connected client. The EventHub puts them here and iter_events reads them.
+        If the client can't keep up and the queue is full, the stream is marked as overflowed
+        and should be ended. The client will catch up through the changes endpoint when it reconnects.
+    """
+
+    def __init__(self, hub, rid:int, maxsize:int=100):
+        self.hub = hub
+        self.rid = rid
+        self.overflowed = False
+        self.queue = Queue(maxsize=maxsize)
+
+    def put(self, data:bytes):
+        try:
+            self.queue.put_nowait(data)
+        except Full:
+            self.overflowed = True
+
+    def get(self, timeout:float):
+        """ Return the next message, or None if nothing arrives within timeout seconds. """
+        try:
+            return self.queue.get(timeout=timeout)
+        except Empty:
+            return
+
+    def close(self):
+        self.hub.discard(self)
+
+
+class EventHub(object):
+    """ Holds one redis subscription per process for changes in all walls, and passes each message on
+        to the streams of that wall. The subscription is read by a thread of its own.
+
+        Every open stream still keeps a worker thread busy, so at most max_streams may be open at the same time.
+    """
+
+    def __init__(self, registry, max_streams:int=2):
+        self.registry = registry
+        self.max_streams = max_streams
+        self.streams = {}
+        self.count = 0
+        self.lock = Lock()
+        self.pubsub = None
+        self.thread = None
+        self.running = False
+
+    def open(self, rid:int):
+        """ Return an EventStream for the wall with this rid, or None if max_streams are already open. """
+        with self.lock:
+            if self.count >= self.max_streams:
+                return
+            if self.thread is None:
+                self.start()
+            stream = EventStream(self, rid)
+            self.streams.setdefault(rid, set()).add(stream)
+            self.count += 1
+            return stream
+
+    def discard(self, stream:EventStream):
+        with self.lock:
+            streams = self.streams.get(stream.rid, set())
+            if stream in streams:
+                streams.remove(stream)
+                self.count -= 1
+                if not streams:
+                    del self.streams[stream.rid]
+
+    def start(self):
+        self.pubsub = get_redis_pubsub_conn(self.registry).pubsub(ignore_subscribe_messages=True)
+        self.pubsub.psubscribe(get_channel('*'))
+        self.running = True
+        self.thread = Thread(target=self.run, name='kedja-events', daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while self.running:
+            try:
+                message = self.pubsub.get_message(timeout=1)
+            except RedisError:
+                # The subscription is restored when the connection is
+                logger.exception("Reading wall changes from redis failed")
+                sleep(1)
+                continue
+            if message is not None and message['type'] == 'pmessage':
+                self.dispatch(message['channel'], message['data'])
+
+    def dispatch(self, channel:bytes, data:bytes):
+        rid = int(channel.rsplit(b'.', 1)[1])
+        with self.lock:
+            streams = tuple(self.streams.get(rid, ()))
+        for stream in streams:
+            stream.put(data)
+
+    def stop(self):
+        """ Stop reading the subscription. The hub will start again when a stream is opened. """
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.pubsub is not None:
+            self.pubsub.close()
+            self.pubsub = None
+
+
+def get_event_hub(registry=None):
+    """ Return the EventHub of this process. Set kedja.events_max_streams to allow more than 2 open streams,
+        and make sure there are more worker threads than that.
+    """
+    if registry is None:
+        registry = get_current_registry()
+    with _hub_lock:
+        try:
+            return registry.event_hub
+        except AttributeError:
+            max_streams = int(registry.settings.get('kedja.events_max_streams', 2))
+            registry.event_hub = hub = EventHub(registry, max_streams=max_streams)
+            return hub
+
+
+def subscribe(rid:int, registry=None):
+    """ Return an EventStream with changes for the wall with this rid,
+        or None if there are too many open streams already.
+    """
+    return get_event_hub(registry).open(rid)
+
+
+def iter_events(stream:EventStream, revision:int, max_age:float=300, keepalive:float=15):
+    """ Yield server-sent events as bytes from an EventStream, starting with the current revision.
+
+        This never touches the database, so the request can release its ZODB connection
+        before the response is streamed. It stops after max_age seconds, or if the stream overflowed,
+        and the client is expected to reconnect and catch up using the last event id as revision
+        for the changes endpoint.
+    """
+    try:
+        yield 'retry: 3000\nid: {0}\nevent: revision\ndata: {{"revision": {0}}}\n\n'.format(revision).encode()
+        started = last_sent = time()
+        while not stream.overflowed:
+            remaining = max_age - (time() - started)
+            if remaining <= 0:
+                break
+            data = stream.get(timeout=min(keepalive, remaining))
+            if data is None:
+                if time() - last_sent >= keepalive:
+                    yield b': keepalive\n\n'
+                    last_sent = time()
+                continue
+            revision = json.loads(data)['revision']
+            yield b'id: %d\nevent: change\ndata: %s\n\n' % (revision, data)
+            last_sent = time()
+    finally:
+        stream.close()
+
+
+def includeme(config):
+    config.add_subscriber(queue_wall_change, IWallChanged)
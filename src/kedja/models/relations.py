@@ -1,16 +1,29 @@
 from random import randrange
 
 from BTrees import family64
-from BTrees.OOBTree import OOSet
+from BTrees.Length import Length
 from arche.interfaces import IResourceWillBeRemoved
 from persistent import Persistent
 from pyramid.traversal import find_interface
 
 from kedja.interfaces import ICard
+from kedja.models.changelog import ADDED
+from kedja.models.changelog import RELATION
+from kedja.models.changelog import REMOVED
+from kedja.models.changelog import UPDATED
+from kedja.models.conflicts import RelationsBTree
 from kedja.interfaces import ICollection
 from kedja.interfaces import IWall
 
 
+JS_MAXINT = 2**53-1
+
+
+def canonical_members(rids):
+    """ The same members in any order, without duplicates. """
+    return tuple(sorted(set(rids)))
+
+
 # FIXME: Might be smarter to have these as resources
 class RelationJSON(object):
 
@@ -43,35 +56,107 @@ class RelationJSON(object):
 
 
 class RelationMap(Persistent):
+    """ Keeps track of relations between resources within a wall.
+
+        relation_to_rids maps relation ids to a tuple of member rids.
+        rid_to_relations maps member rids to relation ids. They're stored as a tuple within the BTree bucket,
+        so a wall with many cards doesn't mean many small persistent objects. Rids with more than
+        inline_limit relations get an integer TreeSet instead, so adding to them won't rewrite everything.
+
+        Two transactions linking relations to the same rid are merged by RelationsBTree rather than retried.
+
+        Older walls may have OOSets in rid_to_relations, they'll be converted as they're changed, or by compact().
+        compact() also moves rid_to_relations of older walls to a RelationsBTree.
+    """
     family = family64
+    __parent__ = None
+    inline_limit = 32
+    relation_id_salt_bits = 10
 
     def __init__(self):
-        self.rid_to_relations = self.family.IO.BTree()
+        self.rid_to_relations = RelationsBTree()
         self.relation_to_rids = self.family.IO.BTree()
+        self.members_to_relation = self.family.OI.BTree()
+        self.relation_counter = Length()
 
     def __getitem__(self, relation_id:int):
         return self.relation_to_rids[relation_id]
 
     def __delitem__(self, relation_id:int):
-        for x in self.get(relation_id, ()):
-            linked = self.rid_to_relations.get(x, ())
-            if relation_id in linked:
-                linked.remove(relation_id)
-                if not linked:
-                    del self.rid_to_relations[x]
+        self._remove(relation_id)
+        self._changed(REMOVED, relation_id)
+
+    def _remove(self, relation_id:int):
+        members = self.get(relation_id, ())
+        for x in members:
+            self._unlink(x, relation_id)
+        index = self.get_members_index()
+        key = canonical_members(members)
+        if index.get(key, None) == relation_id:
+            del index[key]
         del self.relation_to_rids[relation_id]
 
+    def _link(self, rid:int, relation_id:int):
+        linked = self.rid_to_relations.get(rid, ())
+        if isinstance(linked, self.family.II.TreeSet):
+            linked.add(relation_id)
+        elif relation_id not in linked:
+            self._store(rid, tuple(linked) + (relation_id,))
+
+    def _unlink(self, rid:int, relation_id:int):
+        linked = self.rid_to_relations.get(rid, ())
+        if relation_id not in linked:
+            return
+        if isinstance(linked, self.family.II.TreeSet) and len(linked) > self.inline_limit // 2:
+            # Keep the set until it's a lot smaller, so a rid around the limit won't switch back and forth
+            linked.remove(relation_id)
+            return
+        self._store(rid, tuple(x for x in linked if x != relation_id))
+
+    def _store(self, rid:int, relation_ids:tuple):
+        if not relation_ids:
+            del self.rid_to_relations[rid]
+        elif len(relation_ids) > self.inline_limit:
+            self.rid_to_relations[rid] = self.family.II.TreeSet(relation_ids)
+        else:
+            self.rid_to_relations[rid] = relation_ids
+
+    def compact(self):
+        """ Convert relation ids stored in the old format. Returns the number of converted rids. """
+        converted = set()
+        for (rid, linked) in list(self.rid_to_relations.items()):
+            if not isinstance(linked, (tuple, self.family.II.TreeSet)):
+                self._store(rid, tuple(linked))
+                converted.add(rid)
+        if not isinstance(self.rid_to_relations, RelationsBTree):
+            rid_to_relations = RelationsBTree()
+            rid_to_relations.update(self.rid_to_relations)
+            self.rid_to_relations = rid_to_relations
+            converted.update(rid_to_relations.keys())
+        return len(converted)
+
     def __setitem__(self, relation_id, rids):
         assert isinstance(relation_id, int)
-        self.can_create_relation(rids)
-        if relation_id in self:
-            del self[relation_id]
+        self.can_create_relation(rids, relation_id=relation_id)
+        existed = relation_id in self
+        if existed:
+            self._remove(relation_id)
         for x in rids:
             assert isinstance(x, int)
-            if x not in self.rid_to_relations:
-                self.rid_to_relations[x] = OOSet()
-            self.rid_to_relations[x].add(relation_id)
+            self._link(x, relation_id)
         self.relation_to_rids[relation_id] = tuple(rids)
+        self.get_members_index()[canonical_members(rids)] = relation_id
+        self._changed(UPDATED if existed else ADDED, relation_id)
+
+    def _changed(self, action:str, relation_id:int):
+        wall = find_interface(self, IWall)
+        if wall is not None:
+            wall.log_change(action, RELATION, relation_id)
+
+    def _changed_many(self, action:str, relation_ids):
+        wall = find_interface(self, IWall)
+        if wall is not None and relation_ids:
+            wall.log_changes(action, RELATION, relation_ids)
 
     def __contains__(self, relation_id:int):
         return relation_id in self.relation_to_rids
@@ -81,17 +166,68 @@ class RelationMap(Persistent):
         self[relation_id] = rids
         return relation_id
 
-    def can_create_relation(self, rids):
-        """ Make sure a relation don't exist between these rids already"""
-        if len(rids) < 2:
+    def bulk_create(self, members_lists, replace=False):
+        """ Create many relations at once and return their ids, in the same order.
+            With replace, all existing relations are removed first.
+
+            Everything is validated before anything is changed, and each rid in rid_to_relations is only written once.
+            The wall logs the removed and the added relations as one change each, see Wall.log_changes
+        """
+        index = self.get_members_index()
+        keys = set()
+        for rids in members_lists:
+            key = canonical_members(rids)
+            if len(key) < 2:
+                raise ValueError("It takes at least 2 to tango!")
+            if key in keys:
+                raise ValueError("Same members more than once: %s" % ", ".join(str(x) for x in key))
+            if not replace and key in index:
+                raise ValueError("Already has relation: %s" % index[key])
+            keys.add(key)
+        if replace:
+            removed = list(self.keys())
+            self.rid_to_relations.clear()
+            self.relation_to_rids.clear()
+            index.clear()
+            self._changed_many(REMOVED, removed)
+        relation_ids = []
+        linked = {}
+        for rids in members_lists:
+            relation_id = self.new_relation_id()
+            self.relation_to_rids[relation_id] = tuple(rids)
+            key = canonical_members(rids)
+            index[key] = relation_id
+            for x in key:
+                linked.setdefault(x, []).append(relation_id)
+            relation_ids.append(relation_id)
+        for (rid, added) in linked.items():
+            existing = self.rid_to_relations.get(rid, ())
+            if isinstance(existing, self.family.II.TreeSet):
+                existing.update(added)
+            else:
+                self._store(rid, tuple(existing) + tuple(added))
+        self._changed_many(ADDED, relation_ids)
+        return relation_ids
+
+    def can_create_relation(self, rids, relation_id=None):
+        """ Make sure a relation don't exist between these rids already, regardless of order.
+            relation_id is the relation about to be set, it won't count as a duplicate of itself.
+        """
+        key = canonical_members(rids)
+        if len(key) < 2:
             raise ValueError("It takes at least 2 to tango!")
-        rids = tuple(rids)
-        existing = self.find_relations(rids[0], *rids[1:])
-        if existing:
-            cmp_set = set(rids)
-            for rel_id in existing:
-                if self.get(rel_id) == cmp_set:
-                    raise ValueError("Already has relations: %s" % ", ".join(existing))
+        existing = self.get_members_index().get(key, None)
+        if existing is not None and existing != relation_id:
+            raise ValueError("Already has relation: %s" % existing)
+
+    def get_members_index(self):
+        """ Canonical members -> relation id. Walls created before it existed will have it built on first use. """
+        index = getattr(self, 'members_to_relation', None)
+        if index is None:
+            self.members_to_relation = index = self.family.OI.BTree()
+            for (relation_id, members) in self.relation_to_rids.items():
+                index[canonical_members(members)] = relation_id
+        return index
 
     def get(self, relation_id, default=None):
         return self.relation_to_rids.get(relation_id, default)
@@ -108,15 +244,21 @@ class RelationMap(Persistent):
 
     def new_relation_id(self):
         """ Get an unused ID. It's not reserved in any way, so make sure to use it within the current transaction.
-            In the unlikely case that the same ID would be used, a transaction error will occur.
+
+            IDs come from a counter, shifted to make room for a few random bits. That keeps new keys at the end of
+            the BTree and small enough for Javascript, while transactions creating relations at the same time
+            still get different IDs. The counter is a Length, so it won't cause conflicts by itself.
         """
-        relation_id = None
-        js_maxint = 2**53-1
-        while not relation_id:  # We don't like 0 either
-            relation_id = randrange(-js_maxint, js_maxint)
-            if relation_id in self.relation_to_rids: # pragma: no cover
-                relation_id = None
-        return relation_id
+        counter = getattr(self, 'relation_counter', None)
+        if counter is None:
+            self.relation_counter = counter = Length()
+        bits = self.relation_id_salt_bits
+        while True:
+            counter.change(1)
+            relation_id = (counter() << bits) | randrange(1 << bits)
+            assert relation_id <= JS_MAXINT, "Out of relation ids"
+            if relation_id not in self.relation_to_rids:
+                return relation_id
 
     def find_relations(self, rid:int, *rids):
         """ Get relations that has one or more rids in them. All RIDs specified will be required for a match.
@@ -136,6 +278,128 @@ class RelationMap(Persistent):
             found.update(self.find_relations(x))
         return found
 
+    def linked_rids(self, rid:int):
+        """ Return all rids that share a relation with rid. """
+        found = set()
+        for relation_id in self.rid_to_relations.get(rid, ()):
+            found.update(self.relation_to_rids.get(relation_id, ()))
+        found.discard(rid)
+        return found
+
+    def neighbours(self, rid:int, depth:int=1):
+        """ Return a dict with rids reachable from rid within depth steps, and how many steps away they are. """
+        found = {rid: 0}
+        current = [rid]
+        for distance in range(1, depth + 1):
+            upcoming = []
+            for x in current:
+                for linked in self.linked_rids(x):
+                    if linked not in found:
+                        found[linked] = distance
+                        upcoming.append(linked)
+            if not upcoming:
+                break
+            current = upcoming
+        del found[rid]
+        return found
+
+    def shortest_path(self, source:int, target:int, max_depth:int=None):
+        """ Return a list of rids from source to target, or None if they aren't connected.
+            Searches from both ends, expanding the smaller side, so only a small part of the graph is visited.
+        """
+        if source == target:
+            return [source]
+        components = self._get_cached_components()
+        if components is not None and components[1].get(source, -1) != components[1].get(target, -2):
+            return
+        start = source
+        forward = {source: None}
+        backward = {target: None}
+        forward_edge = [source]
+        backward_edge = [target]
+        steps = 0
+        while forward_edge and backward_edge:
+            if max_depth is not None and steps >= max_depth:
+                return
+            steps += 1
+            if len(forward_edge) > len(backward_edge):
+                forward, backward = backward, forward
+                forward_edge, backward_edge = backward_edge, forward_edge
+            upcoming = []
+            meetings = []
+            for x in forward_edge:
+                for linked in self.linked_rids(x):
+                    if linked in forward:
+                        continue
+                    forward[linked] = x
+                    if linked in backward:
+                        meetings.append(linked)
+                    upcoming.append(linked)
+            if meetings:
+                # Finish the level before picking, the other side may have reached them at different depths
+                paths = [_trace(forward, x)[::-1] + _trace(backward, x)[1:] for x in meetings]
+                path = min(paths, key=len)
+                if path[0] != start:
+                    path.reverse()
+                return path
+            forward_edge = upcoming
+
+    def components(self):
+        """ Return groups of rids connected to each other through relations, largest first.
+            The result is kept in memory until something in the wall changes.
+        """
+        cached = self._get_cached_components()
+        if cached is not None:
+            return cached[0]
+        parents = {}
+
+        def _find(x):
+            root = x
+            while parents[root] != root:
+                root = parents[root]
+            while parents[x] != root:
+                parents[x], x = root, parents[x]
+            return root
+
+        for members in self.relation_to_rids.values():
+            first = members[0]
+            parents.setdefault(first, first)
+            for x in members[1:]:
+                parents.setdefault(x, x)
+                a, b = _find(first), _find(x)
+                if a != b:
+                    parents[b] = a
+        groups = {}
+        for x in parents:
+            groups.setdefault(_find(x), []).append(x)
+        results = sorted((sorted(x) for x in groups.values()), key=lambda x: (-len(x), x[0]))
+        lookup = {}
+        for (i, group) in enumerate(results):
+            for x in group:
+                lookup[x] = i
+        version = self._get_version()
+        if version is not None:
+            self._v_components = (version, results, lookup)
+        return results
+
+    def _get_cached_components(self):
+        cached = getattr(self, '_v_components', None)
+        if cached is not None and cached[0] == self._get_version():
+            return cached[1:]
+
+    def _get_version(self):
+        """ Something unique for the committed state of the wall, or None if it has uncommitted changes.
+            The revision counter is written on every change, so its serial changes too.
+        """
+        wall = find_interface(self, IWall)
+        counter = getattr(wall, '_revision', None)
+        if counter is None or counter._p_jar is None:
+            return
+        counter()  # Make sure it's loaded
+        if counter._p_changed:
+            return
+        return counter._p_serial
+
     def keys(self):
         return self.relation_to_rids.keys()
 
@@ -143,6 +407,15 @@ class RelationMap(Persistent):
         return len(self.relation_to_rids)
 
 
+def _trace(parents, rid):
+    """ Follow parents from rid back to where the search started. """
+    path = [rid]
+    while parents[rid] is not None:
+        rid = parents[rid]
+        path.append(rid)
+    return path
+
+
 def remove_contained_cards_relations(event):
     """ If a collection is removed, cleanup all relevant relations to/from cards that will be removed.
     """
@@ -162,6 +435,17 @@ def remove_card_relations(event):
         del wall.relations_map[relation_id]
 
 
+def compact_relation_maps(root):
+    """ Convert the relations of all walls to the current storage format. Commit afterwards.
+        Returns the number of converted rids.
+    """
+    converted = 0
+    for wall in root.values():
+        if IWall.providedBy(wall):
+            converted += wall.relations_map.compact()
+    return converted
+
+
 def includeme(config):
     config.add_subscriber(remove_contained_cards_relations, IResourceWillBeRemoved, context=ICollection)
     config.add_subscriber(remove_card_relations, IResourceWillBeRemoved, context=ICard)
@@ -0,0 +1,65 @@
+from arche.interfaces import IResourceWillBeRemoved
+from pyramid.threadlocal import get_current_request
+
+
+class ResourceCache(object):
+    """ Resources and permission checks looked up during one request.
+        Validators and views tend to ask for the same rids and permissions several times,
+        this makes sure each of them is only looked up once.
+    """
+
+    def __init__(self):
+        self.resources = {}
+        self.permissions = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_resource(self, root, rid:int):
+        """ Return the resource with this rid or None. """
+        try:
+            resource = self.resources[rid]
+        except KeyError:
+            self.misses += 1
+            resource = self.resources[rid] = root.rid_map.get_resource(rid)
+            return resource
+        self.hits += 1
+        return resource
+
+    def has_permission(self, request, resource, permission:str):
+        """ Check a permission type the same way as the content registry does. """
+        # Keep a reference to resource, so the id can't be reused during this request
+        key = (id(resource), permission)
+        try:
+            allowed = self.permissions[key][1]
+        except KeyError:
+            self.misses += 1
+            allowed = request.registry.content.has_permission_type(resource, request, permission)
+            self.permissions[key] = (resource, allowed)
+            return allowed
+        self.hits += 1
+        return allowed
+
+    def invalidate_permissions(self):
+        self.permissions.clear()
+
+    def clear(self):
+        self.resources.clear()
+        self.permissions.clear()
+
+
+def resource_cache(request):
+    """ See ResourceCache """
+    return ResourceCache()
+
+
+def clear_resource_cache(event):
+    """ Rids within anything removed won't exist anymore. """
+    request = get_current_request()
+    cache = getattr(request, 'resource_cache', None)
+    if cache is not None:
+        cache.clear()
+
+
+def includeme(config):
+    config.add_request_method(resource_cache, reify=True)
+    config.add_subscriber(clear_resource_cache, IResourceWillBeRemoved)
@@ -0,0 +1,49 @@
+from logging import getLogger
+
+from pyramid.threadlocal import get_current_registry
+from zope.interface import implementer
+
+from kedja.interfaces import IWallSnapshots
+from kedja.utils import get_redis_conn
+
+
+logger = getLogger(__name__)
+
+
+@implementer(IWallSnapshots)
+class WallSnapshots(object):
+    __doc__ = IWallSnapshots.__doc__
+    prefix = 'wsnap'
+
+    def __init__(self, registry=None):
+        if registry is None:
+            registry = get_current_registry()
+        self.registry = registry
+        self.expires = int(registry.settings.get('kedja.snapshot_expires', 3600))
+
+    def get_key(self, wall, name:str):
+        return "{}.{}.{}".format(self.prefix, wall.rid, name)
+
+    def get(self, wall, name:str):
+        value = get_redis_conn(self.registry).get(self.get_key(wall, name))
+        if value is not None:
+            revision, _, payload = value.partition(b':')
+            if int(revision) == wall.revision:
+                return payload
+
+    def set(self, wall, name:str, payload:bytes):
+        # The revision is stored with the payload, so a new revision replaces the old snapshot
+        value = str(wall.revision).encode() + b':' + payload
+        get_redis_conn(self.registry).setex(self.get_key(wall, name), self.expires, value)
+
+    def get_or_create(self, wall, name:str, factory):
+        payload = self.get(wall, name)
+        if payload is None:
+            logger.debug("No snapshot %r for wall %s at revision %s", name, wall.rid, wall.revision)
+            payload = factory()
+            self.set(wall, name, payload)
+        return payload
+
+
+def includeme(config):
+    config.registry.registerUtility(WallSnapshots(config.registry), IWallSnapshots)
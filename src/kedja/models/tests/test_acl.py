@@ -76,3 +76,26 @@ class NamedACLTests(TestCase):
         mapping = {'1': [manager]}
         self.assertEqual(list(acl.get_translated_acl(mapping)),
                          [('Allow', '1', ALL_PERMISSIONS)])
+
+    def test_permits(self):
+        acl = self._cut('test')
+        manager = self.Role('Manager')
+        other = self.Role('Other')
+        acl.add_allow(manager, ['filibuster', 'inspect'])
+        acl.add_deny(other, 'inspect')
+        acl.add_allow(Everyone, 'view')
+        acl.compile()
+        self.assertEqual(Allow, acl.permits({manager}, 'filibuster'))
+        self.assertEqual(Deny, acl.permits({other}, 'inspect'))
+        self.assertEqual(Allow, acl.permits({Everyone}, 'view'))
+        self.assertEqual(None, acl.permits({other, Everyone}, 'filibuster'))
+
+    def test_permits_first_match_wins(self):
+        acl = self._cut('test')
+        manager = self.Role('Manager')
+        other = self.Role('Other')
+        acl.add_deny(other, 'inspect')
+        acl.add_allow(manager, ALL_PERMISSIONS)
+        self.assertEqual(Deny, acl.permits({manager, other}, 'inspect'))
+        self.assertEqual(Allow, acl.permits({manager, other}, 'filibuster'))
+        self.assertEqual(Allow, acl.permits({manager}, 'inspect'))
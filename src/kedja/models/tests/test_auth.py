@@ -3,6 +3,9 @@ from unittest import TestCase
 from pyramid import testing
 from pyramid.authorization import ACLAuthorizationPolicy
 from pyramid.request import apply_request_extensions
+from pyramid.security import ALL_PERMISSIONS
+from pyramid.security import Authenticated
+from pyramid.security import Everyone
 from zope.interface.verify import verifyObject
 
 from kedja.interfaces import ICredentials
@@ -94,6 +97,85 @@ class HTTPHeaderAuthenticationPolicyTests(TestCase):
         self.assertEqual(None, request.authenticated_userid)
 
 
+class NamedACLAuthorizationPolicyTests(TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp()
+        self.config.include('kedja.config')
+
+    def tearDown(self):
+        testing.tearDown()
+
+    @property
+    def _cut(self):
+        from kedja.models.auth import NamedACLAuthorizationPolicy
+        return NamedACLAuthorizationPolicy
+
+    def _fixture(self):
+        from arche.folder import Folder
+        from kedja.models.acl import NamedACL
+        from kedja.resources.security import SecurityAwareMixin
+
+        class DummySecurityAware(Folder, SecurityAwareMixin):
+            acl_name = ""
+
+        parent_acl = NamedACL('parent')
+        parent_acl.add_allow('Admin', ['edit', 'comment'])
+        parent_acl.add_deny('User', 'edit')
+        parent_acl.add_allow('User', ['comment', 'edit'])
+        parent_acl.add_allow(Everyone, 'view')
+        parent_acl.add_deny(Authenticated, 'spy')
+        parent_acl.add_allow('Admin', ALL_PERMISSIONS)
+        child_acl = NamedACL('child')
+        child_acl.add_allow('Owner', ['edit', 'delete'])
+        child_acl.add_deny(Everyone, 'comment')
+        self.config.add_acl(parent_acl)
+        self.config.add_acl(child_acl)
+        parent = DummySecurityAware(acl_name='parent')
+        parent['c'] = child = DummySecurityAware(acl_name='child')
+        parent.add_user_roles(1, 'Admin')
+        parent.add_user_roles(2, 'User')
+        parent.add_user_roles(4, 'User', 'Admin')
+        child.add_user_roles(3, 'Owner')
+        return parent
+
+    def test_same_as_acl_policy(self):
+        parent = self._fixture()
+        child = parent['c']
+        for userid in ('1', '2', '3', '4', '5', None):
+            self.config.testing_securitypolicy(userid=userid)
+            request = testing.DummyRequest()
+            self.config.begin(request)
+            principals = [Everyone]
+            if userid:
+                principals.extend([Authenticated, userid])
+            for context in (parent, child):
+                for permission in ('edit', 'comment', 'view', 'spy', 'delete', '404'):
+                    expected = bool(ACLAuthorizationPolicy().permits(context, principals, permission))
+                    result = bool(self._cut().permits(context, principals, permission))
+                    self.assertEqual(expected, result, "%s on %s for %s" % (permission, context.acl_name, userid))
+
+    def test_roles_cached_on_request(self):
+        parent = self._fixture()
+        child = parent['c']
+        request = testing.DummyRequest()
+        request.computed_acl_cache = {}
+        self.config.begin(request)
+        principals = [Everyone, Authenticated, '3']
+        obj = self._cut()
+        self.assertTrue(obj.permits(child, principals, 'view'))
+        self.assertEqual(2, len(request.computed_acl_cache))
+        calls = []
+        parent.get_roles = child.get_roles = lambda userid: calls.append(userid)
+        self.assertTrue(obj.permits(child, principals, 'edit'))
+        self.assertFalse(obj.permits(child, principals, 'spy'))
+        self.assertEqual([], calls)
+        del parent.get_roles, child.get_roles
+        # Changed roles clear the cache
+        child.add_user_roles(3, 'Other')
+        self.assertEqual({}, request.computed_acl_cache)
+
+
 class OneTimeRegistrationTokenTests(TestCase):
 
     def setUp(self):
@@ -128,6 +210,16 @@ class OneTimeRegistrationTokenTests(TestCase):
         result = obj.consume(temp_token)
         self.assertEqual(payload, result)
 
+    def test_consume_only_once(self):
+        request = testing.DummyRequest()
+        apply_request_extensions(request)
+        root = request.registry.content('Root')
+        obj = self._cut(root)
+        temp_token = obj.create({'hello': 'world'}, registry=self.config.registry)
+        self.assertTrue(obj.consume(temp_token))
+        self.assertEqual(None, obj.consume(temp_token))
+        self.assertFalse(obj.validate(temp_token))
+
     def test_integration(self):
         self.config.include('kedja.models.auth')
         request = testing.DummyRequest()
@@ -180,6 +272,15 @@ class OneTimeAuthTokenTests(TestCase):
         self.assertTrue(ICredentials.providedBy(cred_returned))
         self.assertEqual(cred_returned, cred)
 
+    def test_consume_only_once(self):
+        request = testing.DummyRequest()
+        apply_request_extensions(request)
+        root, cred = self._fixture(request)
+        obj = self._cut(root)
+        temp_token = obj.create(cred, registry=self.config.registry)
+        self.assertTrue(obj.consume('10', temp_token))
+        self.assertEqual(None, obj.consume('10', temp_token))
+
     def test_integration(self):
         self.config.include('kedja.models.auth')
         request = testing.DummyRequest()
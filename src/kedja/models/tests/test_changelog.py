@@ -0,0 +1,89 @@
+from unittest import TestCase
+
+from pyramid import testing
+
+
+class ChangeLogTests(TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp()
+
+    def tearDown(self):
+        testing.tearDown()
+
+    @property
+    def _cut(self):
+        from kedja.models.changelog import ChangeLog
+        return ChangeLog
+
+    def test_since(self):
+        obj = self._cut()
+        obj.append(1, 'added', 'resource', 10)
+        obj.append(2, 'updated', 'resource', 11)
+        obj.append(3, 'added', 'relation', 1)
+        obj.append(4, 'removed', 'resource', 12)
+        results = obj.since(0)
+        self.assertEqual(results['resource'], {'added': [10], 'updated': [11], 'removed': [12]})
+        self.assertEqual(results['relation'], {'added': [1], 'updated': [], 'removed': []})
+        results = obj.since(2)
+        self.assertEqual(results['resource'], {'added': [], 'updated': [], 'removed': [12]})
+
+    def test_since_collapses(self):
+        obj = self._cut()
+        obj.append(1, 'added', 'resource', 10)
+        obj.append(2, 'updated', 'resource', 10)
+        obj.append(3, 'added', 'resource', 11)
+        obj.append(4, 'removed', 'resource', 11)
+        obj.append(5, 'removed', 'relation', 1)
+        obj.append(6, 'added', 'relation', 1)
+        results = obj.since(0)
+        self.assertEqual(results['resource'], {'added': [10], 'updated': [], 'removed': []})
+        self.assertEqual(results['relation'], {'added': [], 'updated': [1], 'removed': []})
+
+    def test_since_many_ids(self):
+        obj = self._cut()
+        obj.append(1, 'added', 'relation', 1)
+        obj.append(2, 'removed', 'relation', (1, 2))
+        obj.append(3, 'added', 'relation', (3, 4))
+        results = obj.since(0)
+        self.assertEqual(results['relation'], {'added': [3, 4], 'updated': [], 'removed': [2]})
+
+    def test_compact(self):
+        obj = self._cut()
+        obj.limit = 10
+        for i in range(1, 31):
+            obj.append(i, 'updated', 'resource', i)
+        self.assertLess(len(obj.entries), 30)
+        self.assertFalse(obj.covers(5))
+        self.assertEqual(None, obj.since(5))
+        self.assertEqual(obj.since(25)['resource']['updated'], [26, 27, 28, 29, 30])
+
+    def test_wall_integration(self):
+        self.config.include('kedja.testing.minimal')
+        self.config.include('kedja.resources')
+        root = self.config.registry.content('Root')
+        root['wall'] = wall = self.config.registry.content('Wall', rid=2)
+        revision = wall.revision
+        wall.relations_map[1] = [10, 20]
+        wall.relations_map[1] = [10, 20, 30]
+        self.assertEqual(wall.revision, revision + 2)
+        self.assertEqual(wall.changes_since(revision)['relation'], {'added': [1], 'updated': [], 'removed': []})
+        self.assertEqual(wall.changes_since(revision + 1)['relation'], {'added': [], 'updated': [1], 'removed': []})
+
+    def test_wall_bulk_create(self):
+        from kedja.interfaces import IWallChanged
+        self.config.include('kedja.testing.minimal')
+        self.config.include('kedja.resources')
+        events = []
+        self.config.add_subscriber(events.append, IWallChanged)
+        root = self.config.registry.content('Root')
+        root['wall'] = wall = self.config.registry.content('Wall', rid=2)
+        wall.relations_map[1] = [10, 20]
+        revision = wall.revision
+        relation_ids = wall.relations_map.bulk_create([[x, x + 1] for x in range(100, 2100, 2)], replace=True)
+        self.assertEqual(wall.revision, revision + 2)
+        changes = wall.changes_since(revision)['relation']
+        self.assertEqual(sorted(relation_ids), sorted(changes['added']))
+        self.assertEqual([1], changes['removed'])
+        self.assertEqual({'revision': revision + 2, 'action': 'added', 'kind': 'relation', 'count': 1000},
+                         events[-1].asdict())
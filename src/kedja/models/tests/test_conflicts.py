@@ -0,0 +1,243 @@
+import shutil
+import tempfile
+from unittest import TestCase
+
+import transaction
+from ZODB import DB
+from ZODB.FileStorage import FileStorage
+from ZODB.POSException import ConflictError
+from pyramid import testing
+
+
+class MergeTuplesTests(TestCase):
+
+    @property
+    def _fut(self):
+        from kedja.models.conflicts import merge_tuples
+        return merge_tuples
+
+    def test_added_on_both(self):
+        self.assertEqual((1, 2, 3, 4), self._fut((1, 2), (1, 2, 3), (1, 2, 4)))
+
+    def test_added_and_removed(self):
+        self.assertEqual((2, 3), self._fut((1, 2), (1, 2, 3), (2,)))
+
+    def test_same_change(self):
+        self.assertEqual((1, 2, 3), self._fut((1, 2), (1, 2, 3), (1, 2, 3)))
+
+    def test_reordered_on_one_side(self):
+        self.assertEqual((2, 1), self._fut((1, 2), (1, 2), (2, 1)))
+
+    def test_reordered_on_both(self):
+        self.assertRaises(ConflictError, self._fut, (1, 2), (1, 2, 3), (2, 1))
+
+
+class ResolveAttributeConflictsMixinTests(TestCase):
+
+    @property
+    def _cut(self):
+        from kedja.models.conflicts import ResolveAttributeConflictsMixin
+        return ResolveAttributeConflictsMixin
+
+    def test_different_attributes(self):
+        obj = self._cut()
+        old = {'title': 'Hello', 'int_indicator': 1}
+        committed = {'title': 'Hello', 'int_indicator': 2}
+        new = {'title': 'World', 'int_indicator': 1}
+        self.assertEqual({'title': 'World', 'int_indicator': 2}, obj._p_resolveConflict(old, committed, new))
+
+    def test_same_attribute(self):
+        obj = self._cut()
+        old = {'title': 'Hello'}
+        committed = {'title': 'World'}
+        new = {'title': 'Again'}
+        self.assertRaises(ConflictError, obj._p_resolveConflict, old, committed, new)
+
+    def test_removed_attribute(self):
+        obj = self._cut()
+        old = {'title': 'Hello', 'int_indicator': 1}
+        committed = {'title': 'World', 'int_indicator': 1}
+        new = {'title': 'Hello'}
+        self.assertEqual({'title': 'World'}, obj._p_resolveConflict(old, committed, new))
+
+
+class RelationsBTreeTests(TestCase):
+
+    @property
+    def _cut(self):
+        from kedja.models.conflicts import RelationsBTree
+        return RelationsBTree
+
+    def test_inline_state(self):
+        obj = self._cut()
+        old = ((((1, (10,), 2, (10,)),),),)
+        committed = ((((1, (10, 11), 2, (10,), 3, (11,)),),),)
+        new = ((((1, (10, 12), 2, (10,), 4, (12,)),),),)
+        expected = ((((1, (10, 11, 12), 2, (10,), 3, (11,), 4, (12,)),),),)
+        self.assertEqual(expected, obj._p_resolveConflict(old, committed, new))
+
+    def test_inline_state_removed(self):
+        obj = self._cut()
+        old = ((((1, (10,), 2, (10, 11)),),),)
+        committed = ((((2, (11,)),),),)
+        new = ((((1, (10,), 2, (10, 11, 12)),),),)
+        self.assertEqual(((((2, (11, 12)),),),), obj._p_resolveConflict(old, committed, new))
+
+    def test_bucket_state(self):
+        from kedja.models.conflicts import RelationsBucket
+        obj = RelationsBucket()
+        old = ((1, (10,)), 'next')
+        committed = ((1, (10, 11)), 'next')
+        new = ((1, (10, 12)), 'next')
+        self.assertEqual(((1, (10, 11, 12)), 'next'), obj._p_resolveConflict(old, committed, new))
+        self.assertRaises(ConflictError, obj._p_resolveConflict, old, ((1, (10, 11)), 'other'), new)
+
+
+class ChangeLogBTreeTests(TestCase):
+
+    @property
+    def _cut(self):
+        from kedja.models.conflicts import ChangeLogBTree
+        return ChangeLogBTree
+
+    def test_inline_state(self):
+        obj = self._cut()
+        old = ((((1, 'a'),),),)
+        committed = ((((1, 'a', 2, 'b', 3, 'c'),),),)
+        new = ((((1, 'a', 2, 'd'),),),)
+        expected = ((((1, 'a', 2, 'b', 3, 'c', 4, 'd'),),),)
+        self.assertEqual(expected, obj._p_resolveConflict(old, committed, new))
+
+    def test_empty_tree(self):
+        obj = self._cut()
+        self.assertEqual(((((1, 'a', 2, 'b'),),),), obj._p_resolveConflict(None, ((((1, 'a'),),),), ((((1, 'b'),),),)))
+
+    def test_compacted(self):
+        obj = self._cut()
+        old = ((((1, 'a', 2, 'b'),),),)
+        committed = ((((2, 'b', 3, 'c'),),),)
+        new = ((((1, 'a', 2, 'b', 3, 'd'),),),)
+        self.assertRaises(ConflictError, obj._p_resolveConflict, old, committed, new)
+
+    def test_bucket_state(self):
+        from kedja.models.conflicts import ChangeLogBucket
+        obj = ChangeLogBucket()
+        old = ((1, 'a'), 'next')
+        self.assertEqual(((1, 'a', 2, 'b', 3, 'c'), 'next'),
+                         obj._p_resolveConflict(old, ((1, 'a', 2, 'b'), 'next'), ((1, 'a', 2, 'c'), 'next')))
+        self.assertRaises(ConflictError, obj._p_resolveConflict, old, ((1, 'a', 2, 'b'), 'other'), old)
+
+
+class ConcurrentTransactionsTests(TestCase):
+    """ Two connections changing the same objects, like two requests would. """
+
+    def setUp(self):
+        self.config = testing.setUp()
+        self.config.include('kedja.testing.minimal')
+        self.config.include('kedja.resources')
+        self.tmpdir = tempfile.mkdtemp()
+        self.db = DB(FileStorage(self.tmpdir + '/Data.fs'))
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.tmpdir)
+        testing.tearDown()
+
+    def _connections(self, factory):
+        tm1 = transaction.TransactionManager()
+        conn1 = self.db.open(transaction_manager=tm1)
+        conn1.root()['obj'] = factory()
+        tm1.commit()
+        tm2 = transaction.TransactionManager()
+        conn2 = self.db.open(transaction_manager=tm2)
+        return (tm1, conn1.root()['obj']), (tm2, conn2.root()['obj'])
+
+    def test_relations_to_same_rid(self):
+        from kedja.models.relations import RelationMap
+
+        def _factory():
+            obj = RelationMap()
+            obj[1] = [10, 20]
+            return obj
+
+        (tm1, map1), (tm2, map2) = self._connections(_factory)
+        map1[2] = [10, 30]
+        map2[3] = [10, 40]
+        tm1.commit()
+        tm2.commit()
+        tm1.begin()
+        self.assertEqual({1, 2, 3}, set(map1.find_relations(10)))
+
+    def test_relations_same_members(self):
+        from kedja.models.relations import RelationMap
+        (tm1, map1), (tm2, map2) = self._connections(RelationMap)
+        map1[1] = [10, 20]
+        map2[2] = [20, 10]
+        tm1.commit()
+        self.assertRaises(ConflictError, tm2.commit)
+
+    def test_add_to_same_collection(self):
+        factory = lambda: self.config.registry.content('Collection', rid=1)
+        (tm1, col1), (tm2, col2) = self._connections(factory)
+        col1['a'] = self.config.registry.content('Card', rid=2)
+        col2['b'] = self.config.registry.content('Card', rid=3)
+        col2.title = "Changed"
+        tm1.commit()
+        tm2.commit()
+        tm1.begin()
+        self.assertEqual(['a', 'b'], list(col1.order))
+        self.assertEqual("Changed", col1.title)
+
+    def test_same_title(self):
+        factory = lambda: self.config.registry.content('Collection', rid=1)
+        (tm1, col1), (tm2, col2) = self._connections(factory)
+        col1.title = "One"
+        col2.title = "Two"
+        tm1.commit()
+        self.assertRaises(ConflictError, tm2.commit)
+
+    def test_changelog_same_revision(self):
+        from kedja.models.changelog import ChangeLog
+
+        def _factory():
+            obj = ChangeLog()
+            obj.append(1, 'added', 'resource', 101)
+            return obj
+
+        (tm1, log1), (tm2, log2) = self._connections(_factory)
+        log1.append(2, 'added', 'resource', 201)
+        log2.append(2, 'added', 'resource', 202)
+        tm1.commit()
+        tm2.commit()
+        tm1.begin()
+        self.assertEqual({1: ('added', 'resource', 101), 2: ('added', 'resource', 201), 3: ('added', 'resource', 202)},
+                         dict(log1.entries))
+
+    def _concurrent_wall_changes(self, existing):
+        factory = lambda: self.config.registry.content('Wall', rid=1)
+        (tm1, wall1), (tm2, wall2) = self._connections(factory)
+        for i in range(existing):
+            wall1.log_change('updated', 'resource', 1000 + i)
+        tm1.commit()
+        tm2.begin()
+        revision = wall2.revision
+        self.assertEqual(existing, revision)
+        wall1.log_change('updated', 'resource', 10)
+        wall1.log_change('updated', 'resource', 11)
+        wall2.log_change('added', 'resource', 20)
+        tm1.commit()
+        tm2.commit()
+        tm1.begin()
+        self.assertEqual(revision + 3, wall1.revision)
+        changes = wall1.changes_since(revision)['resource']
+        self.assertEqual({'added': [20], 'updated': [10, 11], 'removed': []}, changes)
+        # A client that fetched changes after the first commit only gets the second one
+        changes = wall1.changes_since(revision + 2)['resource']
+        self.assertEqual({'added': [20], 'updated': [], 'removed': []}, changes)
+
+    def test_changes_in_same_wall(self):
+        # Everything that changes something within a wall logs it there, see Wall.log_change
+        self._concurrent_wall_changes(0)
+
+    def test_changes_in_same_wall_with_buckets(self):
+        self._concurrent_wall_changes(200)
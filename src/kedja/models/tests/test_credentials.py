@@ -55,3 +55,127 @@ class CredentialsTests(TestCase):
     def test_iface(self):
         obj = self._cut('1', token="123")
         self.assertTrue(verifyObject(ICredentials, obj))
+
+    def test_load(self):
+        from kedja.utils import get_redis_conn
+        obj = self._cut('1', token="123", expires=100)
+        obj.save()
+        self.assertEqual(obj, self._cut.load('1', '123'))
+        self.assertLessEqual(get_redis_conn().ttl(obj.get_key()), 100)
+
+    def test_load_no_expiry(self):
+        from kedja.utils import get_redis_conn
+        obj = self._cut('1', token="123", expires=None)
+        obj.save()
+        self.assertEqual(obj, self._cut.load('1', '123'))
+        self.assertEqual(-1, get_redis_conn().ttl(obj.get_key()))
+
+
+class CredentialsCacheTests(TestCase):
+
+    @property
+    def _cut(self):
+        from kedja.models.credentials import CredentialsCache
+        return CredentialsCache
+
+    def test_get_set(self):
+        obj = self._cut()
+        self.assertEqual(None, obj.get('1', 'abc'))
+        obj.set('1', 'abc', {'userid': '1'}, now=0)
+        self.assertEqual(({'userid': '1'}, False), obj.get('1', 'abc', now=1))
+        self.assertEqual(1, obj.hits)
+        self.assertEqual(1, obj.misses)
+
+    def test_ttl(self):
+        obj = self._cut(ttl=10, refresh_interval=5)
+        obj.set('1', 'abc', {'userid': '1'}, now=0)
+        self.assertEqual(None, obj.get('1', 'abc', now=10))
+        self.assertEqual(0, len(obj))
+
+    def test_lru(self):
+        obj = self._cut(size=2)
+        obj.set('1', 'a', {}, now=0)
+        obj.set('2', 'b', {}, now=0)
+        obj.get('1', 'a', now=0)
+        obj.set('3', 'c', {}, now=0)
+        self.assertEqual(None, obj.get('2', 'b', now=0))
+        self.assertIsNotNone(obj.get('1', 'a', now=0))
+        self.assertIsNotNone(obj.get('3', 'c', now=0))
+
+    def test_refresh_only_once(self):
+        obj = self._cut(ttl=100, refresh_interval=5)
+        obj.set('1', 'abc', {}, now=0)
+        self.assertEqual(False, obj.get('1', 'abc', now=4)[1])
+        self.assertEqual(True, obj.get('1', 'abc', now=5)[1])
+        self.assertEqual(False, obj.get('1', 'abc', now=6)[1])
+        self.assertEqual(True, obj.get('1', 'abc', now=10)[1])
+
+    def test_refresh_before_eviction(self):
+        from kedja.models.credentials import get_credentials_cache
+        obj = get_credentials_cache(testing.DummyResource(settings={}))
+        obj.set('1', 'abc', {}, now=0)
+        self.assertEqual(True, obj.get('1', 'abc', now=obj.refresh_interval)[1])
+        self.assertIsNotNone(obj.get('1', 'abc', now=obj.ttl - 1))
+
+    def test_refresh_interval_too_long(self):
+        from pyramid.exceptions import ConfigurationError
+        self.assertRaises(ConfigurationError, self._cut, ttl=10, refresh_interval=10)
+        self.assertIsNotNone(self._cut(ttl=0, refresh_interval=10))
+
+    def test_disabled(self):
+        obj = self._cut(ttl=0)
+        obj.set('1', 'abc', {}, now=0)
+        self.assertEqual(None, obj.get('1', 'abc', now=0))
+
+    def test_invalidate(self):
+        obj = self._cut()
+        obj.set('1', 'abc', {}, now=0)
+        obj.invalidate('1', 'abc')
+        self.assertEqual(None, obj.get('1', 'abc', now=0))
+
+
+class GetValidCredentialsTests(TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp()
+
+    def tearDown(self):
+        testing.tearDown()
+
+    @property
+    def _fut(self):
+        from kedja.models.credentials import get_valid_credentials
+        return get_valid_credentials
+
+    def _fixture(self):
+        from kedja.models.credentials import Credentials
+        cred = Credentials('1', token='123', registry=self.config.registry)
+        cred.save()
+        return cred
+
+    def test_cached(self):
+        from kedja.utils import get_redis_conn
+        cred = self._fixture()
+        self.assertEqual(cred, self._fut('1', '123', registry=self.config.registry))
+        # Not fetched from redis again
+        conn = get_redis_conn(self.config.registry)
+        conn.delete(cred.get_key())
+        self.assertEqual(cred, self._fut('1', '123', registry=self.config.registry))
+
+    def test_clear_invalidates(self):
+        cred = self._fixture()
+        self.assertEqual(cred, self._fut('1', '123', registry=self.config.registry))
+        cred.clear()
+        self.assertEqual(None, self._fut('1', '123', registry=self.config.registry))
+
+    def test_removed_elsewhere_noticed_on_refresh(self):
+        from kedja.models.credentials import get_credentials_cache
+        from kedja.utils import get_redis_conn
+        cred = self._fixture()
+        get_credentials_cache(self.config.registry).refresh_interval = 0
+        self.assertEqual(cred, self._fut('1', '123', registry=self.config.registry))
+        get_redis_conn(self.config.registry).delete(cred.get_key())
+        self.assertEqual(None, self._fut('1', '123', registry=self.config.registry))
+
+    def test_invalid(self):
+        self.assertEqual(None, self._fut('1', 'nope', registry=self.config.registry))
@@ -0,0 +1,105 @@
+from json import loads
+from unittest import TestCase
+
+import transaction
+from pyramid import testing
+from zope.interface.verify import verifyObject
+
+from kedja.interfaces import IWallChanged
+
+
+class _DummyWall(object):
+    rid = 2
+
+
+class WallChangedTests(TestCase):
+
+    @property
+    def _cut(self):
+        from kedja.models.pubsub import WallChanged
+        return WallChanged
+
+    def test_iface(self):
+        obj = self._cut(_DummyWall(), 1, 'added', 'resource', 10)
+        self.assertTrue(verifyObject(IWallChanged, obj))
+
+
+class PublishTests(TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp()
+        self.config.include('kedja.models.pubsub')
+        transaction.begin()
+
+    def tearDown(self):
+        from kedja.models.pubsub import get_event_hub
+        get_event_hub(self.config.registry).stop()
+        transaction.abort()
+        testing.tearDown()
+
+    def _events(self, stream):
+        from kedja.models.pubsub import iter_events
+        return list(iter_events(stream, 1, max_age=0.2, keepalive=1))
+
+    def _notify(self, revision, action, kind, id):
+        from kedja.models.pubsub import WallChanged
+        self.config.registry.notify(WallChanged(_DummyWall(), revision, action, kind, id))
+
+    def test_published_after_commit(self):
+        from kedja.models.pubsub import subscribe
+        stream = subscribe(2, registry=self.config.registry)
+        self._notify(2, 'added', 'resource', 10)
+        self._notify(3, 'added', 'relation', 1)
+        transaction.commit()
+        events = self._events(stream)
+        self.assertEqual(len(events), 2)
+        self.assertTrue(events[0].startswith(b'retry: 3000\nid: 1\n'))
+        self.assertTrue(events[1].startswith(b'id: 3\nevent: change\n'))
+        data = loads(events[1].split(b'data: ', 1)[1])
+        self.assertEqual([x['id'] for x in data['changes']], [10, 1])
+
+    def test_nothing_published_on_abort(self):
+        from kedja.models.pubsub import subscribe
+        stream = subscribe(2, registry=self.config.registry)
+        self._notify(2, 'added', 'resource', 10)
+        transaction.abort()
+        self.assertEqual(len(self._events(stream)), 1)
+
+    def test_other_wall(self):
+        from kedja.models.pubsub import subscribe
+        stream = subscribe(3, registry=self.config.registry)
+        self._notify(2, 'added', 'resource', 10)
+        transaction.commit()
+        self.assertEqual(len(self._events(stream)), 1)
+
+    def test_max_streams(self):
+        from kedja.models.pubsub import get_event_hub
+        from kedja.models.pubsub import subscribe
+        hub = get_event_hub(self.config.registry)
+        self.assertEqual(2, hub.max_streams)
+        first = subscribe(2, registry=self.config.registry)
+        subscribe(3, registry=self.config.registry)
+        self.assertEqual(None, subscribe(2, registry=self.config.registry))
+        first.close()
+        self.assertIsNotNone(subscribe(2, registry=self.config.registry))
+
+    def test_one_subscription(self):
+        from kedja.models.pubsub import get_event_hub
+        from kedja.models.pubsub import subscribe
+        one = subscribe(2, registry=self.config.registry)
+        two = subscribe(2, registry=self.config.registry)
+        self._notify(2, 'added', 'resource', 10)
+        transaction.commit()
+        self.assertEqual(2, len(self._events(one)))
+        self.assertEqual(2, len(self._events(two)))
+        hub = get_event_hub(self.config.registry)
+        self.assertEqual({}, hub.streams)
+        self.assertEqual(1, len(hub.pubsub.patterns))
+
+    def test_overflow_ends_stream(self):
+        from kedja.models.pubsub import subscribe
+        stream = subscribe(2, registry=self.config.registry)
+        for i in range(stream.queue.maxsize + 1):
+            stream.put(b'{"revision": %d}' % i)
+        self.assertTrue(stream.overflowed)
+        self.assertEqual(1, len(self._events(stream)))
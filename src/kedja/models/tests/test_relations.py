@@ -47,6 +47,21 @@ class RelationsTests(TestCase):
         map = self._cut()
         self.assertIsInstance(map.new_relation_id(), int)
 
+    def test_new_relation_id_increasing(self):
+        from kedja.models.relations import JS_MAXINT
+        map = self._cut()
+        first = map.create([1, 2])
+        second = map.create([1, 3])
+        self.assertGreater(first, 0)
+        self.assertGreater(second, first)
+        self.assertLess(second, JS_MAXINT)
+
+    def test_new_relation_id_old_map(self):
+        map = self._cut()
+        del map.relation_counter
+        self.assertGreater(map.new_relation_id(), 0)
+        self.assertEqual(1, map.relation_counter())
+
     def test_find_relation(self):
         map = self._cut()
         map[1] = (1, 2, 3)
@@ -64,6 +79,130 @@ class RelationsTests(TestCase):
         self.assertEqual(map.find_relevant_relation_ids(2), {1, 2})
         self.assertEqual(map.find_relevant_relation_ids(4), set())
 
+    def test_duplicates_rejected(self):
+        map = self._cut()
+        map[1] = (1, 2, 3)
+        self.assertRaises(ValueError, map.__setitem__, 2, (3, 1, 2))
+        self.assertRaises(ValueError, map.create, [2, 3, 1])
+        self.assertRaises(ValueError, map.create, [1, 1])
+        # Not a duplicate of itself
+        map[1] = (3, 2, 1)
+        map[2] = (1, 2)
+        del map[1]
+        map[3] = (1, 2, 3)
+
+    def test_members_index_built_for_old_maps(self):
+        map = self._cut()
+        map[1] = (1, 2)
+        del map.members_to_relation
+        self.assertRaises(ValueError, map.create, [2, 1])
+        self.assertEqual({(1, 2): 1}, dict(map.members_to_relation))
+
+    def test_bulk_create(self):
+        map = self._cut()
+        map[1] = (1, 2)
+        relation_ids = map.bulk_create([[1, 3], [2, 3], [3, 4, 5]])
+        self.assertEqual(3, len(relation_ids))
+        self.assertEqual(4, len(map))
+        self.assertEqual(map.find_relations(3), set(relation_ids))
+        self.assertEqual(map.find_relations(1), {1, relation_ids[0]})
+        self.assertEqual((3, 4, 5), map[relation_ids[2]])
+        self.assertRaises(ValueError, map.create, [3, 1])
+
+    def test_bulk_create_validates_first(self):
+        map = self._cut()
+        map[1] = (1, 2)
+        self.assertRaises(ValueError, map.bulk_create, [[1, 3], [2, 1]])
+        self.assertRaises(ValueError, map.bulk_create, [[1, 3], [3, 1]])
+        self.assertRaises(ValueError, map.bulk_create, [[1, 3], [3]])
+        self.assertEqual(1, len(map))
+
+    def test_bulk_create_replace(self):
+        map = self._cut()
+        map[1] = (1, 2)
+        map[2] = (2, 3)
+        relation_ids = map.bulk_create([[2, 1]], replace=True)
+        self.assertEqual(list(map.keys()), relation_ids)
+        self.assertEqual(map.find_relations(2), set(relation_ids))
+        self.assertNotIn(3, map.rid_to_relations)
+
+    def _graph_fixture(self):
+        map = self._cut()
+        # 1 - 2 - 3 - 4 and 2 - 5 - 4, 10 - 11 separate
+        map[1] = (1, 2)
+        map[2] = (2, 3)
+        map[3] = (3, 4)
+        map[4] = (2, 5, 6)
+        map[5] = (5, 4)
+        map[6] = (10, 11)
+        return map
+
+    def test_neighbours(self):
+        map = self._graph_fixture()
+        self.assertEqual({2: 1}, map.neighbours(1))
+        self.assertEqual({2: 1, 3: 2, 5: 2, 6: 2}, map.neighbours(1, depth=2))
+        self.assertEqual({2: 1, 3: 2, 5: 2, 6: 2, 4: 3}, map.neighbours(1, depth=10))
+        self.assertEqual({}, map.neighbours(404))
+
+    def test_shortest_path(self):
+        map = self._graph_fixture()
+        self.assertEqual([1, 2, 3, 4], map.shortest_path(1, 4))
+        self.assertEqual([4, 3, 2, 1], map.shortest_path(4, 1))
+        self.assertEqual([6, 2, 1], map.shortest_path(6, 1))
+        self.assertEqual([1], map.shortest_path(1, 1))
+        self.assertEqual(None, map.shortest_path(1, 10))
+        self.assertEqual(None, map.shortest_path(1, 4, max_depth=2))
+
+    def test_components(self):
+        map = self._graph_fixture()
+        self.assertEqual([[1, 2, 3, 4, 5, 6], [10, 11]], map.components())
+
+    def test_inline_storage(self):
+        map = self._cut()
+        map[1] = (1, 2)
+        map[2] = (1, 3)
+        self.assertEqual(map.rid_to_relations[1], (1, 2))
+        del map[1]
+        self.assertEqual(map.rid_to_relations[1], (2,))
+
+    def test_large_sets(self):
+        from BTrees.LLBTree import LLTreeSet
+        map = self._cut()
+        map.inline_limit = 4
+        for i in range(1, 6):
+            map[i] = (1, i + 10)
+        self.assertIsInstance(map.rid_to_relations[1], LLTreeSet)
+        self.assertEqual(map.find_relations(1), {1, 2, 3, 4, 5})
+        del map[1]
+        self.assertIsInstance(map.rid_to_relations[1], LLTreeSet)
+        del map[2]
+        del map[3]
+        del map[4]
+        self.assertEqual(map.rid_to_relations[1], (5,))
+
+    def test_compact(self):
+        from BTrees.OOBTree import OOSet
+        map = self._cut()
+        map[1] = (1, 2)
+        # Old format
+        map.rid_to_relations[1] = OOSet([1])
+        map.rid_to_relations[2] = OOSet([1])
+        self.assertEqual(2, map.compact())
+        self.assertEqual(map.rid_to_relations[1], (1,))
+        self.assertEqual(0, map.compact())
+        del map[1]
+        self.assertFalse(len(map.rid_to_relations))
+
+    def test_compact_old_btree(self):
+        from BTrees.LOBTree import LOBTree
+        from kedja.models.conflicts import RelationsBTree
+        map = self._cut()
+        map.rid_to_relations = LOBTree()
+        map[1] = (1, 2)
+        self.assertEqual(2, map.compact())
+        self.assertIsInstance(map.rid_to_relations, RelationsBTree)
+        self.assertEqual(map.find_relations(1), {1})
+
 
 class RelationsIntegrationTests(TestCase):
 
@@ -105,3 +244,40 @@ class RelationsIntegrationTests(TestCase):
         wall.relations_map[1] = [11, 21]
         del wall['collection1']
         self.assertNotIn(1, wall.relations_map)
+
+
+class RelationGraphCacheTests(TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp()
+        self.config.include('kedja.testing.minimal')
+        self.config.include('kedja.resources')
+
+    def tearDown(self):
+        testing.tearDown()
+        self.db.close()
+
+    def _fixture(self):
+        import transaction
+        from ZODB import DB
+        self.db = DB(None)
+        conn = self.db.open()
+        conn.root()['wall'] = wall = self.config.registry.content('Wall', rid=2)
+        wall.relations_map[1] = [10, 20]
+        transaction.commit()
+        return wall
+
+    def test_components_cached_until_changed(self):
+        import transaction
+        wall = self._fixture()
+        self.assertEqual([[10, 20]], wall.relations_map.components())
+        self.assertIsNotNone(wall.relations_map._get_cached_components())
+        wall.relations_map[2] = [30, 40]
+        # Uncommitted changes are never cached
+        self.assertIsNone(wall.relations_map._get_cached_components())
+        self.assertEqual([[10, 20], [30, 40]], wall.relations_map.components())
+        transaction.commit()
+        self.assertIsNone(wall.relations_map._get_cached_components())
+        self.assertEqual([[10, 20], [30, 40]], wall.relations_map.components())
+        self.assertIsNotNone(wall.relations_map._get_cached_components())
+        transaction.abort()
@@ -0,0 +1,72 @@
+from unittest import TestCase
+
+from pyramid import testing
+from pyramid.request import apply_request_extensions
+
+
+class _DummyRIDMap(object):
+
+    def __init__(self, resources):
+        self.resources = resources
+        self.lookups = 0
+
+    def get_resource(self, rid, default=None):
+        self.lookups += 1
+        return self.resources.get(rid, default)
+
+
+class ResourceCacheTests(TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp()
+
+    def tearDown(self):
+        testing.tearDown()
+
+    @property
+    def _cut(self):
+        from kedja.models.resource_cache import ResourceCache
+        return ResourceCache
+
+    def _root(self):
+        root = testing.DummyResource()
+        root.rid_map = _DummyRIDMap({2: 'wall'})
+        return root
+
+    def test_get_resource(self):
+        root = self._root()
+        obj = self._cut()
+        self.assertEqual('wall', obj.get_resource(root, 2))
+        self.assertEqual('wall', obj.get_resource(root, 2))
+        self.assertEqual(None, obj.get_resource(root, 404))
+        self.assertEqual(None, obj.get_resource(root, 404))
+        self.assertEqual(2, root.rid_map.lookups)
+        self.assertEqual(2, obj.hits)
+        self.assertEqual(2, obj.misses)
+
+    def test_has_permission(self):
+        calls = []
+
+        class _Content(object):
+            def has_permission_type(self, resource, request, permission):
+                calls.append(permission)
+                return permission == 'View'
+
+        self.config.registry.content = _Content()
+        request = testing.DummyRequest()
+        resource = testing.DummyResource()
+        obj = self._cut()
+        self.assertTrue(obj.has_permission(request, resource, 'View'))
+        self.assertTrue(obj.has_permission(request, resource, 'View'))
+        self.assertFalse(obj.has_permission(request, resource, 'Edit'))
+        self.assertEqual(['View', 'Edit'], calls)
+        obj.invalidate_permissions()
+        self.assertTrue(obj.has_permission(request, resource, 'View'))
+        self.assertEqual(['View', 'Edit', 'View'], calls)
+
+    def test_integration(self):
+        self.config.include('kedja.models.resource_cache')
+        request = testing.DummyRequest()
+        apply_request_extensions(request)
+        self.assertIsInstance(request.resource_cache, self._cut)
+        self.assertIs(request.resource_cache, request.resource_cache)
@@ -0,0 +1,83 @@
+from unittest import TestCase
+
+from pyramid import testing
+from zope.interface.verify import verifyObject
+
+from kedja.interfaces import IWallSnapshots
+
+
+class WallSnapshotsTests(TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp()
+        self.config.include('kedja.testing.minimal')
+        self.config.include('kedja.resources')
+
+    def tearDown(self):
+        testing.tearDown()
+
+    @property
+    def _cut(self):
+        from kedja.models.snapshots import WallSnapshots
+        return WallSnapshots
+
+    def _fixture(self):
+        root = self.config.registry.content('Root')
+        root['wall'] = wall = self.config.registry.content('Wall', rid=2)
+        return wall
+
+    def test_iface(self):
+        obj = self._cut(self.config.registry)
+        self.assertTrue(verifyObject(IWallSnapshots, obj))
+
+    def test_set_get(self):
+        wall = self._fixture()
+        obj = self._cut(self.config.registry)
+        self.assertEqual(None, obj.get(wall, 'content'))
+        obj.set(wall, 'content', b'{}')
+        self.assertEqual(b'{}', obj.get(wall, 'content'))
+        self.assertEqual(None, obj.get(wall, 'structure'))
+
+    def test_bump_revision_invalidates(self):
+        wall = self._fixture()
+        obj = self._cut(self.config.registry)
+        obj.set(wall, 'content', b'{}')
+        wall.bump_revision()
+        self.assertEqual(None, obj.get(wall, 'content'))
+
+    def test_one_key_per_name(self):
+        from kedja.utils import get_redis_conn
+        wall = self._fixture()
+        obj = self._cut(self.config.registry)
+        obj.set(wall, 'content', b'{}')
+        wall.bump_revision()
+        obj.set(wall, 'content', b'{"a": 1}')
+        self.assertEqual(b'{"a": 1}', obj.get(wall, 'content'))
+        self.assertEqual([b'wsnap.2.content'], get_redis_conn(self.config.registry).keys('wsnap.2.*'))
+
+    def test_get_or_create(self):
+        wall = self._fixture()
+        obj = self._cut(self.config.registry)
+        calls = []
+
+        def _factory():
+            calls.append(1)
+            return b'[]'
+
+        self.assertEqual(b'[]', obj.get_or_create(wall, 'structure', _factory))
+        self.assertEqual(b'[]', obj.get_or_create(wall, 'structure', _factory))
+        self.assertEqual(1, len(calls))
+
+    def test_relation_changes_bump_revision(self):
+        wall = self._fixture()
+        revision = wall.revision
+        wall.relations_map[1] = [10, 20]
+        self.assertGreater(wall.revision, revision)
+        revision = wall.revision
+        del wall.relations_map[1]
+        self.assertGreater(wall.revision, revision)
+
+    def test_integration(self):
+        self.config.include('kedja.models.snapshots')
+        obj = self.config.registry.queryUtility(IWallSnapshots)
+        self.assertTrue(verifyObject(IWallSnapshots, obj))
@@ -0,0 +1,82 @@
+from unittest import TestCase
+
+from pyramid import testing
+
+
+class WallIndexTests(TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp()
+        self.config.include('kedja.testing.minimal')
+        self.config.include('kedja.config')
+        self.config.include('kedja.resources')
+        self.config.include('kedja.security.default_acl')
+        self.config.include('kedja.models.wall_index')
+
+    def tearDown(self):
+        testing.tearDown()
+
+    @property
+    def _cut(self):
+        from kedja.models.wall_index import WallIndex
+        return WallIndex
+
+    def _fixture(self):
+        content = self.config.registry.content
+        root = content('Root')
+        root['one'] = content('Wall', rid=2)
+        root['two'] = content('Wall', rid=3)
+        return root
+
+    def test_roles_update_index(self):
+        from kedja.security import WALL_OWNER
+        root = self._fixture()
+        root['one'].add_user_roles(10, WALL_OWNER)
+        root['two'].add_user_roles(10, WALL_OWNER)
+        self.assertEqual([2, 3], list(root.wall_index.get_visible(10)))
+        root['one'].remove_user_roles(10, WALL_OWNER)
+        self.assertEqual([3], list(root.wall_index.get_visible(10)))
+        self.assertEqual([], list(root.wall_index.get_visible(11)))
+
+    def test_public(self):
+        root = self._fixture()
+        self.assertEqual([], list(root.wall_index.get_visible()))
+        root['two'].set_acl_name('public_wall')
+        self.assertEqual([3], list(root.wall_index.get_visible()))
+        self.assertEqual([3], list(root.wall_index.get_visible(10)))
+        root['two'].set_acl_name('private_wall')
+        self.assertEqual([], list(root.wall_index.get_visible()))
+
+    def test_add_and_remove_wall(self):
+        from kedja.security import WALL_OWNER
+        root = self._fixture()
+        root['three'] = wall = self.config.registry.content('Wall', rid=4)
+        wall.add_user_roles(10, WALL_OWNER)
+        self.assertEqual([4], list(root.wall_index.get_visible(10)))
+        del root['three']
+        self.assertEqual([], list(root.wall_index.get_visible(10)))
+        self.assertNotIn(10, root.wall_index.user_walls)
+        # Roles within the wall are indexed when it's added
+        root['four'] = wall
+        self.assertEqual([4], list(root.wall_index.get_visible(10)))
+
+    def test_iter_visible(self):
+        root = self._fixture()
+        obj = root.wall_index
+        obj.user_walls[10] = obj.family.II.TreeSet([2, 3, 5])
+        obj.public_walls.add(4)
+        items = list(obj.iter_visible(10))
+        self.assertEqual([2, 3, 4, 5], [x[1] for x in items])
+        self.assertEqual([4, 5], [x[1] for x in obj.iter_visible(10, items[1][0])])
+
+    def test_rebuild_wall_index(self):
+        from kedja.models.wall_index import rebuild_wall_index
+        from kedja.security import WALL_OWNER
+        root = self._fixture()
+        root['one'].add_user_roles(10, WALL_OWNER)
+        root['two'].set_acl_name('public_wall')
+        del root.wall_index
+        index = rebuild_wall_index(root)
+        self.assertIsInstance(index, self._cut)
+        self.assertEqual([2, 3], list(index.get_visible(10)))
+        self.assertEqual([3], list(index.get_visible()))
@@ -0,0 +1,136 @@
+""" Keeps track of which walls each user has a role in, and which walls are visible for everyone.
+
+Listing walls is then a set lookup rather than loading every wall and computing its ACL.
+The index only narrows down what to load, permissions are still checked on the walls it points to.
+"""
+from BTrees import family64
+from arche.interfaces import IResourceAdded
+from arche.interfaces import IResourceWillBeRemoved
+from persistent import Persistent
+from pyramid.security import Allow
+from pyramid.security import Authenticated
+from pyramid.security import Everyone
+from pyramid.threadlocal import get_current_registry
+from pyramid.traversal import find_root
+
+from kedja.interfaces import IWall
+
+
+class WallIndex(Persistent):
+    """ user_walls maps userids to the rids of walls they have any role within.
+        public_walls contains rids of walls with an ACL that allows anyone to view something.
+    """
+    family = family64
+
+    def __init__(self):
+        self.user_walls = self.family.IO.BTree()
+        self.public_walls = self.family.II.TreeSet()
+
+    def index_wall(self, wall, registry=None):
+        for userid in wall._rolesdata.keys():
+            self.update_user(wall, userid)
+        self.update_public(wall, registry=registry)
+
+    def unindex_wall(self, wall):
+        for userid in wall._rolesdata.keys():
+            self._discard(userid, wall.rid)
+        self.public_walls.discard(wall.rid)
+
+    def update_user(self, wall, userid):
+        userid = int(userid)
+        if wall.get_roles(userid):
+            walls = self.user_walls.get(userid)
+            if walls is None:
+                self.user_walls[userid] = walls = self.family.II.TreeSet()
+            walls.add(wall.rid)
+        else:
+            self._discard(userid, wall.rid)
+
+    def update_public(self, wall, registry=None):
+        if is_public(wall, registry=registry):
+            self.public_walls.add(wall.rid)
+        else:
+            self.public_walls.discard(wall.rid)
+
+    def _discard(self, userid, rid):
+        walls = self.user_walls.get(userid)
+        if walls is None:
+            return
+        walls.discard(rid)
+        if not walls:
+            del self.user_walls[userid]
+
+    def get_visible(self, userid=None):
+        """ Return a set of wall rids that userid might be allowed to view, or the public ones if userid is None. """
+        if userid is None:
+            return self.public_walls
+        return self.family.II.union(self.user_walls.get(int(userid)), self.public_walls)
+
+    def iter_visible(self, userid=None, cursor=None):
+        """ Yield (cursor, rid) in rid order, after cursor. """
+        rids = self.get_visible(userid)
+        if cursor:
+            rids = rids.keys(min=int(cursor), excludemin=True)
+        for rid in rids:
+            yield str(rid), rid
+
+    def rebuild(self, root, registry=None):
+        self.user_walls.clear()
+        self.public_walls.clear()
+        for wall in root.values():
+            if IWall.providedBy(wall):
+                self.index_wall(wall, registry=registry)
+
+
+def is_public(wall, registry=None):
+    """ Does the ACL of this wall allow anyone, authenticated or not, to do anything? """
+    named_acl = wall.get_acl(registry)
+    if named_acl is None:
+        return False
+    for (ace_action, ace_role, ace_permissions) in named_acl:
+        if ace_action == Allow and ace_role in (Everyone, Authenticated):
+            return True
+    return False
+
+
+def get_wall_index(context):
+    """ Return the index from the root, or None for older roots that don't have one. See rebuild_wall_index. """
+    return getattr(find_root(context), 'wall_index', None)
+
+
+def rebuild_wall_index(root, registry=None):
+    """ Create or rebuild the index for an existing root. Commit afterwards. """
+    index = getattr(root, 'wall_index', None)
+    if index is None:
+        root.wall_index = index = WallIndex()
+    index.rebuild(root, registry=registry)
+    return index
+
+
+def wall_roles_changed(wall, userid):
+    index = get_wall_index(wall)
+    if index is not None:
+        index.update_user(wall, userid)
+
+
+def wall_acl_changed(wall):
+    index = get_wall_index(wall)
+    if index is not None:
+        index.update_public(wall)
+
+
+def index_added_wall(event):
+    index = get_wall_index(event.context)
+    if index is not None:
+        index.index_wall(event.context, registry=get_current_registry())
+
+
+def unindex_removed_wall(event):
+    index = get_wall_index(event.context)
+    if index is not None:
+        index.unindex_wall(event.context)
+
+
+def includeme(config):
+    config.add_subscriber(index_added_wall, IResourceAdded, context=IWall)
+    config.add_subscriber(unindex_removed_wall, IResourceWillBeRemoved, context=IWall)
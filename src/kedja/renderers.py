@@ -0,0 +1,92 @@
+""" JSON rendering with the fastest encoder available.
+
+Set kedja.json_encoder to 'orjson' or 'json' to pick one, the default 'auto' uses orjson if it's installed.
+The json and cornicejson renderers, and everything encoded with kedja.resources.json.dumps, will use it.
+"""
+import json
+from logging import getLogger
+
+from pyramid.exceptions import ConfigurationError
+from pyramid.interfaces import IRendererFactory
+from pyramid.renderers import JSON
+from zope.interface import implementer
+
+from kedja.interfaces import IJSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+logger = getLogger(__name__)
+
+
+def encode_json(value, default=None):
+    return json.dumps(value, default=default, separators=(',', ':')).encode('utf-8')
+
+
+def encode_orjson(value, default=None):
+    # The stdlib encoder converts int keys to strings, so should this one
+    return orjson.dumps(value, default=default, option=orjson.OPT_NON_STR_KEYS)
+
+
+ENCODERS = {'json': encode_json}
+if orjson is not None:
+    ENCODERS['orjson'] = encode_orjson
+
+
+@implementer(IJSONEncoder)
+class JSONEncoder(object):
+    """ Wraps one of the ENCODERS, so the renderers and dumps use the same one. """
+
+    def __init__(self, name:str):
+        self.name = name
+        self.encode = ENCODERS[name]
+
+    def __call__(self, value, default=None):
+        return self.encode(value, default=default)
+
+    def serializer(self, value, default=None, **kw):
+        """ Same signature as json.dumps, for pyramid.renderers.JSON """
+        return self(value, default=default).decode('utf-8')
+
+    def __repr__(self):
+        return "<JSONEncoder %r>" % self.name
+
+
+def make_encoder(name:str='auto'):
+    if name == 'auto':
+        name = 'orjson' if 'orjson' in ENCODERS else 'json'
+    if name not in ENCODERS:
+        raise ConfigurationError("kedja.json_encoder %r isn't available, use one of: %s" % (name, ", ".join(sorted(ENCODERS))))
+    return JSONEncoder(name)
+
+
+_default_encoder = make_encoder()
+
+
+def get_json_encoder(registry=None):
+    """ Return the configured IJSONEncoder, or the best available one if nothing is configured. """
+    if registry is not None:
+        encoder = registry.queryUtility(IJSONEncoder)
+        if encoder is not None:
+            return encoder
+    return _default_encoder
+
+
+def includeme(config):
+    encoder = make_encoder(config.registry.settings.get('kedja.json_encoder', 'auto'))
+    logger.debug("Using %r for JSON", encoder)
+    config.registry.registerUtility(encoder, IJSONEncoder)
+
+    def register():
+        registry = config.registry
+        registry.registerUtility(JSON(serializer=encoder.serializer), IRendererFactory, name='json')
+        if registry.queryUtility(IRendererFactory, name='cornicejson') is not None:
+            from cornice.renderer import CorniceRenderer
+            registry.registerUtility(CorniceRenderer(serializer=encoder.serializer), IRendererFactory, name='cornicejson')
+
+    # Replaces the renderers Pyramid and Cornice registered, regardless of the include order.
+    # Not using add_renderer since that would conflict with the one from Cornice.
+    config.action(None, register)
@@ -3,6 +3,7 @@
 def includeme(config):
     config.include('.card')
     config.include('.collection')
+    config.include('.json')
     config.include('.root')
     config.include('.security')
     config.include('.user')
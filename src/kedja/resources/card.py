@@ -5,7 +5,9 @@ from zope.interface import implementer
 
 from kedja import _
 from kedja.interfaces import ICard
+from kedja.models.conflicts import ResolveAttributeConflictsMixin
 from kedja.resources.json import JSONRenderable
+from kedja.resources.ordering import PositionOrderedMixin
 
 
 class CardSchema(colander.Schema):
@@ -26,7 +28,7 @@ class CardSchema(colander.Schema):
 
 
 @implementer(ICard)
-class Card(Folder, JSONRenderable):
+class Card(ResolveAttributeConflictsMixin, PositionOrderedMixin, Folder, JSONRenderable):
     title = "- Untiled -"
     int_indicator = -1
 
@@ -5,7 +5,9 @@ from zope.interface import implementer
 
 from kedja import _
 from kedja.interfaces import ICollection
+from kedja.models.conflicts import ResolveAttributeConflictsMixin
 from kedja.resources.json import JSONRenderable
+from kedja.resources.ordering import PositionOrderedMixin
 
 
 class CollectionSchema(colander.Schema):
@@ -21,7 +23,7 @@ class CollectionSchema(colander.Schema):
 
 
 @implementer(ICollection)
-class Collection(Folder, JSONRenderable):
+class Collection(ResolveAttributeConflictsMixin, PositionOrderedMixin, Folder, JSONRenderable):
     title = ""
 
     def __init__(self, **kw):
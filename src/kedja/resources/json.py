@@ -1,7 +1,165 @@
+import re
+
+import colander
+
+from kedja.renderers import get_json_encoder
+
+
+# Schema node types whose appstruct value is simply the attribute itself
+PLAIN_TYPES = (colander.String, colander.Int, colander.Float, colander.Bool)
+
+# Compiled extractors, per schema factory
+_extractors = {}
+
+_field_name = re.compile(r'^[a-zA-Z_][a-zA-Z0-9_]*$')
+
 
 class JSONRenderable(object):
 
     def __json__(self, request):
-        with request.get_mutator(self) as mutator:
-            appstruct = mutator.appstruct()
-        return {'type_name': request.registry.content.get_type(self), 'rid': self.rid, 'data': appstruct}
+        type_name = request.registry.content.get_type(self)
+        fields = getattr(request, 'requested_fields', None)
+        if fields is None:
+            data = get_appstruct(self, request, type_name=type_name)
+        else:
+            data = get_fields(self, request, fields, type_name=type_name)
+        return {'type_name': type_name, 'rid': self.rid, 'data': data}
+
+
+class SchemaExtractor(object):
+    """ Reads the same appstruct as the mutator would, straight from the attributes of a resource.
+        It's compiled once from the schema of a content type, so nothing needs to be instantiated,
+        bound or walked when a resource is rendered.
+
+        names are all attribute names within the schema, in schema order.
+        plain are the ones that can be read as they are. If some node isn't plain, for instance
+        if it has a preparer or a type that needs to be serialized, the mutator has to be used for that one.
+    """
+
+    def __init__(self, names, plain):
+        self.names = tuple(names)
+        self.plain = frozenset(plain)
+        self.complete = self.plain.issuperset(self.names)
+        self._attributes = tuple(name for name in self.names if name in self.plain)
+
+    def __call__(self, resource, fields=None):
+        """ Return the appstruct for resource. If fields is specified, only include those. """
+        attributes = self._attributes
+        if fields is not None:
+            attributes = [x for x in attributes if x in fields]
+        appstruct = {}
+        null = colander.null
+        for name in attributes:
+            value = getattr(resource, name, null)
+            if value is not null:
+                appstruct[name] = value
+        return appstruct
+
+    def __contains__(self, name):
+        return name in self.names
+
+
+def compile_schema(schema_factory):
+    """ Return a SchemaExtractor for schema_factory, or None if it can't be instantiated. """
+    if schema_factory is None:
+        return
+    try:
+        schema = schema_factory().bind()
+    except Exception:
+        return
+    names = []
+    plain = []
+    for node in schema.children:
+        names.append(node.name)
+        if isinstance(node.typ, PLAIN_TYPES) and node.preparer is None:
+            plain.append(node.name)
+    return SchemaExtractor(names, plain)
+
+
+def get_extractor(registry, type_name):
+    """ Return the compiled SchemaExtractor for the content type type_name, or None if there's no schema.
+        Each schema is only compiled once.
+    """
+    try:
+        schema_factory = registry.content[type_name].schema
+    except (KeyError, AttributeError):
+        return
+    try:
+        return _extractors[schema_factory]
+    except KeyError:
+        extractor = _extractors[schema_factory] = compile_schema(schema_factory)
+        return extractor
+
+
+def get_appstruct(resource, request, type_name=None):
+    """ Return the same appstruct as the mutator would. If the schema of the resource only consists
+        of plain attributes, read them with the compiled extractor instead of opening a mutator.
+    """
+    if type_name is None:
+        type_name = request.registry.content.get_type(resource)
+    extractor = get_extractor(request.registry, type_name)
+    if extractor is None or not extractor.complete:
+        with request.get_mutator(resource) as mutator:
+            return mutator.appstruct()
+    return extractor(resource)
+
+
+def get_fields(resource, request, fields, type_name=None):
+    """ Return only the requested fields of the appstruct. Names that aren't part of the schema are skipped.
+        Plain attributes are read with the compiled extractor, anything else is picked from the mutators appstruct.
+    """
+    if type_name is None:
+        type_name = request.registry.content.get_type(resource)
+    extractor = get_extractor(request.registry, type_name)
+    if extractor is None:
+        appstruct = get_appstruct(resource, request, type_name=type_name)
+        return {k: appstruct[k] for k in fields if k in appstruct}
+    names = [x for x in fields if x in extractor]
+    if not extractor.plain.issuperset(names):
+        appstruct = get_appstruct(resource, request, type_name=type_name)
+        return {k: appstruct[k] for k in names if k in appstruct}
+    return extractor(resource, fields=names)
+
+
+def parse_fields(value):
+    """ Parse a comma separated list of field names, like 'title,int_indicator'.
+        Returns a sorted tuple without duplicates, or None if value is None.
+        Anything that isn't a valid attribute name is dropped.
+    """
+    if value is None:
+        return
+    return tuple(sorted(set(x for x in (y.strip() for y in value.split(',')) if _field_name.match(x))))
+
+
+def known_fields(registry, fields, type_names):
+    """ Return the fields that are part of the schema of any of the content types type_names, as a sorted tuple.
+        Any other names are ignored.
+    """
+    names = set()
+    for type_name in type_names:
+        extractor = get_extractor(registry, type_name)
+        if extractor is not None:
+            names.update(extractor.names)
+    return tuple(sorted(names.intersection(fields)))
+
+
+def requested_fields(request):
+    """ The fields requested with ?fields= in the querystring, see parse_fields.
+        When set, only those fields will be included in 'data' when resources are rendered.
+    """
+    return parse_fields(request.GET.get('fields', None))
+
+
+def dumps(value, request):
+    """ Encode value as JSON bytes with the configured encoder, using __json__ on objects that have it,
+        like Pyramids json renderer. See kedja.renderers
+    """
+    def _default(obj):
+        if hasattr(obj, '__json__'):
+            return obj.__json__(request)
+        raise TypeError('%r is not JSON serializable' % (obj,))
+    return get_json_encoder(request.registry)(value, default=_default)
+
+
+def includeme(config):
+    config.add_request_method(requested_fields, reify=True)
@@ -0,0 +1,229 @@
+from random import randrange
+
+from BTrees import family64
+from pyramid.traversal import find_interface
+
+from kedja.interfaces import ICard
+from kedja.interfaces import ICollection
+from kedja.interfaces import IWall
+from kedja.models.changelog import RESOURCE
+from kedja.models.changelog import UPDATED
+
+
+class PositionOrderedMixin(object):
+    """ Keeps the order of contained items as sparse integer positions in a BTree, rather than as a tuple
+        on the folder. Adding or moving an item only writes a bucket or two, and concurrent adds
+        are merged by the BTree rather than causing a conflict on the folder.
+
+        New positions are picked at random within the free space, so two transactions adding items at the same
+        time are unlikely to use the same one. When there's no room left, all items are renumbered.
+
+        The BTrees are only created when the first item is added, so the many cards without anything in them
+        don't need any extra records, and listing their contents won't load anything.
+
+        Folders created before this stored the order as a tuple. They're converted the first time
+        they're changed, or by convert_ordered_children.
+    """
+    family = family64
+    position_spacing = 1 << 32
+    max_position = 1 << 62
+    positioned = False  # True when the order is kept here, even if nothing has been added yet
+    _order = None  # Makes the base folder consider itself unordered, this class handles it
+    _positions = None  # position -> name
+    _name_positions = None  # name -> position
+
+    @property
+    def order(self):
+        return tuple(self.keys())
+
+    @order.setter
+    def order(self, names):
+        self.convert_order()
+        self._renumber(names)
+
+    def keys(self):
+        if self._positions is None:
+            if self.positioned:
+                return ()
+            return super().keys()
+        return tuple(self._positions.values())
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def values(self):
+        return [self[name] for name in self.keys()]
+
+    def items(self):
+        return [(name, self[name]) for name in self.keys()]
+
+    def add(self, name, other, *args, **kw):
+        result = super().add(name, other, *args, **kw)
+        self.convert_order()
+        self._create_positions()
+        if name not in self._name_positions:
+            self._set_position(name, self._position_before(None))
+        return result
+
+    def remove(self, name, *args, **kw):
+        result = super().remove(name, *args, **kw)
+        self.convert_order()
+        if self._name_positions is not None:
+            position = self._name_positions.pop(name, None)
+            if position is not None:
+                del self._positions[position]
+        return result
+
+    def move(self, name, before=None):
+        """ Move name so it's placed before the item named before, or last. """
+        self.convert_order()
+        name_positions = self._name_positions or {}
+        if name not in name_positions:
+            raise KeyError(name)
+        if before is not None and before not in name_positions:
+            raise KeyError(before)
+        if name == before:
+            return
+        del self._positions[self._name_positions.pop(name)]
+        self._set_position(name, self._position_before(before))
+
+    def iter_after(self, cursor=None):
+        """ Yield (cursor, name) in order, for the items after cursor. Cursors are strings from an earlier call,
+            they stay valid while items are added, moved or removed. Raises ValueError for a bad cursor.
+        """
+        if self._positions is None:
+            if not self.positioned:
+                yield from _iter_names_after(super().keys(), cursor)
+            return
+        if cursor:
+            position, _, name = cursor.partition(':')
+            position = self._name_positions.get(name, int(position))
+            items = self._positions.items(min=position, excludemin=True)
+        else:
+            items = self._positions.items()
+        for (position, name) in items:
+            yield '%s:%s' % (position, name), name
+
+    def get_position(self, name):
+        self.convert_order()
+        if self._name_positions is None:
+            raise KeyError(name)
+        return self._name_positions[name]
+
+    def convert_order(self):
+        """ Convert the order of folders created before this class was used. Returns True if anything changed. """
+        if self.positioned or self._positions is not None:
+            return False
+        names = tuple(super().keys())
+        if '_order' in self.__dict__:
+            del self._order
+        self.positioned = True
+        self._renumber(names)
+        return True
+
+    def _create_positions(self):
+        if self._positions is None:
+            self._positions = self.family.IO.BTree()
+            self._name_positions = self.family.OI.BTree()
+
+    def _set_position(self, name, position):
+        self._positions[position] = name
+        self._name_positions[name] = position
+
+    def _position_before(self, before):
+        """ Return a free position right before the item named before, or at the end if before is None. """
+        if before is None:
+            low = self._positions.maxKey() if self._positions else 0
+            high = low + self.position_spacing * 2
+        else:
+            high = self._name_positions[before]
+            try:
+                low = self._positions.maxKey(high - 1)
+            except ValueError:
+                low = high - self.position_spacing * 2
+        if high - low < 4 or high > self.max_position or low < -self.max_position:
+            self._renumber(tuple(self._positions.values()))
+            return self._position_before(before)
+        quarter = (high - low) // 4
+        return randrange(low + quarter, high - quarter)
+
+    def _renumber(self, names):
+        if not names and self._positions is None:
+            return
+        self._create_positions()
+        self._positions.clear()
+        self._name_positions.clear()
+        for (i, name) in enumerate(names, start=1):
+            self._set_position(name, i * self.position_spacing)
+
+
+def iter_children(parent, cursor=None):
+    """ Yield (cursor, name) for the items in parent after cursor, see PositionOrderedMixin.iter_after.
+        Folders without positions use the name as cursor, and BTree order if the folder has one.
+    """
+    if isinstance(parent, PositionOrderedMixin):
+        yield from parent.iter_after(cursor)
+        return
+    data = getattr(parent, 'data', None)
+    if hasattr(data, 'minKey'):
+        names = data.keys(min=cursor, excludemin=True) if cursor else data.keys()
+        for name in names:
+            yield name, name
+        return
+    yield from _iter_names_after(parent.keys(), cursor)
+
+
+def _iter_names_after(names, cursor):
+    found = not cursor
+    for name in names:
+        if found:
+            yield name, name
+        elif name == cursor:
+            found = True
+
+
+def move_resource(resource, parent, before=None):
+    """ Move a resource within its wall. It will be placed before the item named before in parent, or last.
+
+        Moving within the same parent simply changes the position.
+        Moving to another parent removes and adds the resource, so anything that keeps track of where
+        it is will be updated. The relations of the resource and its rid are kept.
+    """
+    wall = find_interface(resource, IWall)
+    if wall is None or find_interface(parent, IWall) is not wall:
+        raise ValueError("Resources can only be moved within the same wall")
+    name = resource.__name__
+    if resource.__parent__ is parent:
+        parent.move(name, before=before)
+        wall.log_change(UPDATED, RESOURCE, parent.rid)
+        return
+    if name in parent:
+        raise ValueError("%r already exists within the new parent" % name)
+    relations_map = wall.relations_map
+    relations = {}
+    for relation_id in relations_map.find_relations(resource.rid):
+        relations[relation_id] = relations_map[relation_id]
+    resource.__parent__.remove(name)
+    parent.add(name, resource)
+    if before is not None:
+        parent.move(name, before=before)
+    for (relation_id, members) in relations.items():
+        relations_map[relation_id] = members
+
+
+def convert_ordered_children(root):
+    """ Convert the order of all walls, collections and cards to the current storage format. Commit afterwards.
+        Returns the number of converted folders.
+    """
+    converted = 0
+    for wall in root.values():
+        if not IWall.providedBy(wall):
+            continue
+        converted += wall.convert_order()
+        for collection in wall.values():
+            if ICollection.providedBy(collection):
+                converted += collection.convert_order()
+                for card in collection.values():
+                    if ICard.providedBy(card):
+                        converted += card.convert_order()
+    return converted
@@ -4,6 +4,7 @@ from arche.content import ContentType
 from arche.objectmap.rid_map import ResourceIDMap
 from zope.interface import implementer
 
+from kedja.models.wall_index import WallIndex
 from kedja.resources.json import JSONRenderable
 from kedja.interfaces import IRoot
 from kedja import _
@@ -30,6 +31,7 @@ class Root(Folder, JSONRenderable):
         super().__init__()
         self.rid = 1
         self.rid_map = ResourceIDMap(self)
+        self.wall_index = WallIndex()
 
 
 RootContent = ContentType(factory=Root, schema=RootSchema, title=_("Root"))
@@ -33,6 +33,8 @@ class SecurityAwareMixin(object):
         if userid not in self._rolesdata:
             self._rolesdata[userid] = OOSet()
         self._rolesdata[userid].update(roles)
+        _invalidate_computed_acl()
+        self.roles_changed(userid)
 
     def remove_user_roles(self, userid:str, *roles):
         """ See kedja.interfaces.ISecurityAware """
@@ -46,6 +48,22 @@ class SecurityAwareMixin(object):
                 storage.remove(k)
         if not len(storage):
             del self._rolesdata[userid]
+        _invalidate_computed_acl()
+        self.roles_changed(userid)
+
+    def roles_changed(self, userid:int):
+        """ Called when roles for userid were added or removed. """
+        pass
+
+    def set_acl_name(self, acl_name:str):
+        """ See kedja.interfaces.ISecurityAware """
+        self.acl_name = acl_name
+        _invalidate_computed_acl()
+        self.acl_changed()
+
+    def acl_changed(self):
+        """ Called when acl_name was changed. """
+        pass
 
     def get_roles(self, userid):
         return set(self._rolesdata.get(int(userid), ()))
@@ -63,24 +81,45 @@ class SecurityAwareMixin(object):
         """ See kedja.interfaces.ISecurityAware and Pyarmids docs on ACL/Security. """
         return self.get_computed_acl()
 
-    def get_computed_acl(self, userids=[], request=None):
-        """ See kedja.interfaces.ISecurityAware """
+    def get_computed_acl(self, userids=None, request=None):
+        """ See kedja.interfaces.ISecurityAware
+
+            The result is cached on the request, so any descendants asking for it will reuse it.
+        """
         if request is None:
             request = get_current_request()
-        if not isinstance(userids, list):
+        if userids is None:
+            userids = []
+        elif isinstance(userids, list):
+            userids = list(userids)
+        else:
             userids = [userids]
         if request.authenticated_userid and request.authenticated_userid not in userids:
             userids.insert(0, request.authenticated_userid)
-        registry = request.registry
+        cache = getattr(request, 'computed_acl_cache', None)
+        if cache is None:
+            return self._compute_acl(userids, request.registry)
+        key = (id(self), tuple(userids))
+        try:
+            return cache[key][1]
+        except KeyError:
+            acl = self._compute_acl(userids, request.registry)
+            # Keep a reference to self, so the id can't be reused during this request
+            cache[key] = (self, acl)
+            return acl
+
+    def _compute_acl(self, userids, registry):
+        acl = []
         for resource in lineage(self):
-            if ISecurityAware. providedBy(resource):
+            if ISecurityAware.providedBy(resource):
                 roles_map = resource.get_roles_map(userids)
                 # Get ACL
                 named_acl = resource.get_acl(registry)
                 if named_acl is not None:
-                    yield from named_acl.get_translated_acl(roles_map)
+                    acl.extend(named_acl.get_translated_acl(roles_map))
         # Finally, the stop bit!
-        yield DENY_ALL
+        acl.append(DENY_ALL)
+        return tuple(acl)
 
     def get_acl(self, registry=None):
         """ See kedja.interfaces.ISecurityAware """
@@ -94,6 +133,23 @@ class SecurityAwareMixin(object):
             return named_acl
 
 
+def computed_acl_cache(request):
+    """ Computed ACLs and roles during this request.
+        See SecurityAwareMixin.get_computed_acl and kedja.models.auth.NamedACLAuthorizationPolicy
+    """
+    return {}
+
+
+def _invalidate_computed_acl():
+    request = get_current_request()
+    cache = getattr(request, 'computed_acl_cache', None)
+    if cache:
+        cache.clear()
+    resource_cache = getattr(request, 'resource_cache', None)
+    if resource_cache is not None:
+        resource_cache.invalidate_permissions()
+
+
 def set_role_from_authenticated(event):
     """ Some content types within the content registry has a specific attribute called ownership_role.
         It only exists so the currently logged in user will get that role automatically.
@@ -116,3 +172,4 @@ def set_role_from_authenticated(event):
 
 def includeme(config):
     config.add_subscriber(set_role_from_authenticated, IResourceAdded, context=ISecurityAware)
+    config.add_request_method(computed_acl_cache, reify=True)
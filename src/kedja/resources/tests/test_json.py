@@ -0,0 +1,146 @@
+from unittest import TestCase
+
+import colander
+from pyramid import testing
+from pyramid.request import apply_request_extensions
+
+
+class GetExtractorTests(TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp()
+        self.config.include('kedja.testing.minimal')
+        self.config.include('kedja.resources')
+
+    def tearDown(self):
+        testing.tearDown()
+
+    @property
+    def _fut(self):
+        from kedja.resources.json import get_extractor
+        return get_extractor
+
+    def test_card(self):
+        extractor = self._fut(self.config.registry, 'Card')
+        self.assertEqual(('title', 'int_indicator'), extractor.names)
+        self.assertTrue(extractor.complete)
+        self.assertIs(extractor, self._fut(self.config.registry, 'Card'))
+
+    def test_extract(self):
+        extractor = self._fut(self.config.registry, 'Card')
+        card = self.config.registry.content('Card', rid=10)
+        card.title = "Hello"
+        self.assertEqual({'title': "Hello", 'int_indicator': -1}, extractor(card))
+        self.assertEqual({'title': "Hello"}, extractor(card, fields=['title']))
+
+    def test_not_plain(self):
+        from kedja.resources.json import compile_schema
+
+        class ComplexSchema(colander.Schema):
+            title = colander.SchemaNode(colander.String())
+            tags = colander.SchemaNode(
+                colander.Sequence(),
+                colander.SchemaNode(colander.String()),
+            )
+
+        extractor = compile_schema(ComplexSchema)
+        self.assertFalse(extractor.complete)
+        self.assertEqual(frozenset(['title']), extractor.plain)
+        self.assertIn('tags', extractor)
+
+    def test_nonexistent_type(self):
+        self.assertEqual(None, self._fut(self.config.registry, '404'))
+
+
+class GetAppstructTests(TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp()
+        self.config.include('kedja.testing.minimal')
+        self.config.include('kedja.resources')
+
+    def tearDown(self):
+        testing.tearDown()
+
+    @property
+    def _fut(self):
+        from kedja.resources.json import get_appstruct
+        return get_appstruct
+
+    def test_same_as_mutator(self):
+        request = testing.DummyRequest()
+        apply_request_extensions(request)
+        card = self.config.registry.content('Card', rid=10)
+        card.title = "Hello"
+        with request.get_mutator(card) as mutator:
+            expected = mutator.appstruct()
+        self.assertEqual(expected, self._fut(card, request))
+
+
+class GetFieldsTests(TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp()
+        self.config.include('kedja.testing.minimal')
+        self.config.include('kedja.resources')
+
+    def tearDown(self):
+        testing.tearDown()
+
+    @property
+    def _fut(self):
+        from kedja.resources.json import get_fields
+        return get_fields
+
+    def test_get_fields(self):
+        request = testing.DummyRequest()
+        card = self.config.registry.content('Card', rid=10)
+        card.title = "Hello"
+        card.int_indicator = 3
+        self.assertEqual({'title': "Hello"}, self._fut(card, request, ('title', '__dict__', 'rid')))
+        self.assertEqual({}, self._fut(card, request, ()))
+
+    def test_json(self):
+        request = testing.DummyRequest(params={'fields': 'title'})
+        apply_request_extensions(request)
+        card = self.config.registry.content('Card', rid=10)
+        card.title = "Hello"
+        card.int_indicator = 3
+        self.assertEqual({'type_name': 'Card', 'rid': 10, 'data': {'title': "Hello"}}, card.__json__(request))
+
+
+class KnownFieldsTests(TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp()
+        self.config.include('kedja.testing.minimal')
+        self.config.include('kedja.resources')
+
+    def tearDown(self):
+        testing.tearDown()
+
+    @property
+    def _fut(self):
+        from kedja.resources.json import known_fields
+        return known_fields
+
+    def test_known_fields(self):
+        registry = self.config.registry
+        fields = ('title', 'int_indicator', 'nothing', 'rid')
+        self.assertEqual(('int_indicator', 'title'), self._fut(registry, fields, ('Collection', 'Card')))
+        self.assertEqual(('title',), self._fut(registry, fields, ('Collection',)))
+        self.assertEqual((), self._fut(registry, fields, ('404',)))
+
+
+class ParseFieldsTests(TestCase):
+
+    @property
+    def _fut(self):
+        from kedja.resources.json import parse_fields
+        return parse_fields
+
+    def test_parse_fields(self):
+        self.assertEqual(None, self._fut(None))
+        self.assertEqual((), self._fut(''))
+        self.assertEqual(('int_indicator', 'title'), self._fut('title, int_indicator,title'))
+        self.assertEqual(('title',), self._fut('title,../hello,'))
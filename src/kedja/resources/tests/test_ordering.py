@@ -0,0 +1,159 @@
+from unittest import TestCase
+
+import transaction
+from ZODB import DB
+from pyramid import testing
+
+
+class PositionOrderedMixinTests(TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp()
+        self.config.include('kedja.testing.minimal')
+        self.config.include('kedja.resources')
+
+    def tearDown(self):
+        testing.tearDown()
+
+    def _fixture(self, *names):
+        content = self.config.registry.content
+        collection = content('Collection', rid=1)
+        for (i, name) in enumerate(names, start=10):
+            collection.add(name, content('Card', rid=i))
+        return collection
+
+    def test_add_and_remove(self):
+        obj = self._fixture('c', 'a', 'b')
+        self.assertEqual(('c', 'a', 'b'), obj.order)
+        self.assertEqual(['c', 'a', 'b'], [x.__name__ for x in obj.values()])
+        obj.remove('a')
+        self.assertEqual(('c', 'b'), tuple(obj.keys()))
+        self.assertEqual(2, len(obj._positions))
+
+    def test_move(self):
+        obj = self._fixture('a', 'b', 'c')
+        obj.move('c', before='a')
+        self.assertEqual(('c', 'a', 'b'), obj.order)
+        obj.move('c')
+        self.assertEqual(('a', 'b', 'c'), obj.order)
+        self.assertRaises(KeyError, obj.move, 'a', before='404')
+
+    def test_move_renumbers(self):
+        obj = self._fixture('a', 'b')
+        names = ['x%s' % i for i in range(100)]
+        for name in names:
+            obj.add(name, self.config.registry.content('Card', rid=1000 + len(obj)))
+            obj.move(name, before='b')
+        self.assertEqual(tuple(['a'] + names + ['b']), obj.order)
+
+    def test_set_order(self):
+        obj = self._fixture('a', 'b', 'c')
+        obj.order = ('b', 'c', 'a')
+        self.assertEqual(('b', 'c', 'a'), obj.order)
+
+    def test_iter_after(self):
+        obj = self._fixture('a', 'b', 'c', 'd')
+        items = list(obj.iter_after())
+        self.assertEqual(['a', 'b', 'c', 'd'], [x[1] for x in items])
+        cursor = items[1][0]
+        self.assertEqual(['c', 'd'], [x[1] for x in obj.iter_after(cursor)])
+        # Still works when the item the cursor points to is gone
+        obj.remove('b')
+        obj.add('e', self.config.registry.content('Card', rid=100))
+        self.assertEqual(['c', 'd', 'e'], [x[1] for x in obj.iter_after(cursor)])
+        self.assertRaises(ValueError, list, obj.iter_after('hello:world'))
+
+    def test_no_positions_until_added(self):
+        db = DB(None)
+        conn = db.open()
+        conn.root()['card'] = self.config.registry.content('Card', rid=1)
+        transaction.commit()
+        other = db.open(transaction_manager=transaction.TransactionManager())
+        card = other.root()['card']
+        self.assertEqual((), card.keys())
+        self.assertEqual([], list(card.values()))
+        self.assertEqual([], list(card.iter_after(None)))
+        self.assertIsNone(card._positions)
+        self.assertIsNone(card.data._p_changed)  # Still a ghost, nothing loaded
+        card.add('a', self.config.registry.content('Card', rid=2))
+        self.assertEqual(('a',), card.keys())
+        self.assertEqual(1, len(card._name_positions))
+        other.close()
+        conn.close()
+        db.close()
+
+    def test_convert_order(self):
+        obj = self._fixture('a', 'b', 'c')
+        # Like it was stored before
+        del obj.positioned
+        del obj._positions
+        del obj._name_positions
+        obj._order = ('c', 'b', 'a')
+        self.assertTrue(obj.convert_order())
+        self.assertEqual(('c', 'b', 'a'), obj.order)
+        self.assertNotIn('_order', obj.__dict__)
+        self.assertFalse(obj.convert_order())
+
+
+class MoveResourceTests(TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp()
+        self.config.include('kedja.testing.minimal')
+        self.config.include('kedja.resources')
+        self.config.include('kedja.models.relations')
+
+    def tearDown(self):
+        testing.tearDown()
+
+    @property
+    def _fut(self):
+        from kedja.resources.ordering import move_resource
+        return move_resource
+
+    def _fixture(self):
+        content = self.config.registry.content
+        root = content('Root')
+        root['wall'] = wall = content('Wall', rid=2)
+        wall['one'] = content('Collection', rid=3)
+        wall['two'] = content('Collection', rid=4)
+        wall['one']['a'] = content('Card', rid=5)
+        wall['one']['b'] = content('Card', rid=6)
+        wall['two']['c'] = content('Card', rid=7)
+        root['other'] = content('Wall', rid=8)
+        root['other']['col'] = content('Collection', rid=9)
+        return root
+
+    def test_within_parent(self):
+        root = self._fixture()
+        wall = root['wall']
+        revision = wall.revision
+        self._fut(wall['one']['b'], wall['one'], before='a')
+        self.assertEqual(('b', 'a'), wall['one'].order)
+        self.assertEqual([3], wall.changes_since(revision)['resource']['updated'])
+
+    def test_other_parent_keeps_relations(self):
+        root = self._fixture()
+        wall = root['wall']
+        wall.relations_map[100] = [5, 7]
+        card = wall['one']['a']
+        self._fut(card, wall['two'], before='c')
+        self.assertEqual(('a', 'c'), wall['two'].order)
+        self.assertEqual(('b',), wall['one'].order)
+        self.assertIs(card.__parent__, wall['two'])
+        self.assertEqual((5, 7), wall.relations_map[100])
+
+    def test_other_wall(self):
+        root = self._fixture()
+        self.assertRaises(ValueError, self._fut, root['wall']['one']['a'], root['other']['col'])
+
+    def test_convert_ordered_children(self):
+        from kedja.resources.ordering import convert_ordered_children
+        root = self._fixture()
+        collection = root['wall']['one']
+        del collection.positioned
+        del collection._positions
+        del collection._name_positions
+        collection._order = ('b', 'a')
+        self.assertEqual(1, convert_ordered_children(root))
+        self.assertEqual(('b', 'a'), collection.order)
@@ -128,6 +128,35 @@ class SecurityAwareMixinTests(TestCase):
             ]
         )
 
+    def test_get_computed_acl_cached(self):
+        parent = self._fixture()
+        request = testing.DummyRequest()
+        request.computed_acl_cache = {}
+        first = parent.get_computed_acl([1, 2, 3], request)
+        self.assertIs(first, parent.get_computed_acl([1, 2, 3], request))
+        self.assertIsNot(first, parent.get_computed_acl([1], request))
+
+    def test_get_computed_acl_cache_invalidated(self):
+        parent = self._fixture()
+        request = testing.DummyRequest()
+        request.computed_acl_cache = {}
+        self.config.begin(request)
+        self.assertNotIn((Allow, '4', ('comment',)), parent.get_computed_acl([4], request))
+        parent.add_user_roles(4, 'User')
+        self.assertIn((Allow, '4', ('comment',)), parent.get_computed_acl([4], request))
+        parent.remove_user_roles(4, 'User')
+        self.assertNotIn((Allow, '4', ('comment',)), parent.get_computed_acl([4], request))
+
+    def test_set_acl_name_invalidates_cache(self):
+        parent = self._fixture()
+        request = testing.DummyRequest()
+        request.computed_acl_cache = {}
+        self.config.begin(request)
+        self.assertIn((Allow, Everyone, ('view',)), parent.get_computed_acl([1], request))
+        parent.set_acl_name('404')
+        self.assertEqual('404', parent.acl_name)
+        self.assertNotIn((Allow, Everyone, ('view',)), parent.get_computed_acl([1], request))
+
     def test_get_roles_map(self):
         parent = self._fixture()
         self.assertEqual({'1': {'Admin'}, '2': {'User'}}, parent.get_roles_map([1, 2, 3]))
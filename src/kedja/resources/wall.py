@@ -1,12 +1,28 @@
 import colander
+from BTrees.Length import Length
 from arche.folder import Folder
 from arche.content import ContentType
+from arche.interfaces import IObjectUpdated
+from arche.interfaces import IResourceAdded
+from arche.interfaces import IResourceWillBeRemoved
+from pyramid.threadlocal import get_current_registry
+from pyramid.traversal import find_interface
 from zope.interface import implementer
 
 from kedja import _
 from kedja.interfaces import IWall
+from kedja.models.changelog import ADDED
+from kedja.models.changelog import ChangeLog
+from kedja.models.changelog import REMOVED
+from kedja.models.changelog import RESOURCE
+from kedja.models.changelog import UPDATED
+from kedja.models.conflicts import ResolveAttributeConflictsMixin
+from kedja.models.pubsub import WallChanged
 from kedja.models.relations import RelationMap
+from kedja.models.wall_index import wall_acl_changed
+from kedja.models.wall_index import wall_roles_changed
 from kedja.resources.json import JSONRenderable
+from kedja.resources.ordering import PositionOrderedMixin
 from kedja.resources.security import SecurityAwareMixin
 from kedja.security import WALL_OWNER
 from kedja.permissions import INVITE
@@ -26,14 +42,71 @@ class WallSchema(colander.Schema):
 
 
 @implementer(IWall)
-class Wall(Folder, JSONRenderable, SecurityAwareMixin):
+class Wall(ResolveAttributeConflictsMixin, PositionOrderedMixin, Folder, JSONRenderable, SecurityAwareMixin):
     title = ""
     acl_name = 'private_wall'
 
     def __init__(self, **kw):
         super().__init__(**kw)
         self.relations_map = RelationMap()
+        self.relations_map.__parent__ = self
         self.order = ()  # Enable ordering
+        self._revision = Length()
+        self.changelog = ChangeLog()
+
+    @property
+    def revision(self):
+        """ A counter that changes whenever anything within this wall changes. """
+        try:
+            return self._revision()
+        except AttributeError:
+            return 0
+
+    def bump_revision(self):
+        try:
+            counter = self._revision
+        except AttributeError:
+            self._revision = counter = Length()
+        counter.change(1)
+        return counter()
+
+    def log_change(self, action:str, kind:str, id:int):
+        """ Bump the revision and keep track of what changed. See kedja.models.changelog """
+        revision = self.bump_revision()
+        self._get_changelog(revision).append(revision, action, kind, id)
+        get_current_registry().notify(WallChanged(self, revision, action, kind, id))
+        return revision
+
+    def log_changes(self, action:str, kind:str, ids):
+        """ Like log_change, but for many ids at once. They're logged as a single revision,
+            and the WallChanged event has no id, only a count.
+        """
+        ids = tuple(ids)
+        revision = self.bump_revision()
+        self._get_changelog(revision).append(revision, action, kind, ids)
+        get_current_registry().notify(WallChanged(self, revision, action, kind, None, count=len(ids)))
+        return revision
+
+    def _get_changelog(self, revision:int):
+        try:
+            return self.changelog
+        except AttributeError:
+            self.changelog = changelog = ChangeLog(revision - 1)
+            return changelog
+
+    def roles_changed(self, userid:int):
+        wall_roles_changed(self, userid)
+
+    def acl_changed(self):
+        wall_acl_changed(self)
+
+    def changes_since(self, revision:int):
+        """ Return changes after revision or None if they aren't known. """
+        try:
+            changelog = self.changelog
+        except AttributeError:
+            return
+        return changelog.since(revision)
 
 
 WallContent = ContentType(factory=Wall, schema=WallSchema, title=_("Wall"), ownership_role=WALL_OWNER)
@@ -42,5 +115,30 @@ WallContent.add_permission_type(VISIBILITY)
 WallPerms = WallContent.permissions
 
 
+def _log_change(event, action):
+    """ Anything added, changed or removed within a wall bumps the walls revision and ends up in its changelog. """
+    wall = find_interface(event.context, IWall)
+    if wall is not None:
+        wall.log_change(action, RESOURCE, event.context.rid)
+        if action == REMOVED:
+            for rid in getattr(event, 'contained_rids', ()):
+                wall.log_change(action, RESOURCE, rid)
+
+
+def log_added(event):
+    _log_change(event, ADDED)
+
+
+def log_updated(event):
+    _log_change(event, UPDATED)
+
+
+def log_removed(event):
+    _log_change(event, REMOVED)
+
+
 def includeme(config):
     config.add_content(WallContent)
+    config.add_subscriber(log_added, IResourceAdded)
+    config.add_subscriber(log_updated, IObjectUpdated)
+    config.add_subscriber(log_removed, IResourceWillBeRemoved)
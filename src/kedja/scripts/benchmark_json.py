@@ -0,0 +1,96 @@
+""" Compare the JSON encoders when rendering the wall content endpoint.
+
+    python -m kedja.scripts.benchmark_json [--encoders-only] [collections] [cards per collection] [rounds]
+
+Builds a wall in memory, so nothing needs to be running. Each round renders the content payload
+the same way the endpoint does when no snapshot exists, and the same payload with ?fields=title.
+
+With --encoders-only, the wall isn't built. Only the encoding is timed, on plain dicts with the same
+shape as the content payload.
+"""
+import sys
+from timeit import repeat
+
+from pyramid import testing
+from pyramid.request import apply_request_extensions
+
+from kedja.interfaces import IJSONEncoder
+from kedja.renderers import ENCODERS
+from kedja.renderers import make_encoder
+from kedja.testing import get_settings
+
+
+def build_wall(registry, collections:int, cards:int):
+    content = registry.content
+    root = content('Root')
+    root['wall'] = wall = content('Wall', rid=2)
+    rid = 10
+    for i in range(collections):
+        wall[str(rid)] = collection = content('Collection', rid=rid)
+        collection.title = "Collection %s" % i
+        rid += 1
+        for j in range(cards):
+            collection[str(rid)] = card = content('Card', rid=rid)
+            card.title = "Card %s in collection %s" % (j, i)
+            card.int_indicator = j
+            rid += 1
+    return root
+
+
+def build_payload(collections:int, cards:int):
+    """ Plain dicts shaped like the content payload of the wall build_wall creates. """
+    resources = {}
+    rid = 10
+    for i in range(collections):
+        resources[str(rid)] = {'type_name': 'Collection', 'rid': rid, 'data': {'title': "Collection %s" % i}}
+        rid += 1
+        for j in range(cards):
+            data = {'title': "Card %s in collection %s" % (j, i), 'int_indicator': j}
+            resources[str(rid)] = {'type_name': 'Card', 'rid': rid, 'data': data}
+            rid += 1
+    return {'resources': resources}
+
+
+def benchmark_encoders(collections:int, cards:int, rounds:int):
+    payload = build_payload(collections, cards)
+    print("Encoding only, %s collections and %s cards, best of %s rounds" % (collections, collections * cards, rounds))
+    for name in sorted(ENCODERS):
+        encoder = make_encoder(name)
+        size = len(encoder(payload))
+        best = min(repeat(lambda: encoder(payload), number=1, repeat=rounds))
+        print("%-8s %8.2f ms %10s bytes" % (name, best * 1000, size))
+
+
+def main(argv=sys.argv):
+    argv = list(argv)
+    encoders_only = '--encoders-only' in argv
+    if encoders_only:
+        argv.remove('--encoders-only')
+    collections = int(argv[1]) if len(argv) > 1 else 20
+    cards = int(argv[2]) if len(argv) > 2 else 50
+    rounds = int(argv[3]) if len(argv) > 3 else 20
+    if encoders_only:
+        return benchmark_encoders(collections, cards, rounds)
+    config = testing.setUp(settings=get_settings())
+    try:
+        config.include('kedja.testing')
+        config.include('kedja.views.api.walls')
+        from kedja.views.api.walls import WallContentAPIView
+        root = build_wall(config.registry, collections, cards)
+        wall = root['wall']
+        print("Wall with %s collections and %s cards, best of %s rounds" % (collections, collections * cards, rounds))
+        for name in sorted(ENCODERS):
+            config.registry.registerUtility(make_encoder(name), IJSONEncoder)
+            for params in ({}, {'fields': 'title'}):
+                request = testing.DummyRequest(params=params)
+                apply_request_extensions(request)
+                view = WallContentAPIView(request, context=root)
+                size = len(view.render_content(wall))
+                best = min(repeat(lambda: view.render_content(wall), number=1, repeat=rounds))
+                print("%-8s %-14s %8.2f ms %10s bytes" % (name, params and '?fields=title' or '', best * 1000, size))
+    finally:
+        testing.tearDown()
+
+
+if __name__ == '__main__':
+    main()
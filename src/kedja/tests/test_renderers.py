@@ -0,0 +1,42 @@
+from json import loads
+from unittest import TestCase
+
+from pyramid import testing
+
+
+class JSONEncoderTests(TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp()
+
+    def tearDown(self):
+        testing.tearDown()
+
+    @property
+    def _cut(self):
+        from kedja.renderers import JSONEncoder
+        return JSONEncoder
+
+    def test_encoders(self):
+        from kedja.renderers import ENCODERS
+        value = {'a': [1, {'b': True}], 2: "b"}
+        for name in ENCODERS:
+            encoder = self._cut(name)
+            self.assertEqual({'a': [1, {'b': True}], '2': "b"}, loads(encoder(value)))
+            self.assertEqual({'a': 'A'}, loads(encoder({'a': object()}, default=lambda obj: 'A')))
+            self.assertRaises(TypeError, encoder, object())
+
+    def test_make_encoder(self):
+        from kedja.renderers import make_encoder
+        from pyramid.exceptions import ConfigurationError
+        self.assertEqual('json', make_encoder('json').name)
+        self.assertRaises(ConfigurationError, make_encoder, '404')
+
+    def test_renderer(self):
+        from kedja.interfaces import IJSONEncoder
+        from pyramid.renderers import render
+        self.config.registry.settings['kedja.json_encoder'] = 'json'
+        self.config.include('kedja.renderers')
+        self.assertEqual('json', self.config.registry.getUtility(IJSONEncoder).name)
+        request = testing.DummyRequest()
+        self.assertEqual({'a': {'b': 1}}, loads(render('json', {'a': {'b': 1}}, request=request)))
@@ -0,0 +1,35 @@
+from unittest import TestCase
+
+from pyramid import testing
+from pyramid.interfaces import ISessionFactory
+from pyramid.request import Request
+
+
+class SessionSettingsTests(TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp(settings={'kedja.redis_url': 'redis://localhost:6379/0'})
+
+    def tearDown(self):
+        testing.tearDown()
+
+    @property
+    def _fut(self):
+        from kedja import set_session_defaults
+        return set_session_defaults
+
+    def test_include_pyramid_session_redis(self):
+        from kedja.utils import get_redis_conn
+        self._fut(self.config.registry.settings)
+        self.config.include('pyramid_session_redis')
+        factory = self.config.registry.getUtility(ISessionFactory)
+        request = Request.blank('/')
+        request.registry = self.config.registry
+        session = factory(request)
+        session['hello'] = 'world'
+        self.assertIs(get_redis_conn(self.config.registry), session.redis)
+
+    def test_keeps_secret(self):
+        settings = {'kedja.redis_url': 'redis://localhost:6379/0', 'redis.sessions.secret': 'secret'}
+        self._fut(settings)
+        self.assertEqual('secret', settings['redis.sessions.secret'])
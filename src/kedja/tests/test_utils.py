@@ -0,0 +1,28 @@
+from unittest import TestCase
+
+
+class GetRedisPoolStatsTests(TestCase):
+
+    @property
+    def _fut(self):
+        from kedja.utils import get_redis_pool_stats
+        return get_redis_pool_stats
+
+    def test_connection_pool(self):
+        from redis import ConnectionPool
+        from redis import StrictRedis
+        conn = StrictRedis(connection_pool=ConnectionPool(max_connections=5))
+        self.assertEqual({'max_connections': 5, 'created': 0, 'idle': 0, 'in_use': 0}, self._fut(conn))
+
+    def test_blocking_connection_pool(self):
+        from redis import BlockingConnectionPool
+        from redis import StrictRedis
+        conn = StrictRedis(connection_pool=BlockingConnectionPool(max_connections=5))
+        self.assertEqual({'max_connections': 5, 'created': 0, 'idle': 0, 'in_use': 0}, self._fut(conn))
+
+    def test_private_attributes_gone(self):
+        from redis import ConnectionPool
+        from redis import StrictRedis
+        pool = ConnectionPool(max_connections=5)
+        del pool._in_use_connections
+        self.assertEqual({'max_connections': 5}, self._fut(StrictRedis(connection_pool=pool)))
@@ -1,16 +1,51 @@
 
 from datetime import datetime
+from logging import getLogger
 
 import pytz
+from pyramid.settings import asbool
 from pyramid.threadlocal import get_current_registry
+from redis import BlockingConnectionPool
+from redis import ConnectionPool
+from redis import ResponseError
 from redis import StrictRedis
 
 
+logger = getLogger(__name__)
+
+
 def utcnow():
     return pytz.utc.localize(datetime.utcnow())
 
 
+def get_redis_pool_options(settings):
+    """ Connection pool options from settings. See get_redis_conn. """
+    return dict(
+        max_connections=int(settings.get('kedja.redis_max_connections', 50)),
+        timeout=float(settings.get('kedja.redis_pool_timeout', 5)),
+        socket_timeout=float(settings.get('kedja.redis_socket_timeout', 5)),
+        socket_connect_timeout=float(settings.get('kedja.redis_socket_connect_timeout', 2)),
+        health_check_interval=int(settings.get('kedja.redis_health_check_interval', 30)),
+        retry_on_timeout=asbool(settings.get('kedja.redis_retry_on_timeout', True)),
+    )
+
+
 def get_redis_conn(registry=None):
+    """ Return the redis client for this application. It's shared by credentials, tokens, snapshots and sessions.
+
+        The connection pool is configured with these settings:
+
+        kedja.redis_max_connections
+            Max connections per process. Default 50
+        kedja.redis_pool_timeout
+            Seconds to wait for a free connection before raising ConnectionError. Default 5
+        kedja.redis_socket_timeout, kedja.redis_socket_connect_timeout
+            Seconds before a slow redis causes a TimeoutError instead of stalling the request. Default 5 and 2
+        kedja.redis_health_check_interval
+            Idle connections are checked with a PING before use after this many seconds. Default 30
+        kedja.redis_retry_on_timeout
+            Retry a command once on timeout. Default true
+    """
     if registry is None:
         registry = get_current_registry()
     try:
@@ -21,9 +56,77 @@ def get_redis_conn(registry=None):
             from fakeredis import FakeStrictRedis
             registry.redis_conn = connection = FakeStrictRedis()
         else:
-            registry.redis_conn = connection = StrictRedis.from_url(registry.settings['kedja.redis_url'])
+            options = get_redis_pool_options(registry.settings)
+            pool = BlockingConnectionPool.from_url(registry.settings['kedja.redis_url'], **options)
+            registry.redis_conn = connection = StrictRedis(connection_pool=pool)
+    return connection
+
+
+def get_redis_pubsub_conn(registry=None):
+    """ Return a redis client for the subscriber in kedja.models.pubsub. It keeps its connection for a long time,
+        so it has a pool of its own, without socket timeout since it waits for messages.
+    """
+    if registry is None:
+        registry = get_current_registry()
+    try:
+        connection = registry.redis_pubsub_conn
+    except AttributeError:
+        if registry.package_name == 'testing':
+            registry.redis_pubsub_conn = connection = get_redis_conn(registry)
+        else:
+            options = get_redis_pool_options(registry.settings)
+            pool = ConnectionPool.from_url(
+                registry.settings['kedja.redis_url'],
+                socket_connect_timeout=options['socket_connect_timeout'],
+                health_check_interval=options['health_check_interval'],
+            )
+            registry.redis_pubsub_conn = connection = StrictRedis(connection_pool=pool)
     return connection
 
 
+def get_redis_pool_stats(connection):
+    """ Return a dict with the number of connections created, in use and idle within the pool of connection.
+        redis-py has no public API for this, so if the attributes counted here are gone
+        after an upgrade, only max_connections is returned.
+    """
+    pool = connection.connection_pool
+    stats = {'max_connections': getattr(pool, 'max_connections', None)}
+    try:
+        if isinstance(pool, BlockingConnectionPool):
+            # Connections not created yet are None in the queue
+            created = len(pool._connections)
+            idle = len([x for x in list(pool.pool.queue) if x is not None])
+            stats.update(created=created, idle=idle, in_use=created - idle)
+        elif isinstance(pool, ConnectionPool):
+            stats.update(
+                created=pool._created_connections,
+                idle=len(pool._available_connections),
+                in_use=len(pool._in_use_connections),
+            )
+    except (AttributeError, TypeError):
+        logger.warning("Can't count the connections of %r", pool)
+    return stats
+
+
+def session_redis_client(request, **redis_options):
+    """ Used by pyramid_session_redis so sessions use the same connection pool as everything else. """
+    return get_redis_conn(request.registry)
+
+
+def getdel(conn, key:str):
+    """ Get the value of key and delete it atomically, so only one caller will ever get it.
+        Redis versions before 6.2 lack GETDEL, in which case GET and DEL are sent as one MULTI transaction.
+    """
+    try:
+        return conn.getdel(key)
+    except ResponseError as exc:
+        if 'unknown command' not in str(exc).lower():
+            raise
+    pipe = conn.pipeline(transaction=True)
+    pipe.get(key)
+    pipe.delete(key)
+    return pipe.execute()[0]
+
+
 def _redis_conn_rm(request):
     return get_redis_conn(request.registry)
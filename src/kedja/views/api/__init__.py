@@ -2,9 +2,12 @@
 
 def includeme(config):
     config.include('.auth')
+    config.include('.batch')
     config.include('.cards')
     config.include('.collections')
+    config.include('.graph')
     config.include('.relations')
     config.include('.resource')
+    config.include('.status')
     config.include('.users')
     config.include('.walls')
@@ -39,6 +39,7 @@ The credentials will be returned (same as 4A)
 from logging import getLogger
 from urllib.parse import urlparse
 
+import transaction
 from authomatic.adapters import WebObAdapter
 from cornice.resource import resource
 from cornice.resource import view
@@ -91,17 +92,16 @@ class AuthViewMixin(object):
         return self.request.registry.getAdapter(self.context, IOneTimeRegistrationToken)
 
     def validate_temp_auth_token(self, request, **kw):
+        """ Consume the token right away, so validating and using it is a single atomic operation.
+            The credentials will be stored in request.validated.
+        """
         userid = self.request.matchdict['userid']
         token = self.request.matchdict['token']
-        if not self.auth_tokens.validate(userid, token, registry=self.request.registry):
-            self.error(request, "No such user or auth token", status=400)
-
-    def consume_temp_auth_token(self, userid:str, token:str):
         credentials = self.auth_tokens.consume(userid, token, registry=self.request.registry)
         if credentials:
-            return credentials
-        # This shouldn't happen due to validation 'validate_temp_auth_token'
-        raise HTTPBadRequest("No such user or token")
+            request.validated['credentials'] = credentials
+        else:
+            self.error("No such user or auth token", status=400)
 
 
 class AuthomaticView(BaseView, AuthViewMixin):
@@ -226,7 +226,7 @@ class AuthRegisterAPIView(APIBase, AuthViewMixin):
 
     @view(validators=('validate_reg_token'))
     def post(self):
-        userpayload = self.reg_tokens.consume(self.request.matchdict['token'], registry=self.request.registry)
+        userpayload = self.request.validated['userpayload']
         users = self.root['users']
         user = self.request.registry.content('User', rid=self.request.root.rid_map.new_rid())
         users[user.userid] = user
@@ -239,9 +239,33 @@ class AuthRegisterAPIView(APIBase, AuthViewMixin):
         return cred
 
     def validate_reg_token(self, request, **kw):
+        """ Consume the token right away, so it can't be used twice. The payload will be stored in request.validated.
+            Since the token is gone from redis, it's stored again if the user couldn't be committed,
+            or if the transaction was aborted.
+        """
         token = self.request.matchdict['token']
-        if not self.reg_tokens.validate(token, registry=self.request.registry):
-            self.error(request, "No such registration token", status=400)
+        userpayload = self.reg_tokens.consume(token, registry=self.request.registry)
+        if userpayload:
+            request.validated['userpayload'] = userpayload
+            tm = getattr(request, 'tm', None)
+            txn = transaction.get() if tm is None else tm.get()
+            restore = {'token': token, 'userpayload': userpayload, 'registry': request.registry}
+            txn.addAfterCommitHook(self._restore_reg_token_after_commit, args=(restore,))
+            # A failed commit is aborted afterwards too, restore will only be done once
+            txn.addAfterAbortHook(self._restore_reg_token, args=(restore,))
+        else:
+            self.error("No such registration token", status=400)
+
+    def _restore_reg_token_after_commit(self, status, restore):
+        if not status:
+            self._restore_reg_token(restore)
+
+    def _restore_reg_token(self, restore):
+        token = restore.pop('token', None)
+        if token is None:
+            return
+        # Keep it for a short while, long enough for a retry
+        self.reg_tokens.create(restore['userpayload'], expires=300, registry=restore['registry'], token=token)
 
 
 @resource(path='/api/1/auth/credentials/{userid}/{token}',
@@ -254,9 +278,7 @@ class AuthCredentialsAPIView(APIBase, AuthViewMixin):
 
     @view(validators=('validate_temp_auth_token'))
     def post(self):
-        userid = self.request.matchdict['userid']
-        token = self.request.matchdict['token']
-        return self.consume_temp_auth_token(userid, token)
+        return self.request.validated['credentials']
 
 
 @resource(path='/api/1/auth/logout',
@@ -4,7 +4,15 @@ from logging import getLogger
 import colander
 from arche.content import EDIT, VIEW, DELETE
 from pyramid.decorator import reify
+from pyramid.httpexceptions import HTTPNotModified
+from pyramid.traversal import find_interface
 from pyramid.traversal import find_root
+from webob.etag import ETagMatcher
+
+from kedja.interfaces import IWall
+from kedja.interfaces import IWallSnapshots
+from kedja.models.resource_cache import ResourceCache
+from kedja.resources.ordering import iter_children
 
 
 logger = getLogger(__name__)
@@ -15,18 +23,25 @@ class APIBase(object):
     def __init__(self, request, context=None):
         self.request = request
         self.context = context
-        self._lookup_cache = {}
         request.content_type = 'application/json'  # To make Cornice happy, in case someone forgot that header
 
     @reify
     def root(self):
         return find_root(self.context)
 
+    @reify
+    def resource_cache(self):
+        """ Shared by everything during this request, see kedja.models.resource_cache """
+        cache = getattr(self.request, 'resource_cache', None)
+        if cache is None:
+            cache = ResourceCache()
+        return cache
+
     def get_resource(self, rid):
         if isinstance(rid, str):
             # This should be catched by other means, for instance in the schema
             rid = int(rid)
-        resource = self._lookup_cache.setdefault(rid, self.root.rid_map.get_resource(rid))
+        resource = self.resource_cache.get_resource(self.root, rid)
         if resource is None:
             self.error("No resource with RID %s" % rid, type='path', status=404)
             return
@@ -49,6 +64,10 @@ class APIBase(object):
             self.error("JSON decode error: %s" % exc, type='body', status=400)
             return
 
+    def is_allowed(self, resource, permission):
+        """ Check a permission type for resource. The result is cached during this request. """
+        return self.resource_cache.has_permission(self.request, resource, permission)
+
     def check_type_name(self, resource, type_name=None):
         if type_name is None:
             return True
@@ -60,7 +79,7 @@ class APIBase(object):
     def view_resource_validator(self, request, **kw):
         context = self.base_get(request.matchdict['rid'])
         if context is not None:
-            if not request.registry.content.has_permission_type(context, request, VIEW):
+            if not self.is_allowed(context, VIEW):
                 self.error("You're not allowed to view: %s" % context.rid, status=403)
 
     def base_get(self, rid, type_name=None):
@@ -91,11 +110,12 @@ class ResourceAPIBase(APIBase):
             self.error("%r is not contained within %r" % (resource, parent), type='path', status=404)
             return
 
-    def base_put(self, rid, type_name=None):
-        """ Update a resource """
+    def base_put(self, rid, type_name=None, appstruct=None):
+        """ Update a resource. The appstruct will be read from the request body unless specified. """
         resource = self.get_resource(rid)
         self.check_type_name(resource, type_name=type_name)
-        appstruct = self.get_json_appstruct()
+        if appstruct is None:
+            appstruct = self.get_json_appstruct()
         # Note: The mutator API will probably change!
         with self.request.get_mutator(resource) as mutator:
             changed = mutator.update(appstruct)
@@ -111,28 +131,50 @@ class ResourceAPIBase(APIBase):
             return {'removed': int(rid)}
 
     def base_collection_get(self, parent, type_name=None):
+        """ Return the contained resources the user may view, in order. See paginate. """
         if parent is None:
             return
-        resources = []
-        for x in parent.values():
-            if type_name is None:
-                resources.append(x)
-            elif getattr(x, 'type_name', object()) == type_name:
-                resources.append(x)
+        return self.paginate(lambda cursor: iter_children(parent, cursor), parent.__getitem__, type_name=type_name)
+
+    def paginate(self, iter_keys, get, type_name=None):
+        """ Return the resources the user may view. iter_keys will be called with the cursor from the querystring
+            and should yield (cursor, key) for everything after it. Resources are loaded by calling get with the key.
+
+            With limit in the querystring, at most that many are returned and the X-Next-Cursor header
+            is set when there may be more. Pass it as cursor to get the next page.
+        """
+        query = getattr(self.request, 'validated', {}).get('querystring', {})
+        limit = query.get('limit', None)
+        cursor = query.get('cursor', None)
         results = []
-        for x in resources:
-            if self.request.registry.content.has_permission_type(x, self.request, VIEW):
-                results.append(x)
+        try:
+            for (position, key) in iter_keys(cursor):
+                if limit is not None and len(results) >= limit:
+                    self.request.response.headers['X-Next-Cursor'] = cursor
+                    break
+                cursor = position
+                x = get(key)
+                if x is None:
+                    continue
+                if type_name is not None and getattr(x, 'type_name', object()) != type_name:
+                    continue
+                if self.is_allowed(x, VIEW):
+                    results.append(x)
+        except ValueError:
+            self.error("Invalid cursor", type='querystring', status=400)
+            return
         return results
 
-    def base_collection_post(self, type_name, parent_rid=None, parent_type_name=None):
+    def base_collection_post(self, type_name, parent_rid=None, parent_type_name=None, appstruct=None):
+        """ Create a resource. The appstruct will be read from the request body unless specified. """
         new_res = self.request.registry.content(type_name)
         new_res.rid = self.root.rid_map.new_rid()
         #FIXME Check add permission within this parent
         parent = self.base_get(parent_rid, type_name=parent_type_name)
         # Should be the root
         parent.add(str(new_res.rid), new_res)
-        appstruct = self.get_json_appstruct()
+        if appstruct is None:
+            appstruct = self.get_json_appstruct()
         # Note: The mutator API will probably change!
         with self.request.get_mutator(new_res) as mutator:
             changed = mutator.update(appstruct)
@@ -142,16 +184,55 @@ class ResourceAPIBase(APIBase):
     def edit_resource_validator(self, request, **kw):
         context = self.base_get(request.matchdict['rid'])
         if context is not None:
-            if not request.registry.content.has_permission_type(context, request, EDIT):
+            if not self.is_allowed(context, EDIT):
                 self.error("You're not allowed to edit: %s" % context.rid, status=403)
 
     def delete_resource_validator(self, request, **kw):
         context = self.base_get(request.matchdict['rid'])
         if context is not None:
-            if not request.registry.content.has_permission_type(context, request, DELETE):
+            if not self.is_allowed(context, DELETE):
                 self.error("You're not allowed to delete: %s" % context.rid, status=403)
 
 
+    def get_etag(self, resource):
+        """ Return an ETag based on the revision of the wall this resource is within, if any. """
+        wall = find_interface(resource, IWall)
+        if wall is not None:
+            return "{}.{}".format(wall.rid, wall.revision)
+
+    def not_modified(self, resource):
+        """ Set an ETag on the response if resource is within a wall.
+            In case the client already has the current revision, return a 304 response
+            so nothing needs to be traversed or serialized.
+        """
+        if resource is None:
+            return
+        etag = self.get_etag(resource)
+        if etag is None:
+            return
+        response = self.request.response
+        response.etag = etag
+        response.vary = ('Authorization',)
+        if_none_match = self.request.headers.get('If-None-Match')
+        if if_none_match and etag in ETagMatcher.parse(if_none_match):
+            # Never confirm anything the user isn't allowed to see
+            if self.is_allowed(resource, VIEW):
+                return HTTPNotModified(etag=etag, vary=('Authorization',))
+
+    def snapshot_response(self, wall, name, render):
+        """ Return a JSON response with a snapshot of the wall. render will be called with the wall
+            to produce the payload in case no snapshot exists for the current revision. """
+        snapshots = self.request.registry.queryUtility(IWallSnapshots)
+        if snapshots is None:
+            payload = render(wall)
+        else:
+            payload = snapshots.get_or_create(wall, name, lambda: render(wall))
+        response = self.request.response
+        response.content_type = 'application/json'
+        response.body = payload
+        return response
+
+
 class RIDPathSchema(colander.Schema):
     rid = colander.SchemaNode(
         colander.Int(),
@@ -174,6 +255,27 @@ class ResourceAPISchema(colander.Schema):
     path = RIDPathSchema()
 
 
+class PaginationQuerySchema(colander.Schema):
+    limit = colander.SchemaNode(
+        colander.Int(),
+        validator=colander.Range(min=1, max=500),
+        missing=None,
+    )
+    cursor = colander.SchemaNode(
+        colander.String(),
+        description="From the X-Next-Cursor header of the previous page",
+        missing=None,
+    )
+
+
+class PaginationAPISchema(colander.Schema):
+    querystring = PaginationQuerySchema()
+
+
+class ResourceListAPISchema(ResourceAPISchema):
+    querystring = PaginationQuerySchema()
+
+
 class SubResourceAPISchema(colander.Schema):
     path = SubRIDPathSchema()
 
@@ -0,0 +1,209 @@
+import colander
+import transaction
+from arche.content import EDIT, DELETE
+from cornice.resource import resource
+from cornice.resource import view
+from cornice.validators import colander_validator
+
+from kedja.views.api.base import ResourceAPIBase
+from kedja.views.api.relations import RelationSchema
+
+
+class Reference(colander.SchemaType):
+    """ A rid or relation id. Either as an int, or as a string like '$0' to refer to
+        whatever the first operation within the same batch created or updated.
+    """
+
+    def serialize(self, node, appstruct):
+        return appstruct
+
+    def deserialize(self, node, cstruct):
+        if cstruct is colander.null:
+            return cstruct
+        if is_reference(cstruct):
+            return cstruct
+        if isinstance(cstruct, int) and not isinstance(cstruct, bool):
+            return cstruct
+        raise colander.Invalid(node, "%r is neither an id nor a reference like '$0'" % (cstruct,))
+
+
+def is_reference(value):
+    return isinstance(value, str) and value.startswith('$') and value[1:].isdigit()
+
+
+class BatchOperationSchema(colander.Schema):
+    method = colander.SchemaNode(
+        colander.String(),
+        validator=colander.OneOf(['POST', 'PUT', 'DELETE']),
+    )
+    type_name = colander.SchemaNode(
+        colander.String(),
+        validator=colander.OneOf(['Wall', 'Collection', 'Card', 'Relation']),
+    )
+    rid = colander.SchemaNode(
+        Reference(),
+        description="The resource to update or delete. For relations, the wall they're in.",
+        missing=None,
+    )
+    parent = colander.SchemaNode(
+        Reference(),
+        description="Where to create a new resource. Not used for walls.",
+        missing=None,
+    )
+    relation_id = colander.SchemaNode(
+        Reference(),
+        missing=None,
+    )
+    data = colander.SchemaNode(
+        colander.Mapping(unknown='preserve'),
+        description="Same payload as the regular endpoint for this type",
+        missing=None,
+    )
+
+
+class BatchOperationsSchema(colander.SequenceSchema):
+    operation = BatchOperationSchema()
+
+
+class BatchBodySchema(colander.Schema):
+    operations = BatchOperationsSchema(
+        validator=colander.Length(1, 500),
+    )
+
+
+class BatchAPISchema(colander.Schema):
+    title = "Run several operations within one transaction"
+    body = BatchBodySchema(description="JSON payload")
+
+
+@resource(path='/api/1/batch',
+          tags=['Batch'],
+          validators=(colander_validator,),
+          cors_origins=('*',),
+          factory='kedja.root_factory')
+class BatchAPIView(ResourceAPIBase):
+    """ Create, update and delete walls, collections, cards and relations in one request.
+        The operations are executed in order within the same transaction. If one of them fails,
+        nothing will be changed and the error will point out which operation caused it.
+    """
+    parent_type_names = {
+        'Wall': 'Root',
+        'Collection': 'Wall',
+        'Card': 'Collection',
+    }
+
+    @view(schema=BatchAPISchema())
+    def post(self):
+        results = []
+        ids = []
+        for (index, operation) in enumerate(self.request.validated['body']['operations']):
+            try:
+                result = self.run_operation(operation, ids)
+            except colander.Invalid as exc:
+                for (name, msg) in exc.asdict().items():
+                    self.error("%s: %s" % (name, msg), type='body', status=400)
+                result = None
+            except ValueError as exc:
+                self.error(str(exc), type='body', status=400)
+                result = None
+            if result is None or len(self.request.errors):
+                return self.abort_batch(index)
+            results.append(result)
+            ids.append(getattr(result, 'rid', getattr(result, 'relation_id', None)))
+        return {'results': results}
+
+    def abort_batch(self, index):
+        """ Doom the transaction so the transaction manager won't commit anything the earlier operations did. """
+        tm = getattr(self.request, 'tm', None)
+        if tm is None:
+            tm = transaction.manager
+        tm.doom()
+        self.request.errors.add('body', 'operations.%s' % index, "Operation failed, nothing was changed")
+
+    def resolve(self, value, ids):
+        """ Turn references like '$0' into the id of what that operation created or updated. """
+        if not is_reference(value):
+            return value
+        index = int(value[1:])
+        if index >= len(ids) or ids[index] is None:
+            raise ValueError("%r doesn't refer to an earlier operation that created or updated something" % value)
+        return ids[index]
+
+    def has_permission(self, resource, permission):
+        if self.is_allowed(resource, permission):
+            return True
+        self.error("You're not allowed to %s: %s" % (permission.lower(), resource.rid), status=403)
+        return False
+
+    def deserialize_data(self, type_name, data, context):
+        schema = self.request.registry.content[type_name].schema()
+        schema = schema.bind(request=self.request, context=context)
+        return schema.deserialize(data or {})
+
+    def run_operation(self, operation, ids):
+        """ Returns the created or updated resource, or a dict like the regular delete views.
+            Returns None if something went wrong, in which case an error has been added to the request.
+        """
+        method = operation['method']
+        type_name = operation['type_name']
+        rid = self.resolve(operation['rid'], ids)
+        if type_name == 'Relation':
+            return self.run_relation_operation(operation, rid, ids)
+        if method == 'POST':
+            parent_type_name = self.parent_type_names[type_name]
+            if parent_type_name == 'Root':
+                parent_rid = self.root.rid
+            else:
+                parent_rid = self.resolve(operation['parent'], ids)
+            if parent_rid is None:
+                raise ValueError("'parent' is required to create a %s" % type_name)
+            parent = self.base_get(parent_rid, type_name=parent_type_name)
+            if parent is None:
+                return
+            # FIXME: Check add permission instead, same as the regular views
+            if parent is not self.root and not self.has_permission(parent, EDIT):
+                return
+            appstruct = self.deserialize_data(type_name, operation['data'], parent)
+            return self.base_collection_post(
+                type_name, parent_rid=parent_rid, parent_type_name=parent_type_name, appstruct=appstruct)
+        if rid is None:
+            raise ValueError("'rid' is required to %s a %s" % (method, type_name))
+        resource = self.base_get(rid, type_name=type_name)
+        if resource is None:
+            return
+        if method == 'PUT':
+            if self.has_permission(resource, EDIT):
+                appstruct = self.deserialize_data(type_name, operation['data'], resource)
+                return self.base_put(rid, type_name=type_name, appstruct=appstruct)
+        elif self.has_permission(resource, DELETE):
+            return self.base_delete(rid, type_name=type_name)
+
+    def run_relation_operation(self, operation, rid, ids):
+        if rid is None:
+            raise ValueError("'rid' of the wall is required for relations")
+        wall = self.base_get(rid, type_name='Wall')
+        if wall is None or not self.has_permission(wall, EDIT):
+            return
+        method = operation['method']
+        relation_id = self.resolve(operation['relation_id'], ids)
+        if method != 'POST' and relation_id is None:
+            raise ValueError("'relation_id' is required to %s a relation" % method)
+        if method == 'DELETE':
+            if relation_id in wall.relations_map:
+                del wall.relations_map[relation_id]
+                return {'removed': relation_id}
+            self.error("No relation with relation_id %r" % relation_id)
+            return
+        data = dict(operation['data'] or {})
+        if isinstance(data.get('members'), list):
+            data['members'] = [self.resolve(x, ids) for x in data['members']]
+        appstruct = RelationSchema().deserialize(data)
+        if method == 'POST':
+            relation_id = wall.relations_map.create(appstruct['members'])
+        else:
+            wall.relations_map[relation_id] = appstruct['members']
+        return wall.relations_map.get_as_json(relation_id)
+
+
+def includeme(config):
+    config.scan(__name__)
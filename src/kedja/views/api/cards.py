@@ -1,11 +1,15 @@
+import colander
+from arche.content import EDIT
 from cornice.resource import resource
 from cornice.resource import view
 from cornice.validators import colander_validator
 
 from kedja.resources.card import CardSchema
+from kedja.resources.ordering import move_resource
 from kedja.views.api.base import ResourceAPIBase
 from kedja.views.api.base import SubResourceAPISchema
 from kedja.views.api.base import ResourceAPISchema
+from kedja.views.api.base import ResourceListAPISchema
 
 
 class CreateCardSchema(ResourceAPISchema):
@@ -17,6 +21,24 @@ class UpdateCardAPISchema(SubResourceAPISchema, CreateCardSchema):
     title = "Update a specific card"
 
 
+class MoveCardSchema(colander.Schema):
+    parent = colander.SchemaNode(
+        colander.Int(),
+        description="RID of the collection to move the card to. Defaults to the one it's in.",
+        missing=None,
+    )
+    before = colander.SchemaNode(
+        colander.Int(),
+        description="RID of the card it should be placed before. It will be placed last if this isn't specified.",
+        missing=None,
+    )
+
+
+class MoveCardAPISchema(SubResourceAPISchema):
+    title = "Move a card within the same wall"
+    body = MoveCardSchema(description="JSON payload")
+
+
 @resource(collection_path='/api/1/collections/{rid}/cards',
           path='/api/1/collections/{rid}/cards/{subrid}',  # This isn't used, but cornice needs this path?
           tags=['Cards'],
@@ -30,8 +52,9 @@ class ContainedCardsAPI(ResourceAPIBase):
     @view(schema=SubResourceAPISchema())
     def get(self):
         collection = self.base_get(self.request.matchdict['rid'], type_name=self.parent_type_name)
-        if collection:
-            return self.contained_get(collection, self.request.matchdict['subrid'], type_name=self.type_name)
+        if collection is not None:
+            resource = self.contained_get(collection, self.request.matchdict['subrid'], type_name=self.type_name)
+            return self.not_modified(resource) or resource
 
     @view(schema=UpdateCardAPISchema())
     def put(self):
@@ -41,15 +64,56 @@ class ContainedCardsAPI(ResourceAPIBase):
     def delete(self):
         return self.base_delete(self.request.matchdict['subrid'], type_name=self.type_name)
 
-    @view(schema=ResourceAPISchema())
+    @view(schema=ResourceListAPISchema())
     def collection_get(self):
         parent = self.base_get(self.request.matchdict['rid'], type_name=self.parent_type_name)
-        return self.base_collection_get(parent, type_name=self.type_name)
+        return self.not_modified(parent) or self.base_collection_get(parent, type_name=self.type_name)
 
     @view(schema=CreateCardSchema())
     def collection_post(self):
         return self.base_collection_post(self.type_name, parent_rid=self.request.matchdict['rid'], parent_type_name=self.parent_type_name)
 
 
+@resource(path='/api/1/collections/{rid}/cards/{subrid}/move',
+          tags=['Cards'],
+          validators=(colander_validator,),
+          cors_origins=('*',),
+          factory='kedja.root_factory')
+class MoveCardAPIView(ResourceAPIBase):
+    """ Change the position of a card, or move it to another collection within the same wall.
+        The card keeps its rid and relations.
+    """
+    type_name = 'Card'
+    parent_type_name = 'Collection'
+
+    @view(schema=MoveCardAPISchema(), validators=(colander_validator, 'edit_resource_validator'))
+    def put(self):
+        collection = self.base_get(self.request.matchdict['rid'], type_name=self.parent_type_name)
+        if collection is None:
+            return
+        card = self.contained_get(collection, self.request.matchdict['subrid'], type_name=self.type_name)
+        if card is None:
+            return
+        appstruct = self.request.validated['body']
+        target = collection
+        if appstruct['parent'] is not None:
+            target = self.base_get(appstruct['parent'], type_name=self.parent_type_name)
+            if target is None:
+                return
+            if not self.is_allowed(target, EDIT):
+                return self.error("You're not allowed to edit: %s" % target.rid, type='body', status=403)
+        before = None
+        if appstruct['before'] is not None:
+            sibling = self.contained_get(target, appstruct['before'], type_name=self.type_name)
+            if sibling is None:
+                return
+            before = sibling.__name__
+        try:
+            move_resource(card, target, before=before)
+        except ValueError as exc:
+            return self.error(str(exc), type='body', status=400)
+        return card
+
+
 def includeme(config):
     config.scan(__name__)
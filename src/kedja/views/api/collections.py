@@ -6,6 +6,7 @@ from kedja.resources.collection import CollectionSchema
 from kedja.views.api.base import SubResourceAPISchema
 from kedja.views.api.base import ResourceAPIBase
 from kedja.views.api.base import ResourceAPISchema
+from kedja.views.api.base import ResourceListAPISchema
 
 
 class CreateCollectonSchema(ResourceAPISchema):
@@ -38,8 +39,9 @@ class ContainedCollectionsAPI(ResourceAPIBase):
     @view(schema=SubResourceAPISchema())
     def get(self):
         wall = self.base_get(self.request.matchdict['rid'], type_name=self.parent_type_name)
-        if wall:
-            return self.contained_get(wall, self.request.matchdict['subrid'], type_name=self.type_name)
+        if wall is not None:
+            resource = self.contained_get(wall, self.request.matchdict['subrid'], type_name=self.type_name)
+            return self.not_modified(resource) or resource
 
     @view(schema=UpdateCollectionAPISchema())
     def put(self):
@@ -49,10 +51,10 @@ class ContainedCollectionsAPI(ResourceAPIBase):
     def delete(self):
         return self.base_delete(self.request.matchdict['subrid'], type_name=self.type_name)
 
-    @view(schema=ResourceAPISchema())
+    @view(schema=ResourceListAPISchema())
     def collection_get(self):
         parent = self.base_get(self.request.matchdict['rid'], type_name=self.parent_type_name)
-        return self.base_collection_get(parent, type_name=self.type_name)
+        return self.not_modified(parent) or self.base_collection_get(parent, type_name=self.type_name)
 
     @view(schema=CreateCollectonSchema())
     def collection_post(self):
@@ -0,0 +1,102 @@
+import colander
+from cornice.resource import resource
+from cornice.resource import view
+from cornice.validators import colander_validator
+
+from kedja.views.api.base import ResourceAPIBase
+from kedja.views.api.base import ResourceAPISchema
+from kedja.views.api.base import SubResourceAPISchema
+
+
+class NeighboursQuerySchema(colander.Schema):
+    depth = colander.SchemaNode(
+        colander.Int(),
+        validator=colander.Range(min=1, max=10),
+        missing=1,
+    )
+
+
+class NeighboursAPISchema(SubResourceAPISchema):
+    querystring = NeighboursQuerySchema()
+
+
+class PathQuerySchema(colander.Schema):
+    source = colander.SchemaNode(
+        colander.Int(),
+    )
+    target = colander.SchemaNode(
+        colander.Int(),
+    )
+    max_depth = colander.SchemaNode(
+        colander.Int(),
+        validator=colander.Range(min=1, max=100),
+        missing=None,
+    )
+
+
+class PathAPISchema(ResourceAPISchema):
+    querystring = PathQuerySchema()
+
+
+class GraphAPIBase(ResourceAPIBase):
+    """ Queries about how resources within a wall are connected through relations. """
+    type_name = 'Wall'
+
+    def get_wall(self):
+        return self.base_get(self.request.matchdict['rid'], type_name=self.type_name)
+
+
+@resource(path='/api/1/walls/{rid}/graph/neighbours/{subrid}',
+          cors_origins=('*',),
+          tags=['Relations'],
+          factory='kedja.root_factory')
+class NeighboursAPIView(GraphAPIBase):
+
+    @view(schema=NeighboursAPISchema(), validators=(colander_validator, 'view_resource_validator'))
+    def get(self):
+        """ Everything within depth steps from a resource, as a list of rid and distance. Closest first. """
+        wall = self.get_wall()
+        if wall is not None:
+            response = self.not_modified(wall)
+            if response is not None:
+                return response
+            depth = self.request.validated['querystring']['depth']
+            found = wall.relations_map.neighbours(int(self.request.matchdict['subrid']), depth=depth)
+            return [{'rid': k, 'distance': v} for (k, v) in sorted(found.items(), key=lambda x: (x[1], x[0]))]
+
+
+@resource(path='/api/1/walls/{rid}/graph/components',
+          cors_origins=('*',),
+          tags=['Relations'],
+          factory='kedja.root_factory')
+class ComponentsAPIView(GraphAPIBase):
+
+    @view(schema=ResourceAPISchema(), validators=(colander_validator, 'view_resource_validator'))
+    def get(self):
+        """ Groups of rids connected to each other, largest group first. Resources without relations aren't included. """
+        wall = self.get_wall()
+        if wall is not None:
+            return self.not_modified(wall) or wall.relations_map.components()
+
+
+@resource(path='/api/1/walls/{rid}/graph/path',
+          cors_origins=('*',),
+          tags=['Relations'],
+          factory='kedja.root_factory')
+class PathAPIView(GraphAPIBase):
+
+    @view(schema=PathAPISchema(), validators=(colander_validator, 'view_resource_validator'))
+    def get(self):
+        """ The shortest path between source and target as a list of rids. path will be null if there's none. """
+        wall = self.get_wall()
+        if wall is not None:
+            response = self.not_modified(wall)
+            if response is not None:
+                return response
+            query = self.request.validated['querystring']
+            path = wall.relations_map.shortest_path(query['source'], query['target'], max_depth=query['max_depth'])
+            return {'source': query['source'], 'target': query['target'], 'path': path}
+
+
+def includeme(config):
+    config.scan(__name__)
@@ -3,7 +3,9 @@ from cornice.resource import resource
 from cornice.resource import view
 from cornice.validators import colander_validator
 from pyramid.decorator import reify
+from pyramid.traversal import find_interface
 
+from kedja.interfaces import IWall
 from kedja.views.api.base import RIDPathSchema
 from kedja.views.api.base import RelationAPISchema
 from kedja.views.api.base import RelationIDPathSchema
@@ -21,6 +23,31 @@ class RelationSchema(colander.Schema):
     )
 
 
+class BulkRelationsSchema(colander.Schema):
+    relations = colander.SchemaNode(
+        colander.Sequence(),
+        colander.SchemaNode(
+            colander.Sequence(),
+            colander.SchemaNode(
+                colander.Int(),
+            ),
+            name='members',
+            validator=colander.Length(2, 1000),
+        ),
+        validator=colander.Length(0, 10000),
+    )
+    replace = colander.SchemaNode(
+        colander.Bool(),
+        description="Remove all existing relations first",
+        missing=False,
+    )
+
+
+class BulkRelationsAPISchema(colander.Schema):
+    path = RIDPathSchema()
+    body = BulkRelationsSchema()
+
+
 class CreateRelationAPISchema(colander.Schema):
     path = RIDPathSchema()
     body = RelationSchema()
@@ -58,14 +85,17 @@ class RelationsAPIView(ResourceAPIBase):
     @view(schema=RelationAPISchema())
     def get(self):
         relation_id = self.get_relation_id()
-        return self.get_relation(relation_id)
+        return self.not_modified(self.wall) or self.get_relation(relation_id)
 
     @view(schema=UpdateRelationAPISchema())
     def put(self):
         relation_id = self.get_relation_id()
         appstruct = self.get_json_appstruct()
         if self.wall:
-            self.wall.relations_map[relation_id] = appstruct['members']
+            try:
+                self.wall.relations_map[relation_id] = appstruct['members']
+            except ValueError as exc:
+                return self.error(str(exc), type='body', status=400)
             return self.wall.relations_map.get_as_json(relation_id)
 
     @view(schema=RelationAPISchema())
@@ -79,17 +109,54 @@ class RelationsAPIView(ResourceAPIBase):
 
     @view(schema=ResourceAPISchema())
     def collection_get(self):
-        if self.wall:
-            return list(self.wall.relations_map.get_all_as_json())
+        if self.wall is not None:
+            return self.not_modified(self.wall) or list(self.wall.relations_map.get_all_as_json())
 
     @view(schema=CreateRelationAPISchema())
     def collection_post(self):
         if self.wall:
             appstruct = self.get_json_appstruct()
             # The members part
-            relation_id = self.wall.relations_map.create(appstruct['members'])
+            try:
+                relation_id = self.wall.relations_map.create(appstruct['members'])
+            except ValueError as exc:
+                return self.error(str(exc), type='body', status=400)
             return self.wall.relations_map.get_as_json(relation_id)
 
 
+@resource(path='/api/1/walls/{rid}/bulk/relations',
+          tags=['Relations'],
+          validators=(colander_validator,),
+          cors_origins=('*',),
+          factory='kedja.root_factory')
+class BulkRelationsAPIView(ResourceAPIBase):
+    """ Create lots of relations within one request and one transaction, or replace all of them. """
+    parent_type_name = 'Wall'
+
+    @view(schema=BulkRelationsAPISchema(), validators=(colander_validator, 'edit_resource_validator'))
+    def post(self):
+        wall = self.base_get(self.request.matchdict['rid'], type_name=self.parent_type_name)
+        if wall is None:
+            return
+        appstruct = self.request.validated['body']
+        members = set()
+        for x in appstruct['relations']:
+            members.update(x)
+        missing = set(x for x in members if not self.within_wall(x, wall))
+        if missing:
+            msg = "Not within this wall: %s" % ", ".join(str(x) for x in sorted(missing))
+            return self.error(msg, type='body', status=400)
+        try:
+            relation_ids = wall.relations_map.bulk_create(appstruct['relations'], replace=appstruct['replace'])
+        except ValueError as exc:
+            return self.error(str(exc), type='body', status=400)
+        return [wall.relations_map.get_as_json(x) for x in relation_ids]
+
+    def within_wall(self, rid, wall):
+        """ Is the resource with this rid contained within wall? """
+        resource = self.resource_cache.get_resource(self.root, rid)
+        return resource is not None and resource is not wall and find_interface(resource, IWall) is wall
+
+
 def includeme(config):
     config.scan(__name__)
@@ -1,11 +1,108 @@
-
+import colander
+from arche.content import VIEW
 from cornice.resource import resource
+from cornice.resource import view
 from cornice.validators import colander_validator
 
 from kedja.views.api.base import ResourceAPIBase
 from kedja.views.api.base import ResourceAPISchema
 
 
+class RIDList(colander.SchemaType):
+    """ A list of rids, either as a JSON list or as a comma separated string. """
+
+    def serialize(self, node, appstruct):
+        return appstruct
+
+    def deserialize(self, node, cstruct):
+        if cstruct is colander.null:
+            return cstruct
+        if isinstance(cstruct, str):
+            cstruct = [x for x in cstruct.split(',') if x.strip()]
+        if not isinstance(cstruct, (list, tuple)):
+            raise colander.Invalid(node, "%r is not a list of rids" % (cstruct,))
+        rids = []
+        for x in cstruct:
+            if isinstance(x, bool):
+                raise colander.Invalid(node, "%r is not a rid" % (x,))
+            try:
+                rid = int(x)
+            except (TypeError, ValueError):
+                raise colander.Invalid(node, "%r is not a rid" % (x,))
+            if rid not in rids:
+                rids.append(rid)
+        return rids
+
+
+class FetchResourcesSchema(colander.Schema):
+    rids = colander.SchemaNode(
+        RIDList(),
+        description="Comma separated, or a list when posting",
+        validator=colander.Length(1, 1000),
+    )
+    limit = colander.SchemaNode(
+        colander.Int(),
+        validator=colander.Range(min=1, max=100),
+        missing=100,
+    )
+    offset = colander.SchemaNode(
+        colander.Int(),
+        validator=colander.Range(min=0),
+        missing=0,
+    )
+
+
+class FetchResourcesQueryAPISchema(colander.Schema):
+    title = "Fetch several resources by rid"
+    querystring = FetchResourcesSchema()
+
+
+class FetchResourcesBodyAPISchema(colander.Schema):
+    title = "Fetch several resources by rid, for long lists"
+    body = FetchResourcesSchema(description="JSON payload")
+
+
+@resource(path='/api/1/resources',
+          tags=['Any resource'],
+          cors_origins=('*',),
+          factory='kedja.root_factory')
+class FetchResourcesAPIView(ResourceAPIBase):
+    """ Any resources by rid, regardless of where they are.
+
+        Returns something like: {"resources": [...], "missing": [404], "next_offset": 100}
+
+        Rids that don't exist or that the user isn't allowed to view end up in missing.
+        At most limit rids are looked up per request, starting at offset within the requested rids.
+        next_offset is null when there's nothing more to fetch.
+    """
+
+    @view(schema=FetchResourcesQueryAPISchema(), validators=(colander_validator,))
+    def get(self):
+        return self.fetch(self.request.validated['querystring'])
+
+    @view(schema=FetchResourcesBodyAPISchema(), validators=(colander_validator,))
+    def post(self):
+        return self.fetch(self.request.validated['body'])
+
+    def fetch(self, appstruct):
+        rids = appstruct['rids']
+        offset = appstruct['offset']
+        end = offset + appstruct['limit']
+        resources = []
+        missing = []
+        for rid in rids[offset:end]:
+            resource = self.resource_cache.get_resource(self.root, rid)
+            if resource is not None and self.is_allowed(resource, VIEW):
+                resources.append(resource)
+            else:
+                missing.append(rid)
+        return {
+            'resources': resources,
+            'missing': missing,
+            'next_offset': end if end < len(rids) else None,
+        }
+
+
 # Cornice doesn't respect pyramids root factory - beware!
 # @resource(path='/api/1/rid/{rid}',
 #           schema=ResourceAPISchema(),
@@ -0,0 +1,37 @@
+from hmac import compare_digest
+
+from cornice.resource import resource
+
+from kedja.models.conflicts import get_conflict_metrics
+from kedja.utils import get_redis_conn
+from kedja.utils import get_redis_pool_stats
+from kedja.utils import get_redis_pubsub_conn
+from kedja.views.api.base import APIBase
+
+
+@resource(path='/api/1/status',
+          tags=['Status'],
+          factory='kedja.root_factory')
+class StatusAPIView(APIBase):
+    """ Numbers for monitoring this process.
+        Only for monitoring tools, which must send the X-Status-Token header with the value of
+        the setting kedja.status_token. Without that setting, it doesn't exist.
+    """
+
+    def get(self):
+        registry = self.request.registry
+        token = registry.settings.get('kedja.status_token', '')
+        if not token or not compare_digest(token, self.request.headers.get('X-Status-Token', '')):
+            self.error()
+            return
+        return {
+            'redis': {
+                'default': get_redis_pool_stats(get_redis_conn(registry)),
+                'pubsub': get_redis_pool_stats(get_redis_pubsub_conn(registry)),
+            },
+            'conflicts': get_conflict_metrics(),
+        }
+
+
+def includeme(config):
+    config.scan(__name__)
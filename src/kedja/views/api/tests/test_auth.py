@@ -62,3 +62,46 @@ class FunctionalAuthenticationAPITests(TestCase):
         token = auth_tokens.create(credentials)
         response = app.post("/api/1/auth/credentials/{}/{}".format('10', token))
         self.assertIn('Authorization', response.json_body)
+
+    def test_login_get_credentials_only_once(self):
+        wsgiapp = self.config.make_wsgi_app()
+        app = TestApp(wsgiapp)
+        request = testing.DummyRequest()
+        apply_request_extensions(request)
+        root = self._fixture(request)
+        credentials = self.config.registry.content('Credentials', '10')
+        credentials.save()
+        commit()
+        auth_tokens = self.config.registry.getAdapter(root, IOneTimeAuthToken)
+        token = auth_tokens.create(credentials)
+        app.post("/api/1/auth/credentials/{}/{}".format('10', token), status=200)
+        app.post("/api/1/auth/credentials/{}/{}".format('10', token), status=400)
+
+    def test_registration_only_once(self):
+        wsgiapp = self.config.make_wsgi_app()
+        app = TestApp(wsgiapp)
+        request = testing.DummyRequest()
+        apply_request_extensions(request)
+        root = self._fixture(request)
+        reg_tokens = self.config.registry.getAdapter(root, IOneTimeRegistrationToken)
+        token = reg_tokens.create({'hello': 'world', 'provider': 'Google', 'id': 123})
+        app.post("/api/1/auth/register/{}".format(token), status=200)
+        app.post("/api/1/auth/register/{}".format(token), status=400)
+
+    def test_registration_token_restored_on_abort(self):
+        import transaction
+        from kedja.views.api.auth import AuthRegisterAPIView
+        request = testing.DummyRequest()
+        apply_request_extensions(request)
+        root = self._fixture(request)
+        reg_tokens = self.config.registry.getAdapter(root, IOneTimeRegistrationToken)
+        payload = {'hello': 'world', 'provider': 'Google', 'id': 123}
+        token = reg_tokens.create(payload)
+        request.matchdict = {'token': token}
+        request.validated = {}
+        view = AuthRegisterAPIView(request, context=root)
+        view.validate_reg_token(request)
+        self.assertEqual(payload, request.validated['userpayload'])
+        # Like when the view raised an exception
+        transaction.abort()
+        self.assertEqual(payload, reg_tokens.consume(token))
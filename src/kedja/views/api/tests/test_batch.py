@@ -0,0 +1,117 @@
+from json import dumps
+from unittest import TestCase
+
+import colander
+from kedja.testing import get_settings
+from pyramid import testing
+from pyramid.request import apply_request_extensions
+from transaction import commit
+from webtest import TestApp
+
+
+class ReferenceTests(TestCase):
+
+    @property
+    def _cut(self):
+        from kedja.views.api.batch import Reference
+        return Reference
+
+    def test_deserialize(self):
+        node = colander.SchemaNode(self._cut())
+        self.assertEqual(3, node.deserialize(3))
+        self.assertEqual('$0', node.deserialize('$0'))
+        self.assertRaises(colander.Invalid, node.deserialize, 'hello')
+        self.assertRaises(colander.Invalid, node.deserialize, '$')
+        self.assertRaises(colander.Invalid, node.deserialize, True)
+
+
+class FunctionalBatchAPIViewTests(TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp(settings=get_settings())
+        self.config.include('kedja.testing')
+        self.config.include('pyramid_tm')
+        self.config.include('kedja.views.api.batch')
+        self.config.include('kedja.views.api.collections')
+        self.config.testing_securitypolicy(permissive=True)
+
+    def tearDown(self):
+        testing.tearDown()
+
+    def _fixture(self, request):
+        from kedja import root_factory
+        root = root_factory(request)
+        root['wall'] = request.registry.content('Wall', rid=2)
+        root['wall']['collection'] = request.registry.content('Collection', rid=3)
+        commit()
+        return root
+
+    def _app(self):
+        wsgiapp = self.config.make_wsgi_app()
+        app = TestApp(wsgiapp)
+        request = testing.DummyRequest()
+        apply_request_extensions(request)
+        self._fixture(request)
+        return app
+
+    def test_create_with_references(self):
+        app = self._app()
+        operations = [
+            {'method': 'POST', 'type_name': 'Collection', 'parent': 2, 'data': {'title': 'New'}},
+            {'method': 'POST', 'type_name': 'Card', 'parent': '$0', 'data': {'title': 'A'}},
+            {'method': 'POST', 'type_name': 'Card', 'parent': '$0', 'data': {'title': 'B'}},
+            {'method': 'POST', 'type_name': 'Relation', 'rid': 2, 'data': {'members': ['$1', '$2']}},
+        ]
+        response = app.post('/api/1/batch', params=dumps({'operations': operations}), status=200)
+        results = response.json_body['results']
+        self.assertEqual(4, len(results))
+        self.assertEqual({'title': 'New'}, results[0]['data'])
+        self.assertEqual('Card', results[1]['type_name'])
+        self.assertEqual([results[1]['rid'], results[2]['rid']], results[3]['members'])
+        response = app.get('/api/1/walls/2/collections', status=200)
+        self.assertEqual(2, len(response.json_body))
+
+    def test_update_and_delete(self):
+        app = self._app()
+        operations = [
+            {'method': 'PUT', 'type_name': 'Collection', 'rid': 3, 'data': {'title': 'Renamed'}},
+            {'method': 'DELETE', 'type_name': 'Collection', 'rid': '$0'},
+        ]
+        response = app.post('/api/1/batch', params=dumps({'operations': operations}), status=200)
+        results = response.json_body['results']
+        self.assertEqual('Renamed', results[0]['data']['title'])
+        self.assertEqual({'removed': 3}, results[1])
+        response = app.get('/api/1/walls/2/collections', status=200)
+        self.assertEqual([], response.json_body)
+
+    def test_failure_changes_nothing(self):
+        app = self._app()
+        operations = [
+            {'method': 'PUT', 'type_name': 'Collection', 'rid': 3, 'data': {'title': 'Renamed'}},
+            {'method': 'DELETE', 'type_name': 'Card', 'rid': 404},
+        ]
+        response = app.post('/api/1/batch', params=dumps({'operations': operations}), status=404)
+        self.assertIn('operations.1', [x['name'] for x in response.json_body['errors']])
+        response = app.get('/api/1/walls/2/collections', status=200)
+        self.assertEqual('', response.json_body[0]['data']['title'])
+
+    def test_bad_data(self):
+        app = self._app()
+        operations = [
+            {'method': 'POST', 'type_name': 'Collection', 'parent': 2, 'data': {'title': 'Fine'}},
+            {'method': 'PUT', 'type_name': 'Collection', 'rid': '$0', 'data': {'title': 123}},
+        ]
+        app.post('/api/1/batch', params=dumps({'operations': operations}), status=400)
+        response = app.get('/api/1/walls/2/collections', status=200)
+        self.assertEqual(1, len(response.json_body))
+
+    def test_bad_reference(self):
+        app = self._app()
+        operations = [
+            {'method': 'POST', 'type_name': 'Card', 'parent': '$0', 'data': {'title': 'A'}},
+        ]
+        app.post('/api/1/batch', params=dumps({'operations': operations}), status=400)
+
+    def test_empty(self):
+        app = self._app()
+        app.post('/api/1/batch', params=dumps({'operations': []}), status=400)
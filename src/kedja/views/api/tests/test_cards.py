@@ -221,3 +221,108 @@ class FunctionalCardsAPITests(TestCase):
         self._fixture(request)
         headers = (('Access-Control-Request-Method', 'POST'), ('Origin', 'http://localhost'))
         app.options('/api/1/collections/3/cards', status=200, headers=headers)
+
+
+class FunctionalMoveCardAPITests(TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp(settings=get_settings())
+        self.config.include('pyramid_tm')
+        self.config.include('kedja.testing')
+        self.config.include('kedja.views.api.cards')
+        self.config.testing_securitypolicy(permissive=True)
+
+    def tearDown(self):
+        testing.tearDown()
+
+    def _fixture(self, request):
+        from kedja import root_factory
+        root = root_factory(request)
+        root['wall'] = wall = request.registry.content('Wall', rid=2)
+        wall['3'] = request.registry.content('Collection', rid=3)
+        wall['4'] = request.registry.content('Collection', rid=4)
+        wall['3']['5'] = request.registry.content('Card', rid=5)
+        wall['3']['6'] = request.registry.content('Card', rid=6)
+        wall['4']['7'] = request.registry.content('Card', rid=7)
+        wall.relations_map[100] = [5, 7]
+        root['other'] = request.registry.content('Wall', rid=8)
+        root['other']['9'] = request.registry.content('Collection', rid=9)
+        commit()
+        return root
+
+    def _app(self):
+        wsgiapp = self.config.make_wsgi_app()
+        app = TestApp(wsgiapp)
+        request = testing.DummyRequest()
+        apply_request_extensions(request)
+        self._fixture(request)
+        return app
+
+    def test_move_within_collection(self):
+        app = self._app()
+        app.put('/api/1/collections/3/cards/6/move', params=dumps({'before': 5}), status=200)
+        response = app.get('/api/1/collections/3/cards', status=200)
+        self.assertEqual([6, 5], [x['rid'] for x in response.json_body])
+
+    def test_move_to_other_collection(self):
+        app = self._app()
+        response = app.put('/api/1/collections/3/cards/5/move', params=dumps({'parent': 4}), status=200)
+        self.assertEqual(5, response.json_body['rid'])
+        response = app.get('/api/1/collections/4/cards', status=200)
+        self.assertEqual([7, 5], [x['rid'] for x in response.json_body])
+        response = app.get('/api/1/collections/4/cards/5', status=200)
+        self.assertEqual(5, response.json_body['rid'])
+
+    def test_move_to_other_wall(self):
+        app = self._app()
+        app.put('/api/1/collections/3/cards/5/move', params=dumps({'parent': 9}), status=400)
+
+    def test_move_before_404(self):
+        app = self._app()
+        app.put('/api/1/collections/3/cards/5/move', params=dumps({'before': 7}), status=404)
+
+
+class FunctionalCardsPaginationTests(TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp(settings=get_settings())
+        self.config.include('pyramid_tm')
+        self.config.include('kedja.testing')
+        self.config.include('kedja.views.api.cards')
+        self.config.testing_securitypolicy(permissive=True)
+
+    def tearDown(self):
+        testing.tearDown()
+
+    def _fixture(self, request):
+        from kedja import root_factory
+        root = root_factory(request)
+        root['wall'] = request.registry.content('Wall', rid=2)
+        root['wall']['3'] = collection = request.registry.content('Collection', rid=3)
+        for rid in range(10, 15):
+            collection[str(rid)] = request.registry.content('Card', rid=rid)
+        commit()
+        return root
+
+    def test_pages(self):
+        wsgiapp = self.config.make_wsgi_app()
+        app = TestApp(wsgiapp)
+        request = testing.DummyRequest()
+        apply_request_extensions(request)
+        self._fixture(request)
+        response = app.get('/api/1/collections/3/cards', params={'limit': 2}, status=200)
+        self.assertEqual([10, 11], [x['rid'] for x in response.json_body])
+        rids = []
+        while 'X-Next-Cursor' in response.headers:
+            response = app.get('/api/1/collections/3/cards',
+                               params={'limit': 2, 'cursor': response.headers['X-Next-Cursor']}, status=200)
+            rids.extend(x['rid'] for x in response.json_body)
+        self.assertEqual([12, 13, 14], rids)
+
+    def test_bad_cursor(self):
+        wsgiapp = self.config.make_wsgi_app()
+        app = TestApp(wsgiapp)
+        request = testing.DummyRequest()
+        apply_request_extensions(request)
+        self._fixture(request)
+        app.get('/api/1/collections/3/cards', params={'limit': 2, 'cursor': 'hello'}, status=400)
@@ -0,0 +1,66 @@
+from unittest import TestCase
+
+from kedja.testing import get_settings
+from pyramid import testing
+from pyramid.request import apply_request_extensions
+from transaction import commit
+from webtest import TestApp
+
+
+class FunctionalGraphAPITests(TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp(settings=get_settings())
+        self.config.include('pyramid_tm')
+        self.config.include('kedja.testing')
+        self.config.include('kedja.views.api.graph')
+        self.config.testing_securitypolicy(permissive=True)
+
+    def tearDown(self):
+        testing.tearDown()
+
+    def _fixture(self, request):
+        from kedja import root_factory
+        root = root_factory(request)
+        content = request.registry.content
+        root['wall'] = wall = content('Wall', rid=2)
+        root['wall']['collection'] = collection = content('Collection', rid=3)
+        for rid in (10, 20, 30, 40):
+            collection[str(rid)] = content('Card', rid=rid)
+        wall.relations_map[1] = [10, 20]
+        wall.relations_map[2] = [20, 30]
+        commit()
+        return root
+
+    def _app(self):
+        wsgiapp = self.config.make_wsgi_app()
+        app = TestApp(wsgiapp)
+        request = testing.DummyRequest()
+        apply_request_extensions(request)
+        self._fixture(request)
+        return app
+
+    def test_neighbours(self):
+        app = self._app()
+        response = app.get('/api/1/walls/2/graph/neighbours/10', params={'depth': 2}, status=200)
+        self.assertEqual([{'rid': 20, 'distance': 1}, {'rid': 30, 'distance': 2}], response.json_body)
+
+    def test_neighbours_bad_depth(self):
+        app = self._app()
+        app.get('/api/1/walls/2/graph/neighbours/10', params={'depth': 0}, status=400)
+
+    def test_components(self):
+        app = self._app()
+        response = app.get('/api/1/walls/2/graph/components', status=200)
+        self.assertEqual([[10, 20, 30]], response.json_body)
+
+    def test_path(self):
+        app = self._app()
+        response = app.get('/api/1/walls/2/graph/path', params={'source': 10, 'target': 30}, status=200)
+        self.assertEqual([10, 20, 30], response.json_body['path'])
+        response = app.get('/api/1/walls/2/graph/path', params={'source': 10, 'target': 40}, status=200)
+        self.assertEqual(None, response.json_body['path'])
+
+    def test_404(self):
+        app = self._app()
+        app.get('/api/1/walls/404/graph/components', status=404)
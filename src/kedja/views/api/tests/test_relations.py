@@ -210,6 +210,14 @@ class FunctionalCollectionsAPITests(TestCase):
         self._fixture(request)
         app.post('/api/1/walls/2/relations', params=dumps({'members': "Johan och ett par till"}), status=400)
 
+    def test_collection_post_duplicate(self):
+        wsgiapp = self.config.make_wsgi_app()
+        app = TestApp(wsgiapp)
+        request = testing.DummyRequest()
+        apply_request_extensions(request)
+        self._fixture(request)
+        app.post('/api/1/walls/2/relations', params=dumps({'members': [20, 10]}), status=400)
+
     def test_collection_options(self):
         wsgiapp = self.config.make_wsgi_app()
         app = TestApp(wsgiapp)
@@ -227,3 +235,68 @@ class FunctionalCollectionsAPITests(TestCase):
         self._fixture(request)
         headers = (('Access-Control-Request-Method', 'PUT'), ('Origin', 'http://localhost'))
         app.options('/api/1/walls/2/relations/123', status=200, headers=headers)
+
+
+class FunctionalBulkRelationsAPITests(TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp(settings=get_settings())
+        self.config.include('pyramid_tm')
+        self.config.include('kedja.testing')
+        self.config.include('kedja.views.api.relations')
+        self.config.testing_securitypolicy(permissive=True)
+
+    def tearDown(self):
+        testing.tearDown()
+
+    def _fixture(self, request):
+        from kedja import root_factory
+        root = root_factory(request)
+        content = request.registry.content
+        root['wall'] = wall = content('Wall', rid=2)
+        root['wall']['collection'] = collection = content('Collection', rid=3)
+        collection['cardA'] = content('Card', rid=10)
+        collection['cardB'] = content('Card', rid=20)
+        collection['cardC'] = content('Card', rid=30)
+        root['other'] = other = content('Wall', rid=4)
+        other['collection'] = content('Collection', rid=5)
+        other['collection']['card'] = content('Card', rid=40)
+        wall.relations_map[1] = [10, 20]
+        commit()
+        return root
+
+    def _app(self):
+        wsgiapp = self.config.make_wsgi_app()
+        app = TestApp(wsgiapp)
+        request = testing.DummyRequest()
+        apply_request_extensions(request)
+        root = self._fixture(request)
+        return app, root
+
+    def test_post(self):
+        app, root = self._app()
+        body = {'relations': [[10, 30], [20, 30]]}
+        response = app.post('/api/1/walls/2/bulk/relations', params=dumps(body), status=200)
+        self.assertEqual([[10, 30], [20, 30]], [x['members'] for x in response.json_body])
+        response = app.get('/api/1/walls/2/relations', status=200)
+        self.assertEqual(3, len(response.json_body))
+
+    def test_post_replace(self):
+        app, root = self._app()
+        body = {'relations': [[10, 30]], 'replace': True}
+        app.post('/api/1/walls/2/bulk/relations', params=dumps(body), status=200)
+        response = app.get('/api/1/walls/2/relations', status=200)
+        self.assertEqual([[10, 30]], [x['members'] for x in response.json_body])
+
+    def test_post_outside_wall(self):
+        app, root = self._app()
+        body = {'relations': [[10, 30], [10, 40], [2, 404]]}
+        response = app.post('/api/1/walls/2/bulk/relations', params=dumps(body), status=400)
+        self.assertIn('Not within this wall: 2, 40, 404', response.text)
+        response = app.get('/api/1/walls/2/relations', status=200)
+        self.assertEqual(1, len(response.json_body))
+
+    def test_post_duplicate(self):
+        app, root = self._app()
+        body = {'relations': [[10, 30], [20, 10]]}
+        app.post('/api/1/walls/2/bulk/relations', params=dumps(body), status=400)
@@ -0,0 +1,88 @@
+from json import dumps
+from unittest import TestCase
+
+import colander
+from kedja.testing import get_settings
+from pyramid import testing
+from pyramid.request import apply_request_extensions
+from transaction import commit
+from webtest import TestApp
+
+
+class RIDListTests(TestCase):
+
+    @property
+    def _cut(self):
+        from kedja.views.api.resource import RIDList
+        return RIDList
+
+    def test_deserialize(self):
+        node = colander.SchemaNode(self._cut())
+        self.assertEqual([1, 2, 3], node.deserialize('1,2, 3,2'))
+        self.assertEqual([1, 2], node.deserialize([1, 2]))
+        self.assertRaises(colander.Invalid, node.deserialize, '1,hello')
+        self.assertRaises(colander.Invalid, node.deserialize, [True])
+        self.assertRaises(colander.Invalid, node.deserialize, 3)
+
+
+class FunctionalFetchResourcesAPITests(TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp(settings=get_settings())
+        self.config.include('kedja.testing')
+        self.config.include('kedja.views.api.resource')
+        self.config.testing_securitypolicy(permissive=True)
+
+    def tearDown(self):
+        testing.tearDown()
+
+    def _fixture(self, request):
+        from kedja import root_factory
+        root = root_factory(request)
+        root['wall'] = request.registry.content('Wall', rid=2)
+        root['wall']['collection'] = request.registry.content('Collection', rid=3)
+        root['wall']['collection']['card'] = request.registry.content('Card', rid=4)
+        root['wall']['collection']['other'] = request.registry.content('Card', rid=5)
+        commit()
+        return root
+
+    def _app(self):
+        wsgiapp = self.config.make_wsgi_app()
+        app = TestApp(wsgiapp)
+        request = testing.DummyRequest()
+        apply_request_extensions(request)
+        self._fixture(request)
+        return app
+
+    def test_get(self):
+        app = self._app()
+        response = app.get('/api/1/resources', params={'rids': '5,3,404'}, status=200)
+        self.assertEqual([5, 3], [x['rid'] for x in response.json_body['resources']])
+        self.assertEqual([404], response.json_body['missing'])
+        self.assertEqual(None, response.json_body['next_offset'])
+
+    def test_get_paginated(self):
+        app = self._app()
+        response = app.get('/api/1/resources', params={'rids': '2,3,4,5', 'limit': 3}, status=200)
+        self.assertEqual([2, 3, 4], [x['rid'] for x in response.json_body['resources']])
+        self.assertEqual(3, response.json_body['next_offset'])
+        response = app.get('/api/1/resources', params={'rids': '2,3,4,5', 'limit': 3, 'offset': 3}, status=200)
+        self.assertEqual([5], [x['rid'] for x in response.json_body['resources']])
+        self.assertEqual(None, response.json_body['next_offset'])
+
+    def test_post(self):
+        app = self._app()
+        response = app.post('/api/1/resources', params=dumps({'rids': [4, 2]}), status=200)
+        self.assertEqual([4, 2], [x['rid'] for x in response.json_body['resources']])
+
+    def test_bad_rids(self):
+        app = self._app()
+        app.get('/api/1/resources', params={'rids': 'hello'}, status=400)
+        app.get('/api/1/resources', status=400)
+
+    def test_not_allowed(self):
+        self.config.testing_securitypolicy(permissive=False)
+        app = self._app()
+        response = app.get('/api/1/resources', params={'rids': '2,3'}, status=200)
+        self.assertEqual([], response.json_body['resources'])
+        self.assertEqual([2, 3], response.json_body['missing'])
@@ -0,0 +1,38 @@
+from unittest import TestCase
+
+from kedja.testing import get_settings
+from pyramid import testing
+from webtest import TestApp
+
+
+class FunctionalStatusAPIViewTests(TestCase):
+
+    def setUp(self):
+        settings = get_settings()
+        settings['kedja.status_token'] = 'secret'
+        self.config = testing.setUp(settings=settings)
+        self.config.include('kedja.testing')
+        self.config.include('kedja.views.api.status')
+
+    def tearDown(self):
+        testing.tearDown()
+
+    def test_get(self):
+        wsgiapp = self.config.make_wsgi_app()
+        app = TestApp(wsgiapp)
+        response = app.get('/api/1/status', headers={'X-Status-Token': 'secret'}, status=200)
+        self.assertIn('in_use', response.json_body['redis']['default'])
+        self.assertIn('in_use', response.json_body['redis']['pubsub'])
+        self.assertIsInstance(response.json_body['conflicts'], dict)
+
+    def test_get_wrong_token(self):
+        wsgiapp = self.config.make_wsgi_app()
+        app = TestApp(wsgiapp)
+        app.get('/api/1/status', status=404)
+        app.get('/api/1/status', headers={'X-Status-Token': 'wrong'}, status=404)
+
+    def test_get_disabled(self):
+        self.config.registry.settings['kedja.status_token'] = ''
+        wsgiapp = self.config.make_wsgi_app()
+        app = TestApp(wsgiapp)
+        app.get('/api/1/status', headers={'X-Status-Token': ''}, status=404)
@@ -66,13 +66,27 @@ class WallsAPIViewTests(TestCase):
         self.assertNotIn('wall', root)
 
     def test_collection_get(self):
+        from kedja.security import WALL_OWNER
+        self.config.testing_securitypolicy(userid='10', permissive=True)
         root = self._fixture()
+        root['wall'].add_user_roles(10, WALL_OWNER)
+        root['other'] = self.config.registry.content('Wall', rid=3)
         request = testing.DummyRequest()
         apply_request_extensions(request)
         inst = self._cut(request, context=root)
         response = inst.collection_get()
         self.assertIsInstance(response, list)
         self.assertIn(root['wall'], response)
+        # Not indexed for this user
+        self.assertNotIn(root['other'], response)
+
+    def test_collection_get_unindexed(self):
+        root = self._fixture()
+        del root.wall_index
+        request = testing.DummyRequest()
+        apply_request_extensions(request)
+        inst = self._cut(request, context=root)
+        self.assertIn(root['wall'], inst.collection_get())
 
     def test_collection_post(self):
         root = self._fixture()
@@ -129,7 +143,7 @@ class WallsStructureAPIViewTests(TestCase):
                 [103, []], [203, []], [303, []]
             ]]
         ]
-        self.assertEqual(response, expected)
+        self.assertEqual(loads(response.body), expected)
 
 
 class WallsContentAPIViewTests(TestCase):
@@ -167,7 +181,16 @@ class WallsContentAPIViewTests(TestCase):
         request.matchdict['rid'] = 2
         inst = self._cut(request, context=root)
         response = inst.get()
-        self.assertEqual(response, {'resources': resources})
+        expected = loads(render('json', {'resources': resources}, request=request))
+        self.assertEqual(loads(response.body), expected)
+
+    def test_snapshot_name(self):
+        request = testing.DummyRequest()
+        apply_request_extensions(request)
+        self.assertEqual('content', self._cut(request, context=None).snapshot_name())
+        request = testing.DummyRequest(params={'fields': 'title,nothing,int_indicator,something_else'})
+        apply_request_extensions(request)
+        self.assertEqual('content:int_indicator,title', self._cut(request, context=None).snapshot_name())
 
 
 class FunctionalWallsAPITests(TestCase):
@@ -195,6 +218,20 @@ class FunctionalWallsAPITests(TestCase):
         response = app.get('/api/1/walls/2', status=200)
         self.assertEqual(response.json_body, {'data': {'title': ''}, 'rid': 2, 'type_name': 'Wall'})
 
+    def test_get_not_modified(self):
+        wsgiapp = self.config.make_wsgi_app()
+        app = TestApp(wsgiapp)
+        request = testing.DummyRequest()
+        apply_request_extensions(request)
+        self._fixture(request)
+        response = app.get('/api/1/walls/2', status=200)
+        etag = response.headers['ETag']
+        response = app.get('/api/1/walls/2', headers={'If-None-Match': etag}, status=304)
+        self.assertEqual(response.body, b'')
+        app.put('/api/1/walls/2', params=dumps({'title': 'Hello world!'}), status=200)
+        response = app.get('/api/1/walls/2', headers={'If-None-Match': etag}, status=200)
+        self.assertNotEqual(etag, response.headers['ETag'])
+
     def test_get_404(self):
         wsgiapp = self.config.make_wsgi_app()
         app = TestApp(wsgiapp)
@@ -241,11 +278,15 @@ class FunctionalWallsAPITests(TestCase):
         self.assertEqual(response.json_body.get('status', None), 'error')
 
     def test_collection_get(self):
+        from kedja.security import WALL_OWNER
+        self.config.testing_securitypolicy(userid='10', permissive=True)
         wsgiapp = self.config.make_wsgi_app()
         app = TestApp(wsgiapp)
         request = testing.DummyRequest()
         apply_request_extensions(request)
-        self._fixture(request)
+        root = self._fixture(request)
+        root['wall'].add_user_roles(10, WALL_OWNER)
+        commit()
         response = app.get('/api/1/walls', status=200)
         self.assertEqual([{'data': {'title': ''}, 'rid': 2, 'type_name': 'Wall'}], response.json_body)
 
@@ -340,6 +381,7 @@ class FunctionalWallContentAPIViewTests(TestCase):
         self.config.include('kedja.testing')
         self.config.include('pyramid_tm')
         self.config.include('kedja.views.api.walls')
+        self.config.include('kedja.views.api.cards')
         self.config.testing_securitypolicy(permissive=True)
 
     def _fixture(self, request):
@@ -367,3 +409,82 @@ class FunctionalWallContentAPIViewTests(TestCase):
         converted = render('json', content, request=request)
         expected = loads(converted)
         self.assertEqual(response.json_body, expected)
+
+    def test_get_not_modified(self):
+        wsgiapp = self.config.make_wsgi_app()
+        app = TestApp(wsgiapp)
+        request = testing.DummyRequest()
+        apply_request_extensions(request)
+        self._fixture(request)
+        response = app.get('/api/1/walls/2/content', status=200)
+        etag = response.headers['ETag']
+        app.get('/api/1/walls/2/content', headers={'If-None-Match': etag}, status=304)
+
+    def test_get_snapshot_invalidated(self):
+        wsgiapp = self.config.make_wsgi_app()
+        app = TestApp(wsgiapp)
+        request = testing.DummyRequest()
+        apply_request_extensions(request)
+        self._fixture(request)
+        response = app.get('/api/1/walls/2/content', status=200)
+        self.assertEqual(response.json_body['resources']['101']['data']['title'], '- Untiled -')
+        app.put('/api/1/collections/10/cards/101', params=dumps({'title': 'Changed'}), status=200)
+        response = app.get('/api/1/walls/2/content', status=200)
+        self.assertEqual(response.json_body['resources']['101']['data']['title'], 'Changed')
+
+    def test_get_fields(self):
+        wsgiapp = self.config.make_wsgi_app()
+        app = TestApp(wsgiapp)
+        request = testing.DummyRequest()
+        apply_request_extensions(request)
+        content = self._fixture(request)
+        expected = loads(render('json', content, request=request))
+        response = app.get('/api/1/walls/2/content', params={'fields': 'title'}, status=200)
+        for (rid, item) in response.json_body['resources'].items():
+            self.assertEqual({'title': expected['resources'][rid]['data']['title']}, item['data'])
+        # Not mixed up with the snapshot of everything
+        response = app.get('/api/1/walls/2/content', status=200)
+        self.assertEqual(response.json_body, expected)
+
+
+class FunctionalWallChangesAPIViewTests(TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp(settings=get_settings())
+        self.config.include('kedja.testing')
+        self.config.include('pyramid_tm')
+        self.config.include('kedja.views.api.walls')
+        self.config.include('kedja.views.api.relations')
+        self.config.testing_securitypolicy(permissive=True)
+
+    def _fixture(self, request):
+        from kedja import root_factory
+        root = root_factory(request)
+        content = self.config.registry.content
+        root['wall'] = wall = content('Wall', rid=2)
+        wall['collection'] = collection = content('Collection', rid=3)
+        collection['cardA'] = content('Card', rid=10)
+        collection['cardB'] = content('Card', rid=20)
+        commit()
+        return root
+
+    def test_get(self):
+        wsgiapp = self.config.make_wsgi_app()
+        app = TestApp(wsgiapp)
+        request = testing.DummyRequest()
+        apply_request_extensions(request)
+        root = self._fixture(request)
+        revision = root['wall'].revision
+        response = app.post('/api/1/walls/2/relations', params=dumps({'members': [10, 20]}), status=200)
+        relation_id = response.json_body['relation_id']
+        response = app.get('/api/1/walls/2/changes', params={'since': revision}, status=200)
+        self.assertEqual(response.json_body['relation'], {'added': [relation_id], 'updated': [], 'removed': []})
+        self.assertEqual(response.json_body['revision'], revision + 1)
+
+    def test_get_bad_param(self):
+        wsgiapp = self.config.make_wsgi_app()
+        app = TestApp(wsgiapp)
+        request = testing.DummyRequest()
+        apply_request_extensions(request)
+        self._fixture(request)
+        app.get('/api/1/walls/2/changes', params={'since': 'hello'}, status=400)
@@ -4,6 +4,7 @@ from cornice.resource import view
 from cornice.validators import colander_validator
 
 from kedja.resources.user import UserSchema
+from kedja.views.api.base import PaginationAPISchema
 from kedja.views.api.base import ResourceAPISchema
 from kedja.views.api.base import ResourceAPIBase
 
@@ -40,7 +41,7 @@ class UsersAPIView(ResourceAPIBase):
     def delete(self):
         return self.base_delete(self.request.matchdict['rid'], type_name=self.type_name)
 
-    @view(schema=None)
+    @view(schema=PaginationAPISchema())
     def collection_get(self):
         return self.base_collection_get(self.context['users'], type_name=self.type_name)
 
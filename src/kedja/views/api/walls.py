@@ -3,8 +3,14 @@ from cornice.resource import resource
 from cornice.resource import view
 from cornice.validators import colander_validator
 
+from kedja.models.pubsub import iter_events
+from kedja.models.pubsub import subscribe
+from kedja.models.wall_index import get_wall_index
+from kedja.resources.json import dumps
+from kedja.resources.json import known_fields
 from kedja.resources.wall import WallSchema
 from kedja.views.api.base import BaseResponseAPISchema
+from kedja.views.api.base import PaginationAPISchema
 from kedja.views.api.base import ResourceAPISchema
 from kedja.views.api.base import ResourceAPIBase
 
@@ -48,7 +54,8 @@ class WallsAPIView(ResourceAPIBase):
 
     @view(schema=ResourceAPISchema(), validators=(colander_validator, 'view_resource_validator'))
     def get(self):
-        return self.base_get(self.request.matchdict['rid'], type_name='Wall')
+        wall = self.base_get(self.request.matchdict['rid'], type_name='Wall')
+        return self.not_modified(wall) or wall
 
     @view(schema=UpdateWallAPISchema(), validators=(colander_validator, 'edit_resource_validator'))
     def put(self):
@@ -58,9 +65,18 @@ class WallsAPIView(ResourceAPIBase):
     def delete(self):
         return self.base_delete(self.request.matchdict['rid'], type_name='Wall')
 
-    @view(schema=None)
+    @view(schema=PaginationAPISchema())
     def collection_get(self):
-        return self.base_collection_get(self.context, type_name=self.type_name)
+        """ Walls the current user may view. Only walls the user has a role in, or public ones, are loaded. """
+        index = get_wall_index(self.context)
+        if index is None:
+            return self.base_collection_get(self.context, type_name=self.type_name)
+        userid = self.request.authenticated_userid
+        return self.paginate(
+            lambda cursor: index.iter_visible(userid, cursor),
+            lambda rid: self.resource_cache.get_resource(self.root, rid),
+            type_name=self.type_name,
+        )
 
     @view(schema=CreateWallSchema())
     def collection_post(self):
@@ -94,10 +110,13 @@ class WallStructureAPIView(ResourceAPIBase):
         ]
         """
         wall = self.base_get(self.request.matchdict['rid'], type_name='Wall')
-        if wall:
-            results = []
-            self.get_structure(wall, results)
-            return results
+        if wall is not None:
+            return self.not_modified(wall) or self.snapshot_response(wall, 'structure', self.render_structure)
+
+    def render_structure(self, wall):
+        results = []
+        self.get_structure(wall, results)
+        return dumps(results, self.request)
 
     def get_structure(self, context, data):
         for v in context.values():
@@ -113,23 +132,127 @@ class WallStructureAPIView(ResourceAPIBase):
           factory='kedja.root_factory')
 class WallContentAPIView(ResourceAPIBase):
     type_name = 'Wall'
+    content_type_names = ('Collection', 'Card')
 
     @view(schema=ResourceAPISchema(), validators=(colander_validator, 'view_resource_validator'))
     def get(self):
         """ Get a structure with all of the content within this wall.
             It returns a dict where the resource ID is the key.
+
+            The result is kept as a snapshot until something within the wall changes.
+            Use ?fields=title,... to only include some fields of each resource.
         """
         wall = self.base_get(self.request.matchdict['rid'], type_name='Wall')
-        if wall:
-            results = {}
-            self.get_content(wall, results)
-            # Load relations etc too
-            return {'resources': results}
+        if wall is not None:
+            return self.not_modified(wall) or self.snapshot_response(wall, self.snapshot_name(), self.render_content)
+
+    def snapshot_name(self):
+        """ Each set of fields is a different payload. Only fields within the schemas of the content are
+            part of the name, so there's a limited number of snapshots for each wall.
+        """
+        fields = getattr(self.request, 'requested_fields', None)
+        if fields is None:
+            return 'content'
+        fields = known_fields(self.request.registry, fields, self.content_type_names)
+        return 'content:' + ','.join(fields)
 
-    def get_content(self, context, data):
+    def render_content(self, wall):
+        # The whole payload is needed for the snapshot, so it isn't streamed
+        return dumps({'resources': dict(self.walk_content(wall))}, self.request)
+
+    def walk_content(self, context):
         for v in context.values():
-            data[v.rid] = v
-            self.get_content(v, data)
+            yield v.rid, v
+            yield from self.walk_content(v)
+
+
+class ChangesQuerySchema(colander.Schema):
+    since = colander.SchemaNode(
+        colander.Int(),
+        validator=colander.Range(min=0),
+    )
+
+
+class WallChangesAPISchema(ResourceAPISchema):
+    querystring = ChangesQuerySchema()
+
+
+@resource(path='/api/1/walls/{rid}/changes',
+          cors_origins=('*',),
+          tags=['Walls'],
+          factory='kedja.root_factory')
+class WallChangesAPIView(ResourceAPIBase):
+    type_name = 'Wall'
+
+    @view(schema=WallChangesAPISchema(), validators=(colander_validator, 'view_resource_validator'))
+    def get(self):
+        """ Get everything that changed within this wall after a specific revision.
+
+            It will look something like this:
+            {
+                "revision": 12,
+                "since": 10,
+                "resource": {"added": [101], "updated": [10], "removed": []},
+                "relation": {"added": [], "updated": [], "removed": [5]}
+            }
+
+            In case the revision is too old to be known, 410 Gone will be returned.
+            Fetch the whole wall again in that case.
+        """
+        wall = self.base_get(self.request.matchdict['rid'], type_name='Wall')
+        if wall is not None:
+            since = self.request.validated['querystring']['since']
+            response = self.not_modified(wall)
+            if response is not None:
+                return response
+            changes = wall.changes_since(since)
+            if changes is None:
+                self.error("Changes since revision %s aren't known anymore" % since, type='querystring', status=410)
+                return
+            changes['revision'] = wall.revision
+            changes['since'] = since
+            return changes
+
+
+@resource(path='/api/1/walls/{rid}/events',
+          cors_origins=('*',),
+          tags=['Walls'],
+          factory='kedja.root_factory')
+class WallEventsAPIView(ResourceAPIBase):
+    type_name = 'Wall'
+
+    @view(schema=ResourceAPISchema(), validators=(colander_validator, 'view_resource_validator'))
+    def get(self):
+        """ A stream of Server-Sent Events with changes within this wall.
+
+            The first event is the current revision, after that there's one 'change' event per committed
+            transaction, with the same items as the changelog. The event id is the revision, so when reconnecting,
+            use the changes endpoint to catch up on anything missed. Changes logged at once, like bulk relations,
+            only have a count instead of an id. Use the changes endpoint to get them too.
+
+            Each open stream keeps a worker thread busy, so only kedja.events_max_streams may be open at once.
+            Above that, 503 is returned.
+        """
+        wall = self.base_get(self.request.matchdict['rid'], type_name='Wall')
+        if wall is not None:
+            settings = self.request.registry.settings
+            # Subscribe before returning, so nothing published while the response starts is lost
+            stream = subscribe(wall.rid, registry=self.request.registry)
+            if stream is None:
+                self.error("Too many open event streams, try again later", type='path', status=503)
+                return
+            response = self.request.response
+            response.content_type = 'text/event-stream'
+            response.cache_control = 'no-cache'
+            response.headers['X-Accel-Buffering'] = 'no'  # Nginx
+            # The iterator only holds the stream, never any database objects
+            response.app_iter = iter_events(
+                stream,
+                wall.revision,
+                max_age=float(settings.get('kedja.events_max_age', 300)),
+                keepalive=float(settings.get('kedja.events_keepalive', 15)),
+            )
+            return response
 
 
 def includeme(config):